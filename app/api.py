@@ -0,0 +1,260 @@
+"""
+api.py
+
+Builds the JSON odds served by /api/odds,
+/api/what-if and /api/outcomes. Responses are
+serialized once per state and kept as bytes.
+/api/simulate streams its estimates as they converge
+"""
+
+import hashlib
+import json
+import os
+
+from app import lottery_odds
+from app import outcomes
+from app import utils
+from app import what_if
+from app.cache import LRUCache
+from app.season import DEFAULT_SEASON
+
+# Serialized responses and their ETags keyed by endpoint, season name
+# and state token
+API_CACHE = LRUCache(int(os.environ.get('API_CACHE_SIZE', 4096)))
+
+# Lotteries simulated between the lines streamed by /api/simulate
+SIMULATION_CHUNK = 10000
+
+
+def odds_json(token, season=None):
+    """ odds_json returns the serialized odds for the
+    state reached by revealing the teams in token
+
+    @param token (str): State token built by
+        utils.encode_state
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - body (bytes): JSON document with the 'season'
+            name, the canonical 'state' token, the 'teams_selected',
+            'top_pick_list' and 'top_pick_order' lists and
+            each team's 'slot', 'name', 'id' and 'odds'
+        - etag (str): Strong ETag of body
+
+    Raises:
+
+        - ValueError: If the state token is invalid
+    """
+
+    season = season or DEFAULT_SEASON
+    cached = API_CACHE.get(('odds', season.name, token))
+    if cached is not None:
+        return cached
+
+    reveals = utils.decode_state(token, season.lottery_info)
+    teams_selected, top_pick_list, top_pick_order, _ = \
+        utils.replay_state(season.lottery_info, reveals, season.top_picks)
+
+    payload = lottery_odds.odds_payload(teams_selected,
+                                        top_pick_list,
+                                        top_pick_order,
+                                        season)
+    payload['season'] = season.name
+    payload['state'] = utils.encode_state(teams_selected)
+    payload['teams_selected'] = teams_selected
+    payload['top_pick_list'] = top_pick_list
+    payload['top_pick_order'] = top_pick_order
+
+    cached = _serialize(payload)
+    API_CACHE.put(('odds', season.name, token), cached)
+
+    return cached
+
+
+def what_if_json(token, season=None):
+    """ what_if_json returns the serialized odds after
+    each team that can be revealed next in the state
+    reached by revealing the teams in token
+
+    @param token (str): State token built by
+        utils.encode_state
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - body (bytes): JSON document with the 'season' name,
+            the canonical 'state' token, the 'teams_selected',
+            'top_pick_list' and 'top_pick_order' lists and a
+            'reveals' list holding each candidate's 'slot',
+            'name', 'id', percentage 'chance' of being revealed
+            next, resulting 'state' token and 'teams' odds
+        - etag (str): Strong ETag of body
+
+    Raises:
+
+        - ValueError: If the state token is invalid
+    """
+
+    season = season or DEFAULT_SEASON
+    cached = API_CACHE.get(('what-if', season.name, token))
+    if cached is not None:
+        return cached
+
+    reveals = utils.decode_state(token, season.lottery_info)
+    state, branches = what_if.next_reveals(reveals, season)
+    teams_selected, top_pick_list, top_pick_order = state
+
+    payload = {'season': season.name,
+               'state': utils.encode_state(teams_selected),
+               'teams_selected': teams_selected,
+               'top_pick_list': top_pick_list,
+               'top_pick_order': top_pick_order,
+               'reveals': [{'slot': branch.team,
+                            'name': season.lottery_info[branch.team]['name'],
+                            'id': season.lottery_info[branch.team]['id'],
+                            'chance': lottery_odds.round_percentage(
+                                branch.probability),
+                            'state': branch.state.token,
+                            'teams': lottery_odds.payload_teams(
+                                branch.prob_matrix, season)}
+                           for branch in branches]}
+
+    cached = _serialize(payload)
+    API_CACHE.put(('what-if', season.name, token), cached)
+
+    return cached
+
+
+def outcomes_json(token, season=None):
+    """ outcomes_json returns the serialized joint
+    distribution of the top picks in the state reached
+    by revealing the teams in token
+
+    @param token (str): State token built by
+        utils.encode_state
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - body (bytes): JSON document with the 'season'
+            name, the canonical 'state' token, the 'teams_selected',
+            'top_pick_list' and 'top_pick_order' lists, the
+            'total_teams' and 'top_picks' numbers and the
+            'index' and exact 'probability' of each possible
+            outcome, see outcomes.encode_order
+        - etag (str): Strong ETag of body
+
+    Raises:
+
+        - ValueError: If the state token is invalid
+    """
+
+    season = season or DEFAULT_SEASON
+    cached = API_CACHE.get(('outcomes', season.name, token))
+    if cached is not None:
+        return cached
+
+    reveals = utils.decode_state(token, season.lottery_info)
+    teams_selected, top_pick_list, top_pick_order, _ = \
+        utils.replay_state(season.lottery_info, reveals, season.top_picks)
+    joint = outcomes.joint_outcomes(teams_selected, top_pick_list,
+                                    top_pick_order, season)
+
+    payload = {'season': season.name,
+               'state': utils.encode_state(teams_selected),
+               'teams_selected': teams_selected,
+               'top_pick_list': top_pick_list,
+               'top_pick_order': top_pick_order,
+               'total_teams': len(season.lottery_info),
+               'top_picks': season.top_picks,
+               'index': joint.index.tolist(),
+               'probability': joint.probability.tolist()}
+
+    cached = _serialize(payload)
+    API_CACHE.put(('outcomes', season.name, token), cached)
+
+    return cached
+
+
+def simulation_ndjson(token, season=None, lotteries=100000):
+    """ simulation_ndjson simulates lotteries from the state
+    reached by revealing the teams in token, applying the
+    season's pick rules, and streams the running estimates
+    as newline-delimited JSON, one line per SIMULATION_CHUNK
+    lotteries
+
+    @param token (str): State token built by
+        utils.encode_state
+    @param season (Season): Season of the lottery,
+        the default season if None
+    @param lotteries (int): Number of lotteries to simulate
+
+    Returns:
+
+        - lines (generator): Generator of JSON lines with the
+            'season' name, the 'state' token, the number of
+            'lotteries' simulated so far, the 'samples' among
+            them consistent with the state and the percentage
+            'odds' of each owner row's 'slot' and 'name'
+
+    Raises:
+
+        - ValueError: If the state token is invalid
+    """
+
+    season = season or DEFAULT_SEASON
+    reveals = utils.decode_state(token, season.lottery_info)
+    state = tuple(utils.replay_state(season.lottery_info, reveals,
+                                     season.top_picks)[:3])
+
+    return _simulation_lines(state, season, lotteries)
+
+
+def _simulation_lines(state, season, lotteries):
+    """ Generates the lines of simulation_ndjson
+    """
+
+    from app import simulate
+
+    results = simulate.simulate_iter(season.lotto_chances, season.top_picks,
+                                     *state, lotteries=lotteries,
+                                     chunk_size=SIMULATION_CHUNK,
+                                     rules=season.rules)
+    for chunk, result in enumerate(results, 1):
+        rows = []
+        for row in result.owner_rows(state, season):
+            if row.pick is None:
+                lower, upper = result.bounds(row.probabilities)
+            else:
+                lower = upper = row.probabilities
+            rows.append({'slot': row.slot, 'name': row.name,
+                         'odds': _percentages(row.probabilities),
+                         'lower': _percentages(lower),
+                         'upper': _percentages(upper)})
+        payload = {'season': season.name,
+                   'state': utils.encode_state(state[0]),
+                   'lotteries': min(chunk * SIMULATION_CHUNK, lotteries),
+                   'effective_samples': round(result.effective_samples),
+                   'rows': rows}
+        yield _serialize(payload)[0] + b'\n'
+
+
+def _percentages(probabilities):
+    """ Rounds probabilities to percentages as the site does
+    """
+
+    return [lottery_odds.round_percentage(float(prob))
+            for prob in probabilities]
+
+
+def _serialize(payload):
+    """ Serializes a payload compactly, returning
+    the body and its strong ETag
+    """
+
+    body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return body, hashlib.sha1(body).hexdigest()
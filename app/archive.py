@@ -0,0 +1,323 @@
+"""
+archive.py
+
+Historical lottery archive. Season formats and the
+order their teams were revealed are stored as columns
+of numpy arrays, one .npy file per column, and a bulk
+backtest runs the odds engine over every reveal of
+every season in a process pool, writing the odds at
+each step and their calibration against the actual
+draft order back to the archive. Past seasons the site
+does not serve are read from their own season files in
+ARCHIVE_SEASON_DIR:
+
+    python -m app.archive import
+    python -m app.archive backtest --processes 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+from app import lottery_odds
+from app.lottery_state import LotteryState
+from app.precompute import TABLE_DIR
+from app.season import load_seasons, parse_season, SEASON_DIR, \
+    SEASON_EXTENSIONS, SEASONS
+
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(TABLE_DIR, 'archive'))
+
+# Season files of past lotteries, kept apart from SEASON_DIR so that
+# archiving a season does not serve it or build its odds table
+ARCHIVE_SEASON_DIR = os.environ.get('ARCHIVE_SEASON_DIR',
+                                    os.path.join(SEASON_DIR, 'history'))
+
+# Probability floor keeping the log loss of impossible outcomes finite
+MIN_PROBABILITY = 1e-15
+
+
+def write_table(archive_dir, name, columns):
+    """ write_table stores a table as one .npy file
+    per column in archive_dir/name
+
+    @param archive_dir (str): Directory of the archive
+    @param name (str): Name of the table
+    @param columns (dict): Dictionary of equal length
+        sequences keyed by column name
+    """
+
+    import numpy as np
+
+    table_dir = os.path.join(archive_dir, name)
+    if not os.path.isdir(table_dir):
+        os.makedirs(table_dir)
+    for column, values in columns.items():
+        np.save(os.path.join(table_dir, column + '.npy'), np.asarray(values))
+
+
+def read_table(archive_dir, name):
+    """ read_table memory-maps the columns of a table
+
+    @param archive_dir (str): Directory of the archive
+    @param name (str): Name of the table
+
+    Returns:
+
+        - columns (dict): Dictionary of arrays keyed by
+            column name
+    """
+
+    import numpy as np
+
+    table_dir = os.path.join(archive_dir, name)
+    return {filename[:-len('.npy')]:
+            np.load(os.path.join(table_dir, filename), mmap_mode='r')
+            for filename in sorted(os.listdir(table_dir))
+            if filename.endswith('.npy')}
+
+
+def archive_seasons(season_dir=ARCHIVE_SEASON_DIR):
+    """ archive_seasons returns the seasons that can be
+    imported: the past seasons in season_dir and the
+    seasons served by the site
+
+    @param season_dir (str): Directory of past season files,
+        which may be missing
+
+    Returns:
+
+        - seasons (dict): Dictionary of Season tuples keyed
+            by name, sorted by name. Served seasons replace
+            past seasons of the same name
+    """
+
+    seasons = {}
+    if os.path.isdir(season_dir) and \
+            any(os.path.splitext(filename)[1] in SEASON_EXTENSIONS
+                for filename in os.listdir(season_dir)):
+        seasons.update(load_seasons(season_dir))
+    seasons.update(SEASONS)
+
+    return dict(sorted(seasons.items()))
+
+
+def import_seasons(seasons, archive_dir=ARCHIVE_DIR):
+    """ import_seasons writes the format and reveals of
+    each drawn season to the archive's 'seasons', 'teams'
+    and 'reveals' tables, replacing their contents
+
+    @param seasons (list): List of Season tuples. Seasons
+        without reveals are skipped
+    @param archive_dir (str): Directory of the archive
+
+    Returns:
+
+        - names (list): Names of the seasons imported
+    """
+
+    drawn = [season for season in seasons if season.reveals]
+    write_table(archive_dir, 'seasons',
+                {'season': [season.name for season in drawn],
+                 'title': [season.title for season in drawn],
+                 'top_picks': [season.top_picks for season in drawn]})
+    write_table(archive_dir, 'teams',
+                {'season': [season.name for season in drawn
+                            for _ in season.lottery_info],
+                 'slot': [slot for season in drawn
+                          for slot in season.lottery_info],
+                 'name': [info['name'] for season in drawn
+                          for info in season.lottery_info.values()],
+                 'id': [info['id'] for season in drawn
+                        for info in season.lottery_info.values()],
+                 'chances': [season.lotto_chances[slot] for season in drawn
+                             for slot in season.lottery_info]})
+    write_table(archive_dir, 'reveals',
+                {'season': [season.name for season in drawn
+                            for _ in season.reveals],
+                 'step': [step for season in drawn
+                          for step in range(1, len(season.reveals) + 1)],
+                 'slot': [slot for season in drawn
+                          for slot in season.reveals]})
+
+    return [season.name for season in drawn]
+
+
+def load_configs(archive_dir=ARCHIVE_DIR):
+    """ load_configs reads the seasons of the archive
+    back into season configurations
+
+    @param archive_dir (str): Directory of the archive
+
+    Returns:
+
+        - configs (list): List of (name, config) tuples,
+            with configs in the format read by
+            season.parse_season
+    """
+
+    seasons = read_table(archive_dir, 'seasons')
+    teams = read_table(archive_dir, 'teams')
+    reveals = read_table(archive_dir, 'reveals')
+
+    configs = []
+    for name, title, top_picks in zip(seasons['season'], seasons['title'],
+                                      seasons['top_picks']):
+        rows = sorted((int(slot), str(team), str(team_id), int(chances))
+                      for season, slot, team, team_id, chances
+                      in zip(teams['season'], teams['slot'], teams['name'],
+                             teams['id'], teams['chances'])
+                      if season == name)
+        names = {slot: team for slot, team, _, _ in rows}
+        steps = sorted((int(step), int(slot))
+                       for season, step, slot
+                       in zip(reveals['season'], reveals['step'],
+                              reveals['slot'])
+                       if season == name)
+        configs.append((str(name),
+                        {'title': str(title),
+                         'top_picks': int(top_picks),
+                         'teams': [{'name': team, 'id': team_id,
+                                    'chances': chances}
+                                   for _, team, team_id, chances in rows],
+                         'reveals': [names[slot] for _, slot in steps]}))
+
+    return configs
+
+
+def backtest_season(name_config):
+    """ backtest_season runs the odds engine over every
+    reveal of one season in a single batch and scores
+    each step against the actual draft order
+
+    @param name_config (tuple): (name, config) tuple as
+        returned by load_configs, so it can be sent to
+        a worker process
+
+    Returns:
+
+        - name (str): Name of the season
+        - matrices (ndarray): Array of shape (steps, teams,
+            picks) with the odds before the first reveal and
+            after each reveal
+        - log_loss (list): Mean negative log probability of
+            the pick each team received, at each step
+        - brier (list): Mean Brier score of each team's
+            pick distribution, at each step
+    """
+
+    import numpy as np
+
+    season = parse_season(*name_config)
+    state = LotteryState.start(season.lottery_info, season.top_picks)
+    states = [state]
+    for team in season.reveals:
+        if not state.selected & season.lottery_info.bits[team]:
+            state = state.reveal(team)
+            states.append(state)
+
+    matrices = lottery_odds.pick_probability_matrices(
+        season.lotto_chances, season.top_picks,
+        [state.key for state in states])
+
+    # The pick of each team in the final draft order
+    total_teams = len(season.lottery_info)
+    outcome = np.zeros((total_teams, total_teams))
+    for pick, team in zip(range(total_teams, 0, -1), state.teams_selected):
+        outcome[team - 1, pick - 1] = 1
+
+    actual = (matrices * outcome).sum(axis=2)
+    log_loss = 0.0 - np.log(np.maximum(actual, MIN_PROBABILITY)).mean(axis=1)
+    brier = ((matrices - outcome) ** 2).sum(axis=2).mean(axis=1)
+
+    return season.name, matrices, log_loss.tolist(), brier.tolist()
+
+
+def backtest(archive_dir=ARCHIVE_DIR, processes=None):
+    """ backtest scores every season of the archive in a
+    process pool and writes the odds of every step to the
+    'odds' table and the scores to the 'steps' table
+
+    @param archive_dir (str): Directory of the archive
+    @param processes (int): Number of worker processes,
+        one per CPU if None
+
+    Returns:
+
+        - steps (dict): Columns of the 'steps' table:
+            'season', 'step', 'log_loss' and 'brier'
+    """
+
+    import numpy as np
+
+    configs = load_configs(archive_dir)
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(backtest_season, configs)
+
+    steps = {'season': [], 'step': [], 'log_loss': [], 'brier': []}
+    odds = {'season': [], 'step': [], 'slot': [], 'pick': [],
+            'probability': []}
+    for name, matrices, log_loss, brier in results:
+        count, total_teams, _ = matrices.shape
+        steps['season'].extend([name] * count)
+        steps['step'].extend(range(count))
+        steps['log_loss'].extend(log_loss)
+        steps['brier'].extend(brier)
+
+        step, slot, pick = np.indices(matrices.shape).reshape(3, -1)
+        odds['season'].extend([name] * matrices.size)
+        odds['step'].append(step)
+        odds['slot'].append(slot + 1)
+        odds['pick'].append(pick + 1)
+        odds['probability'].append(matrices.ravel())
+
+    for column in ('step', 'slot', 'pick', 'probability'):
+        odds[column] = np.concatenate(odds[column]) if odds[column] else []
+    write_table(archive_dir, 'odds', odds)
+    write_table(archive_dir, 'steps', steps)
+
+    return steps
+
+
+def main(argv=None):
+    """ Command line entry point that imports the
+    drawn seasons or backtests the archive
+    """
+
+    parser = argparse.ArgumentParser(description='Archive and backtest '
+                                                 'past lotteries')
+    parser.add_argument('command', choices=['import', 'backtest'])
+    parser.add_argument('--archive', default=ARCHIVE_DIR,
+                        help='Directory of the archive')
+    parser.add_argument('--seasons', default=ARCHIVE_SEASON_DIR,
+                        help='Directory of past season files')
+    parser.add_argument('--season', action='append',
+                        help='Season to import, every drawn season by default')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Worker processes, one per CPU by default')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        seasons = archive_seasons(args.seasons)
+        unknown = set(args.season or []).difference(seasons)
+        if unknown:
+            parser.error('unknown seasons: %s' % ', '.join(sorted(unknown)))
+        names = import_seasons([seasons[name]
+                                for name in args.season or seasons],
+                               args.archive)
+        print('Imported %s to %s' % (', '.join(names) or 'no seasons',
+                                     args.archive))
+        return 0
+
+    steps = backtest(args.archive, args.processes)
+    for name, step, log_loss, brier in zip(steps['season'], steps['step'],
+                                           steps['log_loss'], steps['brier']):
+        print(json.dumps({'season': name, 'step': step,
+                          'log_loss': round(log_loss, 4),
+                          'brier': round(brier, 4)}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
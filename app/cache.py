@@ -0,0 +1,120 @@
+"""
+cache.py
+
+Bounded least-recently-used cache used to
+keep rendered odds tables between requests
+"""
+
+import collections
+import threading
+import weakref
+
+from app.utils import pack_teams
+
+# Every LRUCache created, so they can be cleared together
+_CACHES = weakref.WeakSet()
+
+
+class LRUCache(object):
+    """ LRUCache is a thread-safe mapping with a
+    maximum size that evicts the least recently
+    used entry and counts hits, misses and evictions
+
+    @param max_size (int): Maximum number of entries
+        held before the oldest is evicted
+    """
+
+    def __init__(self, max_size=1024):
+        if max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        _CACHES.add(self)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """ get returns the value stored for key,
+        marking it as most recently used
+        """
+
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """ put stores value for key, evicting the least
+        recently used entry if the cache is full
+        """
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """ get_or_compute returns the value stored for key,
+        calling compute() and storing its result on a miss
+        """
+
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """ clear drops every entry, keeping the counters
+        """
+
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ stats returns the cache counters
+
+        Returns:
+
+            - stats (dict): Dictionary with 'size', 'max_size',
+                'hits', 'misses' and 'evictions' keys
+        """
+
+        with self._lock:
+            return {'size': len(self._entries),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+
+def clear_caches():
+    """ clear_caches clears every LRUCache, e.g. when
+    the lottery configuration changes
+    """
+
+    for lru in list(_CACHES):
+        lru.clear()
+
+
+def state_cache_key(teams_selected, top_pick_list, top_pick_order):
+    """ state_cache_key packs the three state lists into
+    an immutable key, using the same packing as the
+    state tokens carried in request URLs
+    """
+
+    return b''.join(bytes([len(part)]) + pack_teams(part)
+                    for part in (teams_selected, top_pick_list,
+                                 top_pick_order))
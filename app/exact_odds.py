@@ -0,0 +1,232 @@
+"""
+exact_odds.py
+
+Exact odds in rational arithmetic. The probability of
+every set of teams drawn is a fraction of integer ball
+counts, so the odds of a state can be computed without
+rounding and checked against the float engine. Draws
+from the same teams are shared by every state that
+leaves them in the draw, so their probabilities are
+computed once:
+
+    python -m app.exact_odds [--season 2023]
+"""
+
+import argparse
+import fractions
+import functools
+import math
+import sys
+
+import numpy as np
+
+from app import lottery_odds
+from app.precompute import enumerate_states
+from app.season import DEFAULT_SEASON, SEASONS
+
+
+def exact_pick_probability_matrix(lotto_combos, top_picks,
+                                  teams_selected, top_pick_list,
+                                  top_pick_order):
+    """ exact_pick_probability_matrix calculates the
+    probability of each team receiving each pick as a
+    fraction, with the dynamic program of
+    lottery_odds.pick_probability_matrix
+
+    Every probability is carried as an integer over the
+    common denominator scale ** draws, where scale is the
+    least common multiple of the balls left after each set
+    of teams that can be drawn, so drawing one more team
+    only multiplies by integers
+
+    @param lotto_combos (dict): Dictionary keyed by team
+        lottery order with values corresponding to each team's
+        lottery chances
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param teams_selected (list): List containing the team lottery
+        order of teams already revealed in the lottery
+    @param top_pick_list (list): List containing the team lottery
+        order of teams already revealed to be in the top picks
+    @param top_pick_order (list): List containing the order of the
+        top picks as they are revealed
+
+    Returns:
+
+        - prob_matrix (list): List with one row per team in
+            lottery order and one column per pick, holding
+            Fraction probabilities
+    """
+
+    total_teams = len(lotto_combos)
+    draws = max(top_picks - len(top_pick_order), 0)
+    pool = tuple((team, lotto_combos[team]) for team in sorted(lotto_combos)
+                 if team not in teams_selected)
+    bits = {team: 1 << ind for ind, (team, _) in enumerate(pool)}
+    required = 0
+    for top_pick in top_pick_list:
+        if top_pick not in teams_selected:
+            required |= bits[top_pick]
+
+    levels, steps = _draw_sets(pool, draws)
+
+    # Scaled probability that the remaining draws from a set include
+    # every team known to be in the top picks
+    completion = {mask: int(mask & required == required)
+                  for mask in levels[-1]}
+    for level in range(draws - 1, -1, -1):
+        for mask in levels[level]:
+            completion[mask] = sum(completion[mask | bit] * step
+                                   for _, bit, step in steps[mask])
+
+    prob_matrix = [[0] * total_teams for _ in range(total_teams)]
+    for level in range(draws):
+        for mask, weight in levels[level].items():
+            for team, bit, step in steps[mask]:
+                prob_matrix[team - 1][level] += \
+                    weight * step * completion[mask | bit]
+
+    # Integer weights stay exact in arrays of Python objects
+    final = [mask for mask in levels[-1] if completion[mask]]
+    matrix = np.array(prob_matrix, dtype=object)
+    lottery_odds.add_fall_spots(
+        matrix, [[bool(mask & bit) for bit in bits.values()]
+                 for mask in final],
+        np.array([levels[-1][mask] for mask in final], dtype=object),
+        np.array([team - 1 for team, _ in pool], dtype=np.intp), top_picks)
+    prob_matrix = matrix.tolist()
+
+    certain = lottery_odds.certain_picks(total_teams, top_picks,
+                                         teams_selected, top_pick_list,
+                                         top_pick_order)
+    for team, row in enumerate(prob_matrix, 1):
+        if team in certain:
+            row[:] = [0] * total_teams
+            row[certain[team]] = 1
+        # Every entry shares the scale, so normalizing cancels it
+        total = sum(row) or 1
+        row[:] = [fractions.Fraction(prob, total) for prob in row]
+
+    return prob_matrix
+
+
+@functools.lru_cache(maxsize=1024)
+def _draw_sets(pool, draws):
+    """ Returns the scaled probability of drawing each set of
+    teams out of pool, level by level, and for each set that
+    can be drawn from the (team, bit, step) of every team that
+    can be drawn next, where step is its chance of being drawn
+    times the scale. pool is a tuple of (team, combos) pairs
+    """
+
+    balls = {0: sum(combos for _, combos in pool)}
+    masks = [[0]] if draws else []
+    for _ in range(draws - 1):
+        next_masks = {}
+        for mask in masks[-1]:
+            for ind, (_, combos) in enumerate(pool):
+                if not mask & 1 << ind:
+                    next_masks[mask | 1 << ind] = balls[mask] - combos
+        balls.update(next_masks)
+        masks.append(list(next_masks))
+    scale = functools.reduce(lambda a, b: a * b // math.gcd(a, b),
+                             (count for count in balls.values() if count), 1)
+
+    steps = {mask: [(team, 1 << ind, combos * (scale // balls[mask]))
+                    for ind, (team, combos) in enumerate(pool)
+                    if not mask & 1 << ind]
+             for level in masks for mask in level}
+    levels = [{0: 1}]
+    for _ in range(draws):
+        next_level = {}
+        for mask, weight in levels[-1].items():
+            for _, bit, step in steps[mask]:
+                next_level[mask | bit] = next_level.get(mask | bit, 0) + \
+                    weight * step
+        levels.append(next_level)
+
+    return levels, steps
+
+
+def percentages(prob_matrix, places=1):
+    """ percentages rounds exact probabilities to
+    percentages, rounding exact halves up
+
+    @param prob_matrix (list): Matrix returned by
+        exact_pick_probability_matrix
+    @param places (int): Number of decimal places
+
+    Returns:
+
+        - prob_dict (dict): Dictionary keyed by team lottery
+            order in the format of calculate_pick_probabilities
+    """
+
+    scale = 10 ** places
+    return {team: [float(fractions.Fraction(int(100 * scale * prob +
+                                                fractions.Fraction(1, 2)),
+                                            scale))
+                   for prob in row]
+            for team, row in enumerate(prob_matrix, 1)}
+
+
+def cross_validate(season=None, states=None):
+    """ cross_validate compares the float engine with
+    exact arithmetic
+
+    @param season (Season): Season to check, the default
+        season if None
+    @param states (list): List of (teams_selected, top_pick_list,
+        top_pick_order) tuples, every state the site can
+        reach if None
+
+    Returns:
+
+        - count (int): Number of states compared
+        - max_error (float): Largest absolute difference
+            between a float and an exact probability
+    """
+
+    season = season or DEFAULT_SEASON
+    if states is None:
+        states = enumerate_states(season.lottery_info, season.top_picks)
+
+    float_matrices = lottery_odds.pick_probability_matrices(
+        season.lotto_chances, season.top_picks, states)
+
+    max_error = 0.0
+    for state, float_matrix in zip(states, float_matrices):
+        exact_matrix = exact_pick_probability_matrix(
+            season.lotto_chances, season.top_picks, *state)
+        for float_row, exact_row in zip(float_matrix.tolist(), exact_matrix):
+            for value, exact in zip(float_row, exact_row):
+                max_error = max(max_error,
+                                abs(float(fractions.Fraction(value) - exact)))
+
+    return len(states), max_error
+
+
+def main(argv=None):
+    """ Command line entry point that checks the float
+    engine against exact arithmetic on every state
+    """
+
+    parser = argparse.ArgumentParser(description='Check the lottery odds '
+                                                 'with exact arithmetic')
+    parser.add_argument('--season', action='append', choices=sorted(SEASONS),
+                        help='Season to check, every season by default')
+    parser.add_argument('--tolerance', type=float, default=1e-12,
+                        help='Largest absolute error accepted')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.season or sorted(SEASONS):
+        count, max_error = cross_validate(SEASONS[name])
+        print('%s: %d states, max error %.3g' % (name, count, max_error))
+        failed = failed or max_error > args.tolerance
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
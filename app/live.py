@@ -0,0 +1,363 @@
+"""
+live.py
+
+Operator-driven live mode. One admin submits each
+team as it is revealed, the odds are computed once
+per reveal and the serialized payload is pushed to
+every connected viewer over Server-Sent Events, with
+a long-poll fallback.
+
+The live state is kept in a store shared by every
+worker: a versioned JSON file at LIVE_STATE_PATH, or
+Redis at LIVE_REDIS_URL when set. The worker taking a
+reveal writes the new payload to the store, and one
+watcher per worker polls the store's version and wakes
+the viewers connected to that worker.
+"""
+
+import fcntl
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+
+from app import lottery_odds
+from app import utils
+from app.lottery_state import LotteryState
+
+ADMIN_TOKEN = os.environ.get('LIVE_ADMIN_TOKEN', '')
+
+# Shared live state, see live_store
+STATE_PATH = os.environ.get('LIVE_STATE_PATH',
+                            os.path.join(tempfile.gettempdir(),
+                                         'nba_lottery_live.json'))
+REDIS_URL = os.environ.get('LIVE_REDIS_URL', '')
+
+# Seconds between checks of the store for a newer live state
+POLL_INTERVAL = float(os.environ.get('LIVE_POLL_SECONDS', 0.5))
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT = 15
+
+
+def _record(version, payload):
+    """ Serializes a payload dictionary with its version
+    """
+
+    payload['version'] = version
+    return json.dumps(payload, separators=(',', ':'))
+
+
+class FileLiveStore(object):
+    """ FileLiveStore keeps the live state in a JSON file,
+    rewritten atomically on each update under an exclusive
+    lock, so every worker of a server reads the same state
+
+    @param path (str): Path to the state file
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stat = None
+        self._state = (0, [], None)
+
+    def read(self):
+        """ read returns the current live state, parsing
+        the file only when it was replaced since the last read
+
+        Returns:
+
+            - version (int): Version of the state, 0 if none
+                was published yet
+            - teams_selected (list): Team lottery orders revealed
+            - payload (str): JSON payload of the state
+        """
+
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return 0, [], None
+
+        with self._lock:
+            if (stat.st_ino, stat.st_mtime_ns) != self._stat:
+                with open(self.path) as state_file:
+                    saved = json.load(state_file)
+                self._state = (saved['version'], saved['teams_selected'],
+                               saved['payload'])
+                self._stat = (stat.st_ino, stat.st_mtime_ns)
+            return self._state
+
+    def update(self, compute):
+        """ update replaces the live state with the state
+        computed from the current one
+
+        @param compute (function): Function taking the current
+            teams_selected and returning the new teams_selected
+            and payload dictionary
+
+        Returns:
+
+            - version (int): Version of the new state
+            - payload (str): JSON payload of the new state
+        """
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            version, teams_selected, _ = self.read()
+            teams_selected, payload = compute(teams_selected)
+            payload = _record(version + 1, payload)
+
+            temp_path = '%s.%d.tmp' % (self.path, os.getpid())
+            with open(temp_path, 'w') as state_file:
+                json.dump({'version': version + 1,
+                           'teams_selected': list(teams_selected),
+                           'payload': payload}, state_file)
+            os.replace(temp_path, self.path)
+
+        return version + 1, payload
+
+
+class RedisLiveStore(object):
+    """ RedisLiveStore keeps the live state in a Redis
+    hash, so servers on several machines share it.
+    Requires the redis package
+
+    @param url (str): Redis URL, e.g. redis://host:6379/0
+    @param key (str): Key of the hash
+    """
+
+    def __init__(self, url, key='nba_lottery:live'):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.key = key
+
+    def read(self):
+        """ read returns the current live state,
+        see FileLiveStore.read
+        """
+
+        version, teams_selected, payload = \
+            self._client.hmget(self.key, 'version', 'teams_selected',
+                               'payload')
+        if version is None:
+            return 0, [], None
+
+        return int(version), json.loads(teams_selected), \
+            payload.decode('utf-8')
+
+    def update(self, compute):
+        """ update replaces the live state with the state
+        computed from the current one, see FileLiveStore.update
+        """
+
+        with self._client.lock(self.key + ':lock', timeout=30):
+            version, teams_selected, _ = self.read()
+            teams_selected, payload = compute(teams_selected)
+            payload = _record(version + 1, payload)
+            self._client.hset(self.key, mapping={
+                'version': version + 1,
+                'teams_selected': json.dumps(list(teams_selected)),
+                'payload': payload})
+
+        return version + 1, payload
+
+
+def live_store():
+    """ live_store returns the store configured by
+    LIVE_REDIS_URL or LIVE_STATE_PATH
+    """
+
+    if REDIS_URL:
+        return RedisLiveStore(REDIS_URL)
+
+    return FileLiveStore(STATE_PATH)
+
+
+class LiveBroadcast(object):
+    """ LiveBroadcast publishes the live lottery state
+    and its pre-serialized odds payload to a shared
+    store, and wakes every viewer waiting in this
+    process when the store's state changes
+
+    @param lottery_info (dict): Dictionary keyed by
+        reverse standings order, with dictionary
+        values containing 'name' and 'id' keys
+        for the team
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param store (FileLiveStore or RedisLiveStore): Shared
+        live state, live_store() by default
+    """
+
+    def __init__(self, lottery_info, top_picks=4, store=None):
+        self.lottery_info = lottery_info
+        self.top_picks = top_picks
+        self.store = store or live_store()
+        self._condition = threading.Condition()
+        self._state = (0, None)
+        # Threads do not survive a fork, so each worker
+        # starts its own watcher
+        self._watcher_pid = None
+        if self.store.read()[0] == 0:
+            self.reset()
+
+    @property
+    def version(self):
+        """ The version of the shared live state
+        """
+
+        return self.store.read()[0]
+
+    @property
+    def teams_selected(self):
+        """ The team lottery orders revealed in the
+        shared live state
+        """
+
+        return self.store.read()[1]
+
+    @property
+    def payload(self):
+        """ The JSON payload of the shared live state
+        """
+
+        return self.store.read()[2]
+
+    def _publish(self, compute):
+        """ Writes the state computed from the current one
+        to the store and wakes the viewers in this process
+        """
+
+        def state_payload(teams_selected):
+            teams_selected, top_pick_list, top_pick_order = \
+                compute(teams_selected)
+            payload = lottery_odds.odds_payload(teams_selected,
+                                                top_pick_list,
+                                                top_pick_order)
+            payload['state'] = utils.encode_state(teams_selected)
+            payload['draft_order'] = \
+                utils.draft_order(self.lottery_info, teams_selected)
+            return teams_selected, payload
+
+        self._notify(*self.store.update(state_payload))
+
+    def _notify(self, version, payload):
+        """ Wakes the viewers in this process if version
+        is newer than the state they have
+        """
+
+        with self._condition:
+            if version > self._state[0]:
+                self._state = (version, payload)
+                self._condition.notify_all()
+
+    def _watch(self):
+        """ Polls the store and wakes the viewers in this
+        process when another worker publishes a state
+        """
+
+        while True:
+            version, _, payload = self.store.read()
+            self._notify(version, payload)
+            time.sleep(POLL_INTERVAL)
+
+    def _start_watcher(self):
+        """ Starts the watcher of this process once
+        """
+
+        with self._condition:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def reveal(self, team):
+        """ reveal applies the team revealed to the live
+        state and broadcasts the new odds
+
+        @param team (str): Name of the team revealed, which
+            must be in the dropdown
+
+        Raises:
+
+            - ValueError: If the team cannot be revealed next
+        """
+
+        def reveal_team(teams_selected):
+            state = LotteryState.from_token(utils.encode_state(teams_selected),
+                                            self.lottery_info, self.top_picks)
+            return state.reveal(team).key
+
+        self._publish(reveal_team)
+
+    def reset(self):
+        """ reset starts the live lottery over
+        """
+
+        self._publish(lambda teams_selected: ((), (), ()))
+
+    def wait(self, version, timeout=None):
+        """ wait blocks until the live state differs from
+        version or timeout seconds pass
+
+        @param version (int): Last version seen by the viewer
+        @param timeout (float): Maximum seconds to wait
+
+        Returns:
+
+            - version (int): Current version
+            - payload (str): Current JSON payload
+        """
+
+        self._start_watcher()
+        with self._condition:
+            if self._state[1] is None:
+                current, _, payload = self.store.read()
+                self._state = (current, payload)
+            self._condition.wait_for(lambda: self._state[0] != version,
+                                     timeout)
+            return self._state
+
+    def events(self, version=0):
+        """ events yields Server-Sent Events carrying every
+        new payload, with keep-alive comments in between
+
+        @param version (int): Last version seen by the viewer,
+            e.g. from the Last-Event-ID header
+
+        Returns:
+
+            - events (generator): Generator of event strings
+        """
+
+        while True:
+            current, payload = self.wait(version, HEARTBEAT)
+            if current != version:
+                version = current
+                yield 'id: %d\nevent: odds\ndata: %s\n\n' % (version, payload)
+            else:
+                yield ': keep-alive\n\n'
+
+
+def is_admin(request):
+    """ is_admin checks the bearer token of a request
+    against LIVE_ADMIN_TOKEN. Live mode is closed when
+    no token is configured
+
+    @param request (flask.request object): Object containing
+        headers attributes
+    """
+
+    header = request.headers.get('Authorization', '')
+    if not ADMIN_TOKEN or not header.startswith('Bearer '):
+        return False
+
+    return hmac.compare_digest(header[len('Bearer '):].encode('utf-8'),
+                               ADMIN_TOKEN.encode('utf-8'))
@@ -1,27 +1,359 @@
+import collections
+import decimal
+import functools
 import itertools
-import numpy as np
-import pandas as pd
-
-LOTTERY_INFO = {1: {'name': 'Pistons', 'id': '1610612765'},
-                2: {'name': 'Rockets', 'id': '1610612745'},
-                3: {'name': 'Spurs', 'id': '1610612759'},
-                4: {'name': 'Hornets', 'id': '1610612766'},
-                5: {'name': 'Trailblazers', 'id': '1610612757'},
-                6: {'name': 'Magic', 'id': '1610612753'},
-                7: {'name': 'Pacers', 'id': '1610612754'},
-                8: {'name': 'Wizards', 'id': '1610612764'},
-                9: {'name': 'Jazz', 'id': '1610612762'},
-                10: {'name': 'Mavericks', 'id': '1610612742'},
-                11: {'name': 'Bulls', 'id': '1610612741'},
-                12: {'name': 'Thunder', 'id': '1610612760'},
-                13: {'name': 'Raptors', 'id': '1610612761'},
-                14: {'name': 'Pelicans', 'id': '1610612740'}}
-
-LOTTO_CHANCES = {1: 140, 2: 140, 3: 140,
-                 4: 125, 5: 105, 6: 90, 7: 75,
-                 8: 60, 9: 45, 10: 30, 11: 20, 12: 15,
-                 13: 10, 14: 5}
-TOP_PICKS = 4
+import os
+import sys
+
+from app.cache import clear_caches, LRUCache, state_cache_key
+from app.metrics import stage
+from app.render import render_odds_table
+from app.rules import owner_rows
+from app.season import DEFAULT_SEASON, SEASONS
+
+# The default season's format, see app/seasons
+LOTTERY_INFO = DEFAULT_SEASON.lottery_info
+LOTTO_CHANCES = DEFAULT_SEASON.lotto_chances
+TOP_PICKS = DEFAULT_SEASON.top_picks
+
+# numpy is imported inside the engine functions, so that serving
+# states from the precomputed table does not need to load it
+
+# A row of the odds table: the pick owner's name and formatted odds
+TableRow = collections.namedtuple('TableRow', ['name', 'cells'])
+
+# Precomputed tables of pick probabilities by lottery state,
+# keyed by season name and installed at startup with set_odds_table
+ODDS_TABLES = {}
+
+# Rendered odds tables keyed by lottery state, one cache per season
+ODDS_CACHE_SIZE = int(os.environ.get('ODDS_CACHE_SIZE', 4096))
+ODDS_CACHES = {name: LRUCache(ODDS_CACHE_SIZE) for name in SEASONS}
+ODDS_CACHE = ODDS_CACHES[DEFAULT_SEASON.name]
+
+# Precision of the displayed percentages, see round_percentage
+ONE_DECIMAL = decimal.Decimal('0.1')
+
+# Upper bound on states x draw orders evaluated at once by the batched kernel
+KERNEL_CHUNK = 1 << 20
+
+
+def pick_probability_matrix(lotto_combos, top_picks,
+                            teams_selected, top_pick_list,
+                            top_pick_order):
+    """ pick_probability_matrix calculates the probability of each
+    team receiving picks 1-14 in the NBA Lottery with a single
+    dynamic program over the set of teams already drawn.
+
+    Every ordered draw of the remaining top picks is reached by
+    adding one team at a time to a set of drawn teams. The
+    forward pass accumulates the probability of reaching each
+    set, the backward pass the probability that a set can be
+    completed into a draw consistent with the teams known to be
+    in the top picks. Both passes are shared by all teams.
+
+    @param lotto_combos (dict): Dictionary keyed by team
+        lottery order with values corresponding to each team's
+        lottery chances
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery. The rest of the
+        picks are slotted in reverse order of team record
+    @param teams_selected (list): List containing the team lottery
+        order of teams already revealed in the lottery and not in
+        the top_picks number of picks
+    @param top_pick_list (list): List containing the team lottery
+        order of teams already revealed to be in the top_picks number
+        of picks
+    @param top_pick_order (list): List containing the order of the
+        top picks as they are revealed
+
+    Returns:
+
+        prob_matrix (ndarray): Array with one row per team in
+            lottery order and one column per draft pick containing
+            the probability of the team receiving that pick
+    """
+
+    import numpy as np
+
+    total_teams = len(lotto_combos)
+    draws = top_picks - len(top_pick_order)
+
+    # Only teams that have not been revealed can still be drawn
+    pool = [team for team in sorted(lotto_combos) if team not in teams_selected]
+    bits = {team: 1 << ind for ind, team in enumerate(pool)}
+    required = 0
+    for top_pick in top_pick_list:
+        if top_pick not in teams_selected:
+            required |= bits[top_pick]
+
+    # Forward pass: probability of drawing each set of teams, level by
+    # level, with the balls remaining after each set memoized
+    balls = {0: sum(lotto_combos[team] for team in pool)}
+    levels = [{0: 1.0}]
+    for _ in range(draws):
+        next_level = {}
+        for mask, weight in levels[-1].items():
+            balls_remaining = balls[mask]
+            for team in pool:
+                if mask & bits[team]:
+                    continue
+                new_mask = mask | bits[team]
+                next_level[new_mask] = next_level.get(new_mask, 0.0) + \
+                    weight * lotto_combos[team] / float(balls_remaining)
+                if new_mask not in balls:
+                    balls[new_mask] = balls_remaining - lotto_combos[team]
+        levels.append(next_level)
+
+    # Backward pass: probability that the remaining draws from a set
+    # include every team known to be in the top picks
+    completion = {mask: 1.0 if mask & required == required else 0.0
+                  for mask in levels[-1]}
+    for level in range(draws - 1, -1, -1):
+        for mask in levels[level]:
+            balls_remaining = balls[mask]
+            total = 0.0
+            for team in pool:
+                if not mask & bits[team]:
+                    total += completion[mask | bits[team]] * \
+                        lotto_combos[team] / float(balls_remaining)
+            completion[mask] = total
+
+    top_prob = {team: [0.0] * max(draws, 0) for team in pool}
+    for level in range(draws):
+        for mask, weight in levels[level].items():
+            balls_remaining = balls[mask]
+            for team in pool:
+                if not mask & bits[team]:
+                    top_prob[team][level] += weight * \
+                        lotto_combos[team] / float(balls_remaining) * \
+                        completion[mask | bits[team]]
+
+    # Draws of the top picks that hold every team known to be in them
+    final = [mask for mask in levels[-1] if completion[mask]]
+    drawn = (np.array(final, dtype=np.int64 if len(pool) < 63 else object
+                      )[:, None] >> np.arange(len(pool)) & 1).astype(bool)
+
+    prob_matrix = np.zeros((total_teams, total_teams))
+    for team in pool:
+        prob_matrix[team - 1, :draws] = top_prob[team]
+    add_fall_spots(prob_matrix, drawn, [levels[-1][mask] for mask in final],
+                   np.array(pool, dtype=np.intp) - 1, top_picks)
+
+    for team, pick in certain_picks(total_teams, top_picks, teams_selected,
+                                    top_pick_list, top_pick_order).items():
+        prob_matrix[team - 1] = 0
+        prob_matrix[team - 1, pick] = 1
+
+    totals = prob_matrix.sum(axis=1, keepdims=True)
+    np.divide(prob_matrix, totals, out=prob_matrix, where=totals != 0)
+
+    return prob_matrix
+
+
+def certain_picks(total_teams, top_picks, teams_selected, top_pick_list,
+                  top_pick_order):
+    """ certain_picks finds the teams whose pick is settled
+    by the structure of a lottery state. A team revealed in
+    the top picks holds the pick it was revealed at, a top
+    pick left to a single team goes to it, and a team out of
+    the top picks falls one spot for every team behind it in
+    the top picks once it is revealed or once every team in
+    the top picks is known. Every other team's pick is still
+    uncertain, whatever its probabilities round to
+
+    @param total_teams (int): Number of teams in the lottery
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param teams_selected (list): List containing the team lottery
+        order of teams already revealed in the lottery
+    @param top_pick_list (list): List containing the team lottery
+        order of teams already revealed to be in the top picks
+    @param top_pick_order (list): List containing the order of the
+        top picks as they are revealed
+
+    Returns:
+
+        - picks (dict): Dictionary keyed by team lottery order
+            with the 0-based pick each settled team receives
+    """
+
+    in_top = set(top_pick_list) | set(top_pick_order)
+    unrevealed = [team for team in range(1, total_teams + 1)
+                  if team not in teams_selected]
+    candidates = [team for team in unrevealed if team in in_top] \
+        if len(in_top) == top_picks else unrevealed
+
+    picks = {}
+    for team in teams_selected:
+        if team not in top_pick_order:
+            picks[team] = team - 1 + len([x for x in top_pick_list
+                                          if x > team])
+    if len(in_top) == top_picks:
+        for team in unrevealed:
+            if team not in in_top:
+                picks[team] = team - 1 + len([x for x in in_top
+                                              if x > team])
+    if top_picks - len(top_pick_order) == len(candidates) == 1:
+        picks[candidates[0]] = 0
+    for count, team in enumerate(top_pick_order):
+        picks[team] = top_picks - count - 1
+
+    return picks
+
+
+def add_fall_spots(prob_matrix, drawn, weights, pool, top_picks):
+    """ add_fall_spots adds the weight of every draw of the
+    top picks to the pick each team left out of it falls to.
+    Teams left out of the draw fall one spot for every team
+    behind them in the standings that jumped into the top
+    picks. Every engine reduces its draws with this function
+
+    @param prob_matrix (ndarray): Array of shape (teams, picks),
+        or (states, teams, picks) for a batch of states, the
+        weights are added to
+    @param drawn (ndarray): Boolean array with one row per draw
+        and one column per team of pool, True for the teams drawn
+    @param weights (ndarray): Array of shape (draws,), or
+        (states, draws), with the weight of each draw
+    @param pool (ndarray): Array of shape (teams in the draw,),
+        or (states, teams in the draw), with the 0-based lottery
+        order of the teams in the draw, in ascending order
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    """
+
+    import numpy as np
+
+    total_teams = prob_matrix.shape[-1]
+    blocks = prob_matrix.reshape(-1, total_teams, total_teams)
+    weights = np.asarray(weights).reshape(len(blocks), -1)
+    pool = np.broadcast_to(pool, (len(blocks), np.shape(pool)[-1]))
+    drawn = np.asarray(drawn, dtype=bool).reshape(weights.shape[1],
+                                                  pool.shape[1])
+    rows = np.broadcast_to(np.arange(len(blocks))[:, None], pool.shape)
+
+    behind = np.cumsum(drawn[:, ::-1], axis=1,
+                       dtype=np.int16)[:, ::-1] - drawn
+    for spots in range(int(behind.max(initial=0)) + 1):
+        fallen = ((behind == spots) & ~drawn).astype(weights.dtype)
+        spot_inds = pool + spots
+        fill = (spot_inds > top_picks - 1) & (spot_inds <= total_teams - 1)
+        blocks[rows[fill], pool[fill], spot_inds[fill]] += \
+            (weights @ fallen)[fill]
+
+
+@functools.lru_cache(maxsize=None)
+def _draw_orders(pool_size, draws):
+    """ Encodes every ordered draw of `draws` teams out of a
+    pool of `pool_size` teams as an integer array of pool
+    indices, along with a (orders, pool) membership matrix
+    """
+
+    import numpy as np
+
+    orders = list(itertools.permutations(range(pool_size), draws))
+    orders = np.array(orders, dtype=np.intp).reshape(len(orders), draws)
+    in_order = np.zeros((len(orders), pool_size))
+    np.put_along_axis(in_order, orders, 1.0, axis=1)
+
+    return orders, in_order
+
+
+def pick_probability_matrices(lotto_combos, top_picks, states):
+    """ pick_probability_matrices evaluates a batch of lottery
+    states at once with array operations, returning the same
+    matrices as pick_probability_matrix.
+
+    States are grouped by the number of teams still in the
+    draw. Within a group, every candidate draw order is encoded
+    once as an integer array over the undrawn teams, the
+    sequential draw probability of each order is computed for
+    all states from the cumulative balls removed, orders that
+    leave out a known top pick team are masked out, and the
+    weights are reduced to pick distributions with bincount.
+
+    @param lotto_combos (dict): Dictionary keyed by team
+        lottery order with values corresponding to each team's
+        lottery chances
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param states (list): List of (teams_selected, top_pick_list,
+        top_pick_order) tuples
+
+    Returns:
+
+        prob_matrices (ndarray): Array of shape (states, teams,
+            picks) with the probability of each team receiving
+            each pick in each state
+    """
+
+    import numpy as np
+
+    total_teams = len(lotto_combos)
+    chances = np.array([lotto_combos[team] for team in range(1, total_teams + 1)],
+                       dtype=float)
+    prob_matrices = np.zeros((len(states), total_teams, total_teams))
+
+    groups = {}
+    for ind, (teams_selected, _, top_pick_order) in enumerate(states):
+        pool_size = total_teams - len(set(teams_selected))
+        groups.setdefault((max(top_picks - len(top_pick_order), 0), pool_size),
+                          []).append(ind)
+
+    for (draws, pool_size), inds in groups.items():
+        orders, in_order = _draw_orders(pool_size, draws)
+        chunk = max(1, KERNEL_CHUNK // max(len(orders), 1))
+        for start in range(0, len(inds), chunk):
+            rows = inds[start:start + chunk]
+            pool = np.zeros((len(rows), pool_size), dtype=np.intp)
+            required = np.zeros((len(rows), pool_size))
+            certain = []
+            for row, ind in enumerate(rows):
+                teams_selected, top_pick_list, top_pick_order = states[ind]
+                pool[row] = [team - 1 for team in range(1, total_teams + 1)
+                             if team not in teams_selected]
+                certain.extend((row, team - 1, pick) for team, pick in
+                               certain_picks(total_teams, top_picks,
+                                             teams_selected, top_pick_list,
+                                             top_pick_order).items())
+                for team in top_pick_list:
+                    if team not in teams_selected:
+                        required[row, pool[row] == team - 1] = 1
+
+            # Sequential draw probability of every order in every state
+            pool_chances = chances[pool]
+            order_chances = pool_chances[:, orders]
+            removed = np.cumsum(order_chances, axis=2) - order_chances
+            balls = pool_chances.sum(axis=1)[:, None]
+            valid = required @ (1 - in_order).T == 0
+            weights = valid.astype(float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                for pick in range(draws):
+                    weights *= order_chances[:, :, pick] / \
+                        (balls - removed[:, :, pick])
+            weights[~valid] = 0.0
+
+            # Probability of each team landing in each drawn pick
+            block = np.zeros((len(rows), total_teams, total_teams))
+            offsets = (np.arange(len(rows)) * total_teams)[:, None]
+            for pick in range(draws):
+                block[:, :, pick] = np.bincount(
+                    (offsets + pool[:, orders[:, pick]]).ravel(),
+                    weights=weights.ravel(),
+                    minlength=len(rows) * total_teams
+                ).reshape(len(rows), total_teams)
+
+            add_fall_spots(block, in_order, weights, pool, top_picks)
+
+            if certain:
+                block[tuple(np.array(certain).T)] = 1
+            prob_matrices[rows] = block
+
+    totals = prob_matrices.sum(axis=2, keepdims=True)
+    np.divide(prob_matrices, totals, out=prob_matrices, where=totals != 0)
+
+    return prob_matrices
 
 
 def calculate_pick_probabilities(lotto_combos, top_picks,
@@ -52,119 +384,350 @@ def calculate_pick_probabilities(lotto_combos, top_picks,
             receiving each draft pick
     """
 
+    prob_matrix = pick_probability_matrix(lotto_combos, top_picks,
+                                          teams_selected, top_pick_list,
+                                          top_pick_order)
+
+    return _round_probabilities(prob_matrix)
+
+
+def round_percentage(prob):
+    """ round_percentage converts a probability to a percentage
+    with one decimal. The percentage is snapped to 9 decimals
+    first, so that exact ties round the same way whichever
+    engine produced the probability, and ties round up, as in
+    exact_odds.percentages
+
+    @param prob (float): Probability
+
+    Returns:
+
+        - percent (float): Percentage rounded to one decimal
+    """
+
+    return float(decimal.Decimal(repr(round(100*prob, 9)))
+                 .quantize(ONE_DECIMAL, decimal.ROUND_HALF_UP))
+
+
+def _round_probabilities(prob_matrix):
+    """ Converts a pick probability matrix to the
+    percentage dictionary returned by calculate_pick_probabilities
+    """
+
     prob_dict = {}
-    total_teams = len(lotto_combos)
-    total_combos = 0
-    for num in lotto_combos:
-        if num not in teams_selected:  # Only adding teams that have not been revealed
-            total_combos += lotto_combos[num]
-
-    team_list = list(lotto_combos.keys())
-    for team in range(1, total_teams + 1):
-        prob_list = [0] * total_teams # Initializing the list of pick probabilities                      
-        if team in teams_selected and team not in top_pick_order:
-            fall_spot = 0
-            for top_pick in top_pick_list:
-                if top_pick > team:
-                    fall_spot += 1
-            prob_list[team - 1 + fall_spot] = 1 # If a team has been revealed, we know with certainty the pick number
-        elif team in top_pick_order:
-            count = 0
-            for team_here in top_pick_order:
-                if team_here == team:
-                    prob_list[top_picks - count - 1] = 1
-                count += 1
-        else:
-            pick_order = list(itertools.permutations(team_list,
-                                                     top_picks - len(top_pick_order)))
-            prob_fall = [0] * (top_picks + 1)
-
-            # If a team has not been revealed, we loop through all possible permutations of the
-            # first four picks and find the probability of each permutation occurring
-            for order in pick_order:
-                balls_remaining = total_combos
-                other_teams_probability = 1
-                top_pick_probability = 1
-
-                # If a team has been revealed to be in the top number of picks, only permutations
-                # containing that team are valid. top_pick_ind ensures that only these permutations
-                # are evaluated
-                top_pick_ind = 1
-                for top_pick in top_pick_list:
-                    if top_pick in order or top_pick in teams_selected:
-                        top_pick_ind *= 1
-                    else:
-                        top_pick_ind *= 0
-
-                if top_pick_ind:
-                    fall_spots = 0
-                    pick_ind = 0
-                    count = 0
-                    for pick in order:
-                        if pick in teams_selected:
-                            # If a pick has already been revealed to be outside of the
-                            # top picks, this permutation is invalid
-                            other_teams_probability = 0
-                            top_pick_probability = 0
-                            break
-
-                        if team in order:
-                            # If team is in this permutation of top picks, evaluate the probability
-                            # of the permutation occurring AND track the pick number with the pick_count
-                            # index.
-                            if pick == team:
-                                pick_count = count
-                            other_teams_probability = 0
-                            shot_prob = lotto_combos[pick]/float(balls_remaining)
-
-                            balls_remaining = balls_remaining - lotto_combos[pick]
-                            top_pick_probability *= shot_prob
-                            pick_ind = 1
-                            count += 1
-                        else:
-                            # If team is not in this permutation, track the number of teams higher
-                            # than the current team that are in the permutation. This gives the number
-                            # of spots that the team falls in the lottery. Again, track the probability
-                            # of this permutation occurring AND track the pick number with the fall_spots
-                            # index
-                            pick_ind = 0
-                            if pick > team:
-                                fall_spots += 1
-
-                            shot_prob = lotto_combos[pick]/float(balls_remaining)
-
-                            balls_remaining = balls_remaining - lotto_combos[pick]
-
-                            count += 1
-
-                            other_teams_probability *= shot_prob
-
-                    # If pick_ind == 0, the team does not pick in the top_picks in this permutation
-                    # If pick_ind == 1, the team does pick in the top_picks in this permutation
-                    if pick_ind == 0:
-                        prob_fall[fall_spots] += \
-                            other_teams_probability
-                    else:
-                        prob_list[pick_count] += \
-                            top_pick_probability
-
-            # This loop fills in the corresponding "fall" spot with the appropriate probability
-            for spot in range(team - 1, team + top_picks - len(top_pick_order)):
-                if spot <= total_teams - 1 and spot > top_picks - 1:
-                    prob_list[spot] = prob_fall[spot - team + 1]
-
-        prob_list = [0 if sum(prob_list) == 0 else x/sum(prob_list) for x in prob_list]
-        prob_dict[team] = [round(100*x, 1) for x in prob_list]
+    for team in range(1, len(prob_matrix) + 1):
+        prob_list = prob_matrix[team - 1]
+        if hasattr(prob_list, 'tolist'):
+            prob_list = prob_list.tolist()
+        prob_dict[team] = [round_percentage(x) for x in prob_list]
 
     return prob_dict
 
 
+def set_odds_table(table, season=None):
+    """ set_odds_table installs a precomputed
+    app.precompute.OddsTable used by update_odds
+    to look up pick probabilities
+
+    @param table (OddsTable): Table of pick probabilities
+        keyed by lottery state, or None to always
+        calculate them
+    @param season (Season): Season of the table,
+        the default season if None
+    """
+
+    season = season or DEFAULT_SEASON
+    ODDS_TABLES[season.name] = table
+    # A new table may come from a new lottery configuration
+    clear_caches()
+
+
+def odds_cache(season=None):
+    """ odds_cache returns the cache of rendered odds
+    tables of a season, the default season if None
+    """
+
+    season = season or DEFAULT_SEASON
+    cache = ODDS_CACHES.get(season.name)
+    if cache is None:
+        cache = ODDS_CACHES.setdefault(season.name,
+                                       LRUCache(ODDS_CACHE_SIZE))
+    return cache
+
+
+def odds_matrix(teams_selected,
+                top_pick_list,
+                top_pick_order,
+                season=None):
+    """ odds_matrix returns the pick probability matrix
+    for a lottery state, looked up in the season's
+    precomputed table when possible and calculated otherwise
+
+    @param teams_selected (list): List of key values for
+        LOTTERY_INFO that represent the reverse
+        standings order
+    @param top_pick_list (list): List of key values for
+        lottery_info known to be in the top 4
+    @param top_pick_order (list): List of key values for
+        lottery_info revealed starting in the top 4
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - prob_matrix (ndarray or list): Array, or list of
+            lists from a memory-mapped table, with one row
+            per team and one column per pick
+    """
+
+    season = season or DEFAULT_SEASON
+    table = ODDS_TABLES.get(season.name)
+
+    prob_matrix = None
+    if table is not None:
+        with stage('odds_table_lookup'):
+            prob_matrix = table.lookup(teams_selected,
+                                       top_pick_list,
+                                       top_pick_order)
+    if prob_matrix is None:
+        with stage('calculate_pick_probabilities'):
+            prob_matrix = pick_probability_matrix(season.lotto_chances,
+                                                  season.top_picks,
+                                                  teams_selected,
+                                                  top_pick_list,
+                                                  top_pick_order)
+
+    return prob_matrix
+
+
+def odds_matrices(states, season=None):
+    """ odds_matrices returns the pick probability matrices
+    of several lottery states, looking each one up in the
+    season's precomputed table and calculating the rest in
+    one call to the batched kernel
+
+    @param states (list): List of (teams_selected, top_pick_list,
+        top_pick_order) tuples
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - prob_matrices (list): List with the matrix of each
+            state, in the format of odds_matrix
+    """
+
+    season = season or DEFAULT_SEASON
+    table = ODDS_TABLES.get(season.name)
+
+    prob_matrices = [None] * len(states)
+    if table is not None:
+        with stage('odds_table_lookup'):
+            prob_matrices = [table.lookup(*state) for state in states]
+
+    missing = [ind for ind, prob_matrix in enumerate(prob_matrices)
+               if prob_matrix is None]
+    if missing:
+        with stage('calculate_pick_probabilities'):
+            calculated = pick_probability_matrices(season.lotto_chances,
+                                                   season.top_picks,
+                                                   [states[ind]
+                                                    for ind in missing])
+        for ind, prob_matrix in zip(missing, calculated):
+            prob_matrices[ind] = prob_matrix
+
+    return prob_matrices
+
+
+def payload_teams(prob_matrix, season=None):
+    """ payload_teams lists each team of a season with
+    its percentage odds of receiving each pick
+
+    @param prob_matrix (list): Matrix returned by odds_matrix
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - teams (list): List of dictionaries with each
+            team's 'slot', 'name', 'id' and 'odds'
+    """
+
+    lottery_info = (season or DEFAULT_SEASON).lottery_info
+    prob_dict = _round_probabilities(prob_matrix)
+
+    return [{'slot': team,
+             'name': lottery_info[team]['name'],
+             'id': lottery_info[team]['id'],
+             'odds': prob_dict[team]}
+            for team in lottery_info]
+
+
+def odds_payload(teams_selected,
+                 top_pick_list,
+                 top_pick_order,
+                 season=None):
+    """ odds_payload returns the lottery odds for a
+    state as a JSON-serializable dictionary
+
+    @param teams_selected (list): List of key values for
+        LOTTERY_INFO that represent the reverse
+        standings order
+    @param top_pick_list (list): List of key values for
+        lottery_info known to be in the top 4
+    @param top_pick_order (list): List of key values for
+        lottery_info revealed starting in the top 4
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - payload (dict): Dictionary with a 'teams' list
+            holding each team's 'slot', 'name', 'id' and
+            percentage 'odds' of receiving each pick
+    """
+
+    season = season or DEFAULT_SEASON
+
+    return {'teams': payload_teams(odds_matrix(teams_selected,
+                                               top_pick_list,
+                                               top_pick_order,
+                                               season),
+                                   season)}
+
+
+def _format_probability(prob):
+    """ Formats an unsettled probability as a percentage
+    with one decimal, see round_percentage. A pick that
+    is possible but not settled never shows as 0 or 100
+    """
+
+    if not prob:
+        return '0'
+    percent = round_percentage(prob)
+    if percent == 0:
+        return '<0.1'
+    if percent == 100:
+        return '>99.9'
+    return str(percent)
+
+
+def odds_rows(teams_selected,
+              top_pick_list,
+              top_pick_order,
+              season=None):
+    """ odds_rows builds the rows of the lottery
+    odds table, sorted by the odds of landing
+    each of the top 4 picks
+
+    @param teams_selected (list): List of key values for
+        LOTTERY_INFO that represent the reverse
+        standings order. This list is filled
+        in as teams are revealed
+    @param top_pick_list (list): List of key values for
+        lottery_info that correspond to the teams
+        that are "skipped" as the back of the
+        lottery is revealed. This means that team
+        has a pick in the top 4
+    @param top_pick_order (list): List of key values for
+        lottery_info that correspond to the teams
+        that are revealed starting in the top 4
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - rows (list): List of TableRow tuples with the
+            pick owner's name and the formatted odds of
+            each pick
+    """
+
+    season = season or DEFAULT_SEASON
+    prob_matrix = odds_matrix(teams_selected, top_pick_list, top_pick_order,
+                              season)
+
+    with stage('format_rows'):
+        return _format_rows(owner_rows(prob_matrix,
+                                       (teams_selected, top_pick_list,
+                                        top_pick_order),
+                                       season),
+                            season)
+
+
+def _format_rows(rows, season):
+    """ Formats the owner rows of the odds table from the
+    unrounded probabilities, sorted by the odds of landing
+    each of the top picks. Settled picks show as 100 and 0.
+    Rows of picks that cannot go to their owner are left out
+    """
+
+    shown = [row for row in rows if any(row.probabilities)]
+
+    # Pages served from the table before numpy is loaded are
+    # formatted per cell, so that a cold start does not import it
+    if 'numpy' in sys.modules:
+        order, cells = _format_matrix(shown, season.top_picks)
+    else:
+        order, cells = _format_cells(shown, season.top_picks)
+
+    for ind, row in enumerate(shown):
+        if row.pick is not None:
+            cells[ind] = ['100' if pick == row.pick else '0'
+                          for pick in range(len(row.probabilities))]
+
+    return [TableRow(shown[ind].name, cells[ind]) for ind in order]
+
+
+def _format_matrix(shown, top_picks):
+    """ Formats the probabilities of the shown rows in one
+    vectorized pass, returning the sorted order of the rows
+    and their cells. Matches _format_cells exactly
+    """
+
+    import numpy as np
+
+    probs = np.array([row.probabilities for row in shown], dtype=float)
+    probs = probs.reshape(len(shown), -1)
+
+    # Sort keys are snapped like the displayed percentages so that
+    # exact ties keep the reverse standings order, as lexsort is stable
+    keys = -np.round(probs[:, :top_picks], 11)
+    order = np.lexsort(keys.T[::-1]).tolist()
+
+    # Tenths of a percent, snapped to 8 decimals and rounded half
+    # up like round_percentage
+    percent = np.floor(np.round(1000*probs, 8) + 0.5) / 10
+    cells = np.array([str(x) for x in percent.ravel().tolist()],
+                     dtype=object).reshape(percent.shape)
+    cells[percent == 0] = '<0.1'
+    cells[percent == 100] = '>99.9'
+    cells[probs == 0] = '0'
+
+    return order, cells.tolist()
+
+
+def _format_cells(shown, top_picks):
+    """ Formats the probabilities of the shown rows one
+    cell at a time, returning the sorted order of the
+    rows and their cells
+    """
+
+    order = sorted(range(len(shown)),
+                   key=lambda ind: [-round(x, 11) for x in
+                                    shown[ind].probabilities[:top_picks]])
+
+    return order, [[_format_probability(x) for x in row.probabilities]
+                   for row in shown]
+
+
 def update_odds(teams_selected,
                 top_pick_list,
-                top_pick_order):
+                top_pick_order,
+                season=None):
     """ update_odds calculates draft
     lottery probabilities and populates
-    them in a DataFrame
+    them in a DataFrame. pandas is only
+    needed for this offline view of the odds
 
     @param teams_selected (list): List of key values for
         LOTTERY_INFO that represent the reverse
@@ -178,6 +741,8 @@ def update_odds(teams_selected,
     @param top_pick_order (list): List of key values for
         lottery_info that correspond to the teams
         that are revealed starting in the top 4
+    @param season (Season): Season of the lottery,
+        the default season if None
 
     Returns:
 
@@ -185,39 +750,48 @@ def update_odds(teams_selected,
             the lottery odds for each team
     """
 
-    prob_dict = calculate_pick_probabilities(LOTTO_CHANCES,
-                                             TOP_PICKS,
-                                             teams_selected,
-                                             top_pick_list,
-                                             top_pick_order)
-
-    lotto_df = pd.DataFrame(prob_dict)
-
-    # Coding in the pick conversions that trigger should a certain order be pulled
-    lotto_df.columns = ["Knicks" if (x == 10 and (prob_dict[x][10] == 100
-                                                        or prob_dict[x][11] == 100
-                                                        or prob_dict[x][12] == 100
-                                                        or prob_dict[x][13] == 100))
-                        else "Magic" if (x == 11 and (prob_dict[x][4] == 100
-                                                        or prob_dict[x][5] == 100
-                                                        or prob_dict[x][6] == 100
-                                                        or prob_dict[x][7] == 100
-                                                        or prob_dict[x][8] == 100
-                                                        or prob_dict[x][9] == 100
-                                                        or prob_dict[x][10] == 100
-                                                        or prob_dict[x][11] == 100
-                                                        or prob_dict[x][12] == 100
-                                                        or prob_dict[x][13] == 100))
-                        else LOTTERY_INFO[x]['name']
-                        for x in LOTTERY_INFO]
-    lotto_df = lotto_df.T
-    lotto_df.columns = list(range(1, len(LOTTO_CHANCES) + 1))
-    lotto_df = lotto_df.sort_values([1, 2, 3, 4],
-                                    ascending=[False, False, False, False])
-
-    for col in lotto_df.columns:
-        lotto_df[col] = ['%s' % float('%.3g' % x) if x not in [0, 100]
-                         else '100' if x == 100
-                         else '0' for x in lotto_df[col]]
-
-    return lotto_df
+    import pandas as pd
+
+    season = season or DEFAULT_SEASON
+    rows = odds_rows(teams_selected, top_pick_list, top_pick_order, season)
+
+    return pd.DataFrame([row.cells for row in rows],
+                        index=[row.name for row in rows],
+                        columns=list(range(1, len(season.lotto_chances) + 1)))
+
+
+def odds_table_html(teams_selected,
+                    top_pick_list,
+                    top_pick_order,
+                    season=None):
+    """ odds_table_html returns the rendered HTML
+    odds table for a lottery state, served from
+    the season's cache when the state has been seen before
+
+    @param teams_selected (list): List of key values for
+        LOTTERY_INFO that represent the reverse
+        standings order
+    @param top_pick_list (list): List of key values for
+        lottery_info known to be in the top 4
+    @param top_pick_order (list): List of key values for
+        lottery_info revealed starting in the top 4
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - table (str): HTML table of the lottery odds
+    """
+
+    season = season or DEFAULT_SEASON
+
+    def render():
+        rows = odds_rows(teams_selected, top_pick_list, top_pick_order,
+                         season)
+        with stage('render_table'):
+            return render_odds_table(rows,
+                                     list(range(1, len(season.lotto_chances) + 1)))
+
+    return odds_cache(season).get_or_compute(
+        state_cache_key(teams_selected, top_pick_list, top_pick_order),
+        render)
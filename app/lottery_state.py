@@ -0,0 +1,258 @@
+"""
+lottery_state.py
+
+Immutable lottery state. A LotteryState holds the
+teams revealed, the teams known to be in the top picks
+and the dropdown, and each reveal returns a new state
+after checking the team against the dropdown.
+utils.replay_state returns the same states as
+lists. The sets of teams revealed and
+known to be in the top picks are kept as bitmasks.
+"""
+
+import os
+
+from app import utils
+from app.cache import LRUCache
+
+# States by lottery index, number of top picks and state token.
+# Cached states hold their index, so its id is not reused
+STATE_CACHE = LRUCache(int(os.environ.get('STATE_CACHE_SIZE', 4096)))
+
+
+class LotteryState(object):
+    """ LotteryState is an immutable, hashable lottery state.
+    States are built with start, replay or from_token and
+    advanced with reveal, which follow the site's reveal
+    rules: skipped teams, the fast forward once the top
+    picks are known, and the last team filled in
+
+    @param lottery_info (LotteryIndex): Index of the season's
+        teams, see utils.lottery_index
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param teams_selected (tuple): Team lottery orders revealed,
+        in order
+    @param top_pick_list (tuple): Team lottery orders known to
+        be in the top picks
+    @param top_pick_order (tuple): Team lottery orders revealed
+        in the top picks
+    @param teams (tuple): Team names shown in the dropdown,
+        ending with None
+    """
+
+    __slots__ = ('lottery_info', 'top_picks', 'teams_selected',
+                 'top_pick_list', 'top_pick_order', 'teams',
+                 'selected', 'skipped')
+
+    def __init__(self, lottery_info, top_picks, teams_selected,
+                 top_pick_list, top_pick_order, teams):
+        values = {'lottery_info': lottery_info,
+                  'top_picks': top_picks,
+                  'teams_selected': teams_selected,
+                  'top_pick_list': top_pick_list,
+                  'top_pick_order': top_pick_order,
+                  'teams': teams,
+                  'selected': utils.team_mask(teams_selected),
+                  'skipped': utils.team_mask(top_pick_list)}
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('LotteryState is immutable')
+
+    def __eq__(self, other):
+        if not isinstance(other, LotteryState):
+            return NotImplemented
+        return self.key == other.key and \
+            self.top_picks == other.top_picks and \
+            self.lottery_info == other.lottery_info
+
+    def __hash__(self):
+        return hash((self.key, self.top_picks))
+
+    def __repr__(self):
+        return 'LotteryState(%r, %r, %r)' % self.key
+
+    @property
+    def key(self):
+        """ The (teams_selected, top_pick_list, top_pick_order)
+        tuple identifying the state, as taken by odds_matrix
+        """
+
+        return self.teams_selected, self.top_pick_list, self.top_pick_order
+
+    @property
+    def current_slot(self):
+        """ The pick revealed next
+        """
+
+        return len(self.lottery_info) - len(self.teams_selected)
+
+    @property
+    def token(self):
+        """ The state token of the state, see utils.encode_state
+        """
+
+        return utils.encode_state(self.teams_selected)
+
+    @classmethod
+    def start(cls, lottery_info, top_picks=4):
+        """ start returns the state before any team is revealed
+
+        @param lottery_info (dict): Dictionary keyed by
+            reverse standings order, with dictionary
+            values containing 'name' and 'id' keys
+            for the team
+        @param top_picks (int): Integer indicating the number of
+            picks that are selected via the lottery
+
+        Returns:
+
+            - state (LotteryState): Start of the lottery
+        """
+
+        index = utils.lottery_index(lottery_info)
+        return cls._settle(index, top_picks, (), (), (), len(index))
+
+    @classmethod
+    def replay(cls, lottery_info, reveals, top_picks=4):
+        """ replay reveals teams one at a time from the start,
+        skipping the teams filled in along the way
+
+        @param reveals (list): List of key values for
+            lottery_info in the order they were revealed
+
+        Returns:
+
+            - state (LotteryState): State after the reveals
+
+        Raises:
+
+            - ValueError: If a team could not be revealed when
+            its turn came
+        """
+
+        state = cls.start(lottery_info, top_picks)
+        bits = state.lottery_info.bits
+        for team in reveals:
+            if not state.selected & bits[team]:
+                state = state.reveal(team)
+
+        return state
+
+    @classmethod
+    def from_token(cls, token, lottery_info, top_picks=4):
+        """ from_token returns the state carried by a state token,
+        replaying its reveals the first time the token is seen
+
+        @param token (str): Token built by utils.encode_state
+
+        Returns:
+
+            - state (LotteryState): State of the token
+
+        Raises:
+
+            - ValueError: If the token is invalid or its teams
+            could not have been revealed in that order
+        """
+
+        index = utils.lottery_index(lottery_info)
+        key = (id(index), top_picks, token)
+        state = STATE_CACHE.get(key)
+        if state is None:
+            state = cls.replay(index, utils.decode_state(token, index),
+                               top_picks)
+            STATE_CACHE.put(key, state)
+
+        return state
+
+    def reveal(self, team):
+        """ reveal returns the state after team is revealed
+
+        @param team (int or str): Key value of lottery_info or
+            name of the team revealed, which must be in the
+            dropdown
+
+        Returns:
+
+            - state (LotteryState): State after the reveal
+
+        Raises:
+
+            - ValueError: If the team cannot be revealed next
+        """
+
+        index = self.lottery_info
+        slot = index.by_name.get(team) if isinstance(team, str) else team
+        if slot not in index or index.names[slot] not in self.teams:
+            raise ValueError('Team %r cannot be revealed next' % (team,))
+
+        bits = index.bits
+        current_slot = self.current_slot
+        teams_selected = self.teams_selected + (slot,)
+        top_pick_list = self.top_pick_list
+        top_pick_order = self.top_pick_order
+        if current_slot <= self.top_picks:
+            top_pick_order += (slot,)
+
+        # A team revealed out of order means every team behind it
+        # that has not been revealed is in the top picks
+        expected_team = current_slot - len(top_pick_list)
+        if slot != expected_team and len(top_pick_list) < self.top_picks:
+            known = self.selected | self.skipped | bits[slot]
+            top_pick_list += tuple(x for x in range(len(index), slot, -1)
+                                   if not known & bits[x])
+
+        if current_slot <= self.top_picks + 1:
+            out_of_draw = utils.team_mask(
+                teams_selected[:len(index) - self.top_picks])
+            top_pick_list = tuple(x for x in index
+                                  if not out_of_draw & bits[x])
+
+        return self._settle(index, self.top_picks, teams_selected,
+                            top_pick_list, top_pick_order, current_slot)
+
+    @classmethod
+    def _settle(cls, index, top_picks, teams_selected, top_pick_list,
+                top_pick_order, current_slot):
+        """ Fast forwards to the top picks once they are known
+        and fills in the dropdown. current_slot is the pick
+        just revealed, len(index) at the start
+        """
+
+        if len(top_pick_list) > top_picks or \
+                len(top_pick_order) > top_picks or \
+                len(set(teams_selected)) != len(teams_selected):
+            raise ValueError('Inconsistent lottery state %r'
+                             % ((teams_selected, top_pick_list,
+                                 top_pick_order),))
+
+        bits = index.bits
+        known = utils.team_mask(teams_selected) | \
+            utils.team_mask(top_pick_list)
+        # The first reveal can already complete the top picks
+        if len(top_pick_list) == top_picks and current_slot > top_picks:
+            teams_selected += tuple(x for x in index.reverse_order
+                                    if not known & bits[x])
+            current_slot = top_picks + 1
+
+        selected = utils.team_mask(teams_selected)
+        hidden = selected
+        limit = len(index)
+        if current_slot > top_picks + 1:
+            hidden = known
+            limit = max(top_picks + 1 - len(top_pick_list), 0)
+        teams = [index.names[x] for x in index.reverse_order
+                 if not hidden & bits[x]][:limit]
+
+        # The last team left holds the first pick
+        if len(teams) == 1:
+            rest = tuple(x for x in index if not selected & bits[x])
+            teams_selected += rest
+            top_pick_order += rest
+            teams = []
+
+        return cls(index, top_picks, teams_selected, top_pick_list,
+                   top_pick_order, tuple(teams) + (None,))
@@ -0,0 +1,248 @@
+"""
+metrics.py
+
+Lightweight request instrumentation. Each stage of
+a request is timed into an in-process histogram,
+exposed in the Prometheus text format, and slow
+requests can be sampled into flame graph stacks
+when PROFILE_SLOW_MS is set.
+"""
+
+import collections
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Upper bounds, in seconds, of the histogram buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+           0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Requests slower than this many milliseconds keep their
+# sampled stacks. Profiling is off when unset or 0
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 0))
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+
+# Most recent slow request profiles
+SLOW_PROFILES = collections.deque(maxlen=20)
+
+
+class Histogram(object):
+    """ Histogram counts observations into
+    cumulative buckets, Prometheus style
+
+    @param buckets (tuple): Increasing upper bounds
+        of the buckets
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """ observe records one value
+        """
+
+        index = 0
+        for bound in self.buckets:
+            if value <= bound:
+                break
+            index += 1
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+
+    def snapshot(self):
+        """ snapshot returns the histogram counters
+
+        Returns:
+
+            - cumulative (list): List of (bound, count) tuples
+                counting observations at or below each bound,
+                ending with the '+Inf' bucket
+            - total (float): Sum of the observed values
+        """
+
+        with self._lock:
+            counts = list(self.counts)
+            total = self.total
+
+        cumulative = []
+        running = 0
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            running += count
+            cumulative.append((bound, running))
+
+        return cumulative, total
+
+
+class HistogramFamily(object):
+    """ HistogramFamily holds one Histogram per
+    value of a label
+
+    @param name (str): Metric name
+    @param label (str): Label distinguishing the histograms
+    @param description (str): Help text of the metric
+    """
+
+    def __init__(self, name, label, description):
+        self.name = name
+        self.label = label
+        self.description = description
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value):
+        """ observe records one value under label_value
+        """
+
+        histogram = self.histograms.get(label_value)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(label_value,
+                                                       Histogram())
+        histogram.observe(value)
+
+    def clear(self):
+        """ clear drops every histogram
+        """
+
+        with self._lock:
+            self.histograms = {}
+
+    def exposition(self):
+        """ exposition returns the family in the
+        Prometheus text format
+        """
+
+        lines = ['# HELP %s %s' % (self.name, self.description),
+                 '# TYPE %s histogram' % self.name]
+        for label_value in sorted(self.histograms):
+            cumulative, total = self.histograms[label_value].snapshot()
+            labels = '%s="%s"' % (self.label, label_value)
+            for bound, count in cumulative:
+                lines.append('%s_bucket{%s,le="%s"} %d' %
+                             (self.name, labels, bound, count))
+            lines.append('%s_sum{%s} %r' % (self.name, labels, total))
+            lines.append('%s_count{%s} %d' %
+                         (self.name, labels, cumulative[-1][1]))
+
+        return '\n'.join(lines) + '\n'
+
+
+STAGE_SECONDS = HistogramFamily('lottery_stage_seconds', 'stage',
+                                'Time spent in each stage of a request')
+REQUEST_SECONDS = HistogramFamily('lottery_request_seconds', 'endpoint',
+                                  'Time spent serving each endpoint')
+
+
+@contextlib.contextmanager
+def stage(name):
+    """ stage times the enclosed block into the
+    lottery_stage_seconds histogram for name
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, name)
+
+
+def exposition():
+    """ exposition returns every metric in the
+    Prometheus text format
+
+    Returns:
+
+        - text (str): Metrics page
+    """
+
+    return STAGE_SECONDS.exposition() + REQUEST_SECONDS.exposition()
+
+
+def clear_metrics():
+    """ clear_metrics drops every recorded timing
+    and slow request profile
+    """
+
+    STAGE_SECONDS.clear()
+    REQUEST_SECONDS.clear()
+    SLOW_PROFILES.clear()
+
+
+def log_event(logger, level, event, **fields):
+    """ log_event logs event and its fields as one JSON
+    object, skipping the serialization when the level
+    is disabled
+
+    @param logger (logging.Logger): Logger to write to
+    @param level (int): Logging level, e.g. logging.DEBUG
+    @param event (str): Name of the event
+    """
+
+    if logger.isEnabledFor(level):
+        fields['event'] = event
+        logger.log(level, json.dumps(fields, sort_keys=True))
+
+
+class SamplingProfiler(object):
+    """ SamplingProfiler samples the stack of one thread
+    from a background thread, counting each stack in the
+    folded format flame graph tools read
+
+    @param thread_id (int): Identifier of the thread to sample
+    @param interval (float): Seconds between samples
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append('%s:%s' % (os.path.basename(code.co_filename),
+                                        code.co_name))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def start(self):
+        """ start begins sampling
+        """
+
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ stop ends sampling
+
+        Returns:
+
+            - stacks (collections.Counter): Counter keyed by
+                semicolon-separated stacks, outermost first
+        """
+
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+
+def folded(stacks):
+    """ folded formats sampled stacks as the input of
+    flamegraph.pl or speedscope, one 'stack count' per line
+    """
+
+    return ''.join('%s %d\n' % (stack, count)
+                   for stack, count in stacks.most_common())
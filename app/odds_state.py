@@ -0,0 +1,239 @@
+"""
+odds_state.py
+
+Incremental odds engine. An OddsState carries the
+distribution over the orders of the top picks still
+to be revealed, and each reveal conditions that
+distribution instead of enumerating every order again.
+"""
+
+import numpy as np
+
+from app import lottery_odds
+from app.lottery_state import LotteryState
+
+
+class OddsState(object):
+    """ OddsState is an immutable lottery state with the
+    weight of every order of the remaining top picks that
+    is consistent with it. States are safe to share across
+    threads; apply_reveal returns a new state
+
+    Orders are weighted the way pick_probability_matrix
+    weights them: drawn one after another from the balls
+    of the teams not revealed yet
+
+    @param lotto_combos (dict): Dictionary keyed by team
+        lottery order with values corresponding to each team's
+        lottery chances
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param state (LotteryState): Reveals of the state
+    @param orders (ndarray): Array with one row per order of
+        the remaining top picks, holding team lottery orders
+    @param removed (ndarray): Array with the balls drawn
+        before each pick of each order
+    @param weights (ndarray): Probability of each order
+    """
+
+    __slots__ = ('lotto_combos', 'top_picks', 'state', 'teams_selected',
+                 'top_pick_list', 'top_pick_order', 'balls', 'orders',
+                 'removed', 'weights', 'prob_matrix')
+
+    def __init__(self, lotto_combos, state, orders, removed, weights):
+        values = {'lotto_combos': lotto_combos,
+                  'top_picks': state.top_picks,
+                  'state': state,
+                  'teams_selected': state.teams_selected,
+                  'top_pick_list': state.top_pick_list,
+                  'top_pick_order': state.top_pick_order,
+                  'balls': sum(lotto_combos[team] for team in lotto_combos
+                               if team not in state.teams_selected),
+                  'orders': orders,
+                  'removed': removed,
+                  'weights': weights}
+        values['prob_matrix'] = _order_matrix(values)
+        for name, value in values.items():
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('OddsState is immutable')
+
+    @classmethod
+    def from_state(cls, lotto_combos, state):
+        """ from_state enumerates every order consistent with
+        a lottery state
+
+        @param state (LotteryState): Reveals of the state
+
+        Returns:
+
+            - odds_state (OddsState): State for those reveals
+        """
+
+        orders, removed, weights = weighted_orders(lotto_combos,
+                                                   state.top_picks,
+                                                   *state.key)
+
+        return cls(lotto_combos, state, orders, removed, weights)
+
+    @classmethod
+    def start(cls, lotto_combos=None, top_picks=None, lottery_info=None):
+        """ start returns the state before any team is
+        revealed, for the site's lottery by default
+        """
+
+        lotto_combos = lotto_combos or lottery_odds.LOTTO_CHANCES
+        top_picks = top_picks or lottery_odds.TOP_PICKS
+        lottery_info = lottery_info or lottery_odds.LOTTERY_INFO
+
+        return cls.from_state(lotto_combos,
+                              LotteryState.start(lottery_info, top_picks))
+
+    def apply_reveal(self, team):
+        """ apply_reveal reveals the next team, conditioning
+        the distribution of the remaining orders on it
+
+        @param team (int): Key value of lottery_info for the
+            team revealed, which must be in the dropdown
+
+        Returns:
+
+            - odds_state (OddsState): State after the reveal
+
+        Raises:
+
+            - ValueError: If the team cannot be revealed next
+        """
+
+        state = self.state.reveal(team)
+        teams_selected, top_pick_list, top_pick_order = state.key
+        chances = _chances(self.lotto_combos)
+        orders, removed, weights = self.orders, self.removed, self.weights
+
+        # A team revealed in the top picks takes the last pick still
+        # to be drawn, leaving the orders of the picks before it
+        revealed = top_pick_order[len(self.top_pick_order):]
+        for picked in revealed[:orders.shape[1]]:
+            keep = orders[:, -1] == picked
+            orders, removed, weights = orders[keep], removed[keep], weights[keep]
+            weights = weights * (self.balls - removed[:, -1]) / chances[picked]
+            orders, removed = orders[:, :-1], removed[:, :-1]
+
+        # Teams revealed outside the top picks leave the draw, which
+        # takes their balls out of every remaining draw
+        gone = [x for x in teams_selected if x not in self.teams_selected]
+        keep = ~np.isin(orders, gone).any(axis=1)
+        for required in top_pick_list:
+            if required not in teams_selected:
+                keep &= (orders == required).any(axis=1)
+        orders, removed, weights = orders[keep], removed[keep], weights[keep]
+        balls = self.balls - chances[gone].sum()
+        weights = weights * np.prod((self.balls - removed) /
+                                    (balls - removed), axis=1)
+
+        return OddsState(self.lotto_combos, state, orders, removed,
+                         _normalize(weights))
+
+    def pick_probabilities(self):
+        """ pick_probabilities returns the odds rounded for
+        display, in the format of calculate_pick_probabilities
+        """
+
+        return lottery_odds._round_probabilities(self.prob_matrix)
+
+
+def weighted_orders(lotto_combos, top_picks, teams_selected,
+                    top_pick_list, top_pick_order):
+    """ weighted_orders enumerates the orders of the remaining
+    top picks consistent with a lottery state
+
+    @param lotto_combos (dict): Dictionary keyed by team
+        lottery order with values corresponding to each team's
+        lottery chances
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param teams_selected (list): List containing the team lottery
+        order of teams already revealed in the lottery
+    @param top_pick_list (list): List containing the team lottery
+        order of teams already revealed to be in the top picks
+    @param top_pick_order (list): List containing the order of the
+        top picks as they are revealed
+
+    Returns:
+
+        - orders (ndarray): Array with one row per order,
+            holding team lottery orders
+        - removed (ndarray): Array with the balls drawn
+            before each pick of each order
+        - weights (ndarray): Probability of each order
+    """
+
+    pool = np.array([team for team in lotto_combos
+                     if team not in teams_selected], dtype=np.intp)
+    draws = max(top_picks - len(top_pick_order), 0)
+    orders = pool[lottery_odds._draw_orders(len(pool), draws)[0]]
+
+    chances = _chances(lotto_combos)
+    order_chances = chances[orders]
+    removed = np.cumsum(order_chances, axis=1) - order_chances
+    balls = chances[pool].sum()
+    weights = np.prod(order_chances / (balls - removed), axis=1)
+
+    keep = np.ones(len(orders), dtype=bool)
+    for team in top_pick_list:
+        if team not in teams_selected:
+            keep &= (orders == team).any(axis=1)
+
+    return orders[keep], removed[keep], _normalize(weights[keep])
+
+
+def _chances(lotto_combos):
+    """ Indexes lottery chances by team lottery order
+    """
+
+    chances = np.zeros(max(lotto_combos) + 1)
+    for team, combos in lotto_combos.items():
+        chances[team] = combos
+    return chances
+
+
+def _normalize(weights):
+    total = weights.sum()
+    return weights / total if total else weights
+
+
+def _order_matrix(values):
+    """ Reduces the weighted orders of a state to the
+    probability of each team receiving each pick
+    """
+
+    lotto_combos = values['lotto_combos']
+    top_picks = values['top_picks']
+    teams_selected = values['teams_selected']
+    top_pick_list = values['top_pick_list']
+    orders, weights = values['orders'], values['weights']
+    total_teams = len(lotto_combos)
+    prob_matrix = np.zeros((total_teams, total_teams))
+
+    for pick in range(orders.shape[1]):
+        np.add.at(prob_matrix, (orders[:, pick] - 1, pick), weights)
+
+    pool = np.array([team for team in range(1, total_teams + 1)
+                     if team not in teams_selected], dtype=np.intp)
+    lottery_odds.add_fall_spots(prob_matrix,
+                                (orders[:, :, None] == pool).any(axis=1),
+                                weights, pool - 1, top_picks)
+
+    for team, pick in lottery_odds.certain_picks(
+            total_teams, top_picks, teams_selected, top_pick_list,
+            values['top_pick_order']).items():
+        prob_matrix[team - 1] = 0
+        prob_matrix[team - 1, pick] = 1
+
+    totals = prob_matrix.sum(axis=1, keepdims=True)
+    np.divide(prob_matrix, totals, out=prob_matrix, where=totals != 0)
+
+    return prob_matrix
@@ -0,0 +1,193 @@
+"""
+outcomes.py
+
+Joint distribution of the final draft order. The
+teams drawn into the top picks settle every other
+pick, so an outcome is the order of the top picks,
+stored as one integer index with its probability.
+Only the orders still possible in a lottery state are
+kept, and marginal and pairwise questions are answered
+from them without enumerating the orders again.
+"""
+
+import collections
+import os
+
+from app.cache import LRUCache, state_cache_key
+from app.season import DEFAULT_SEASON
+
+# The outcomes still possible in a lottery state, sorted by index:
+# each outcome's 'index' (see encode_order), its 'probability', the
+# 0-based pick of every team in it, one column per slot, and the
+# number of top picks in an order
+Outcomes = collections.namedtuple('Outcomes', ['index', 'probability',
+                                               'picks', 'top_picks'])
+
+# Outcomes keyed by season name and lottery state
+OUTCOMES_CACHE = LRUCache(int(os.environ.get('OUTCOMES_CACHE_SIZE', 256)))
+
+
+def encode_order(order, total_teams):
+    """ encode_order numbers an order of the top picks,
+    reading it as digits in base total_teams
+
+    @param order (list): Team lottery orders holding
+        picks 1, 2, ... of the top picks
+    @param total_teams (int): Number of teams in the lottery
+
+    Returns:
+
+        - index (int): Outcome index of the order
+    """
+
+    return sum((team - 1) * total_teams ** pick
+               for pick, team in enumerate(order))
+
+
+def decode_order(index, total_teams, top_picks):
+    """ decode_order returns the order of the top picks
+    numbered by encode_order
+
+    Returns:
+
+        - order (tuple): Team lottery orders holding
+            picks 1, 2, ... of the top picks
+    """
+
+    order = []
+    for _ in range(top_picks):
+        index, team = divmod(int(index), total_teams)
+        order.append(team + 1)
+
+    return tuple(order)
+
+
+def joint_outcomes(teams_selected, top_pick_list, top_pick_order,
+                   season=None):
+    """ joint_outcomes returns the exact distribution of the
+    orders of the top picks given a lottery state
+
+    @param teams_selected (list): List of key values for
+        lottery_info that represent the reverse
+        standings order
+    @param top_pick_list (list): List of key values for
+        lottery_info known to be in the top picks
+    @param top_pick_order (list): List of key values for
+        lottery_info revealed starting in the top picks
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - outcomes (Outcomes): The outcomes with a nonzero
+            probability. Its arrays are read-only and shared
+            by every caller asking for the same state
+    """
+
+    season = season or DEFAULT_SEASON
+    key = (season.name, state_cache_key(teams_selected, top_pick_list,
+                                        top_pick_order))
+    outcomes = OUTCOMES_CACHE.get(key)
+    if outcomes is None:
+        outcomes = _enumerate(teams_selected, top_pick_list, top_pick_order,
+                              season)
+        OUTCOMES_CACHE.put(key, outcomes)
+
+    return outcomes
+
+
+def _enumerate(teams_selected, top_pick_list, top_pick_order, season):
+    """ Weights every order of the top picks consistent with
+    a lottery state and settles each team's pick in it
+    """
+
+    import numpy as np
+
+    from app.odds_state import weighted_orders
+    from app.rules import outcome_picks
+
+    state = (list(teams_selected), list(top_pick_list), list(top_pick_order))
+    total_teams = len(season.lotto_chances)
+    orders, _, weights = weighted_orders(season.lotto_chances,
+                                         season.top_picks, *state)
+
+    # Revealed top picks hold the last picks, the latest reveal first
+    keep = weights > 0
+    drawn = np.array(state[2][::-1], dtype=np.intp)
+    orders = np.hstack([orders[keep],
+                        np.broadcast_to(drawn, (keep.sum(), len(drawn)))])
+    weights = weights[keep]
+
+    index = (orders - 1) @ total_teams ** np.arange(orders.shape[1])
+    picks = outcome_picks(orders[:, :orders.shape[1] - len(drawn)], state,
+                          season.top_picks, range(1, total_teams + 1))
+
+    ranked = np.argsort(index)
+    outcomes = Outcomes(index[ranked].astype(np.int64), weights[ranked],
+                        picks[ranked].astype(np.int8), season.top_picks)
+    for array in outcomes[:3]:
+        array.flags.writeable = False
+
+    return outcomes
+
+
+def marginals(outcomes):
+    """ marginals reduces the outcomes to the probability
+    of each team receiving each pick
+
+    Returns:
+
+        - prob_matrix (ndarray): Array with one row per team
+            and one column per pick, as returned by odds_matrix
+    """
+
+    import numpy as np
+
+    total_teams = outcomes.picks.shape[1]
+    prob_matrix = np.zeros((total_teams, total_teams))
+    np.add.at(prob_matrix,
+              (np.broadcast_to(np.arange(total_teams), outcomes.picks.shape),
+               outcomes.picks),
+              np.broadcast_to(outcomes.probability[:, None],
+                              outcomes.picks.shape))
+
+    return prob_matrix
+
+
+def pairwise(outcomes, last_pick):
+    """ pairwise gives the probability of every pair of
+    teams both receiving one of the first last_pick picks
+
+    @param outcomes (Outcomes): Outcomes returned by joint_outcomes
+    @param last_pick (int): Last pick counted, e.g. 3 for
+        "both land in the top 3"
+
+    Returns:
+
+        - prob_matrix (ndarray): Symmetric array with one row
+            and one column per team. The diagonal holds each
+            team's own probability
+    """
+
+    in_picks = outcomes.picks < last_pick
+
+    return (in_picks * outcomes.probability[:, None]).T @ in_picks
+
+
+def probability(outcomes, teams, last_pick):
+    """ probability gives the probability of every team
+    in teams receiving one of the first last_pick picks
+
+    @param outcomes (Outcomes): Outcomes returned by joint_outcomes
+    @param teams (list): Team lottery orders
+    @param last_pick (int): Last pick counted
+
+    Returns:
+
+        - probability (float): Probability of the event
+    """
+
+    columns = [team - 1 for team in teams]
+    in_picks = (outcomes.picks[:, columns] < last_pick).all(axis=1)
+
+    return float(outcomes.probability[in_picks].sum())
@@ -0,0 +1,354 @@
+"""
+precompute.py
+
+Builds, saves and loads the table of pick
+probabilities for every lottery state the
+site can reach, so requests only need a lookup.
+
+Each season has its own table in a subdirectory
+named after it. Rebuild the tables after changing
+a season file in app/seasons, and before deploying,
+with:
+
+    python -m app.precompute
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from app import lottery_odds
+from app.lottery_state import LotteryState
+from app.season import DEFAULT_SEASON, SEASONS
+
+TABLE_DIR = os.environ.get('ODDS_TABLE_DIR',
+                           os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                        'data'))
+# Writable directory for tables built at startup when TABLE_DIR is
+# read-only, as the deployed app directory is on App Engine
+FALLBACK_TABLE_DIR = os.environ.get('ODDS_TABLE_FALLBACK_DIR',
+                                    os.path.join(tempfile.gettempdir(),
+                                                 'odds_tables'))
+TABLE_FILE = 'odds_table.npy'
+INDEX_FILE = 'odds_index.json'
+
+# Changes whenever the reveal rules reach different states, so
+# tables enumerated under older rules are rebuilt
+STATES_VERSION = 2
+
+
+class MappedMatrices(object):
+    """ MappedMatrices reads pick probability matrices
+    straight from a memory-mapped .npy file of
+    little-endian float64 values, without numpy
+
+    @param path (str): Path to the .npy file
+
+    Raises:
+
+        - ValueError: If the file is not a C-ordered
+            float64 array of square matrices
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as table_file:
+            self._map = mmap.mmap(table_file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+
+        if self._map[:6] != b'\x93NUMPY':
+            raise ValueError('%s is not a .npy file' % path)
+        if self._map[6] == 1:
+            header_len, = struct.unpack('<H', self._map[8:10])
+            offset = 10
+        else:
+            header_len, = struct.unpack('<I', self._map[8:12])
+            offset = 12
+        header = ast.literal_eval(self._map[offset:offset + header_len]
+                                  .decode('latin1'))
+        shape = header['shape']
+        if header['descr'] != '<f8' or header['fortran_order'] or \
+                len(shape) != 3 or shape[1] != shape[2] or \
+                sys.byteorder != 'little':
+            raise ValueError('%s does not hold float64 matrices' % path)
+
+        self.shape = shape
+        self._values = memoryview(self._map)[offset + header_len:].cast('d')
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, row):
+        """ Returns one matrix as a list of rows
+        """
+
+        if not 0 <= row < self.shape[0]:
+            raise IndexError(row)
+        teams = self.shape[1]
+        start = row * teams * teams
+        return [self._values[ind:ind + teams].tolist()
+                for ind in range(start, start + teams * teams, teams)]
+
+
+class OddsTable(object):
+    """ OddsTable maps lottery states to rows
+    of a (states, teams, picks) probability array
+
+    @param matrices (ndarray): Array of pick probability
+        matrices, or MappedMatrices read from disk
+    @param index (dict): Dictionary keyed by state key
+        with values corresponding to rows of matrices
+    @param fingerprint (str): Fingerprint of the lottery
+        configuration the table was built from
+    """
+
+    def __init__(self, matrices, index, fingerprint):
+        self.matrices = matrices
+        self.index = index
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, teams_selected, top_pick_list, top_pick_order):
+        """ lookup returns the stored pick probability
+        matrix for a state, or None if the state is
+        not in the table
+        """
+
+        row = self.index.get(state_key(teams_selected,
+                                       top_pick_list,
+                                       top_pick_order))
+        if row is None:
+            return None
+        return self.matrices[row]
+
+
+def state_key(teams_selected, top_pick_list, top_pick_order):
+    """ state_key builds the canonical string key
+    for a lottery state
+
+    @param teams_selected (list): List of key values for
+        LOTTERY_INFO that have been revealed
+    @param top_pick_list (list): List of key values for
+        LOTTERY_INFO known to be in the top picks
+    @param top_pick_order (list): List of key values for
+        LOTTERY_INFO revealed in the top picks
+
+    Returns:
+
+        - key (str): Key such as '14,13,11|12|'
+    """
+
+    return '|'.join(','.join(str(x) for x in part)
+                    for part in (teams_selected, top_pick_list,
+                                 top_pick_order))
+
+
+def config_fingerprint(season=None):
+    """ config_fingerprint hashes the lottery format of
+    a season so stale tables can be detected. Defaults
+    to the default season
+    """
+
+    season = season or DEFAULT_SEASON
+    config = {'info': {team: dict(info)
+                       for team, info in season.lottery_info.items()},
+              'chances': dict(season.lotto_chances),
+              'top_picks': season.top_picks,
+              'states': STATES_VERSION}
+    return hashlib.sha1(json.dumps(config, sort_keys=True)
+                        .encode('utf-8')).hexdigest()
+
+
+def enumerate_states(lottery_info, top_picks=4):
+    """ enumerate_states walks every sequence of reveals
+    the site allows and returns each distinct state
+    passed to update_odds
+
+    @param lottery_info (dict): Dictionary keyed by
+        reverse standings order, with dictionary
+        values containing 'name' and 'id' keys
+        for the team
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+
+    Returns:
+
+        - states (list): List of (teams_selected,
+            top_pick_list, top_pick_order) tuples
+    """
+
+    states = []
+    seen = set()
+    pending = [LotteryState.start(lottery_info, top_picks)]
+    while pending:
+        state = pending.pop()
+        if state.key in seen:
+            continue
+        seen.add(state.key)
+        states.append(state.key)
+        for team in state.teams:
+            if team is not None:
+                pending.append(state.reveal(team))
+
+    return states
+
+
+def build_table(season=None, exact=False):
+    """ build_table computes the pick probability matrix
+    of every reachable state of a season that still has
+    picks left to draw. Fully revealed states are left to
+    the engine, which resolves them without drawing
+
+    @param season (Season): Season to build, the default
+        season if None
+    @param exact (bool): Whether to compute the matrices in
+        exact arithmetic, storing each probability correctly
+        rounded to float64
+
+    Returns:
+
+        - table (OddsTable): Table held in memory
+    """
+
+    season = season or DEFAULT_SEASON
+
+    states = [state for state in enumerate_states(season.lottery_info,
+                                                  season.top_picks)
+              if len(state[2]) < season.top_picks]
+    if exact:
+        import numpy as np
+
+        from app.exact_odds import exact_pick_probability_matrix
+
+        matrices = np.array([exact_pick_probability_matrix(
+            season.lotto_chances, season.top_picks, *state)
+            for state in states], dtype=float)
+    else:
+        matrices = lottery_odds.pick_probability_matrices(
+            season.lotto_chances, season.top_picks, states)
+    index = {state_key(*state): row for row, state in enumerate(states)}
+
+    return OddsTable(matrices, index, config_fingerprint(season))
+
+
+def season_table_dir(season=None, table_dir=TABLE_DIR):
+    """ season_table_dir returns the directory holding
+    the table of a season, the default season if None
+    """
+
+    return os.path.join(table_dir, (season or DEFAULT_SEASON).name)
+
+
+def save_table(table, table_dir=TABLE_DIR):
+    """ save_table writes the probability array and
+    its state index to table_dir. Each file is written
+    under a temporary name and renamed into place, so
+    processes loading the table never read a partial file
+    """
+
+    import numpy as np
+
+    os.makedirs(table_dir, exist_ok=True)
+    _write_file(os.path.join(table_dir, TABLE_FILE),
+                lambda table_file: np.save(table_file, table.matrices))
+    index = json.dumps({'fingerprint': table.fingerprint,
+                        'index': table.index})
+    _write_file(os.path.join(table_dir, INDEX_FILE),
+                lambda index_file: index_file.write(index.encode('utf-8')))
+
+
+def _write_file(path, write):
+    """ Writes a file with write and atomically moves
+    it to path
+    """
+
+    temp_path = '%s.%d.tmp' % (path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as temp_file:
+            write(temp_file)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def load_table(table_dir=TABLE_DIR, season=None):
+    """ load_table memory-maps a saved table, returning
+    None if it is missing or was built from a different
+    lottery format than the season's
+    """
+
+    try:
+        with open(os.path.join(table_dir, INDEX_FILE)) as index_file:
+            saved = json.load(index_file)
+        matrices = MappedMatrices(os.path.join(table_dir, TABLE_FILE))
+    except (IOError, OSError, ValueError, KeyError, SyntaxError):
+        return None
+
+    if saved['fingerprint'] != config_fingerprint(season):
+        return None
+
+    return OddsTable(matrices, saved['index'], saved['fingerprint'])
+
+
+def load_or_build(season=None, table_dir=None):
+    """ load_or_build loads the saved table of a season,
+    rebuilding and saving it if it is missing or stale. A
+    table that cannot be saved to table_dir is saved to
+    FALLBACK_TABLE_DIR instead, where it is also looked
+    for. A rebuilt table is mapped back from disk, so
+    processes serving it share one copy. If the table
+    cannot be saved at all it is kept in memory only
+    """
+
+    table_dirs = [table_dir or season_table_dir(season),
+                  season_table_dir(season, FALLBACK_TABLE_DIR)]
+    for path in table_dirs:
+        table = load_table(path, season)
+        if table is not None:
+            return table
+
+    logging.info('Building odds table in %s', table_dirs[0])
+    table = build_table(season)
+    for path in table_dirs:
+        try:
+            save_table(table, path)
+        except (IOError, OSError):
+            logging.warning('Could not save odds table to %s', path)
+            continue
+        return load_table(path, season) or table
+
+    return table
+
+
+def main(argv=None):
+    """ Command line entry point that rebuilds
+    the odds tables
+    """
+
+    parser = argparse.ArgumentParser(description='Rebuild the lottery odds tables')
+    parser.add_argument('--output', default=TABLE_DIR,
+                        help='Directory to write the tables to')
+    parser.add_argument('--season', action='append', choices=sorted(SEASONS),
+                        help='Season to rebuild, every season by default')
+    parser.add_argument('--exact', action='store_true',
+                        help='Compute the odds in exact arithmetic')
+    args = parser.parse_args(argv)
+
+    for name in args.season or sorted(SEASONS):
+        table_dir = season_table_dir(SEASONS[name], args.output)
+        table = build_table(SEASONS[name], args.exact)
+        save_table(table, table_dir)
+        print('Wrote %d states to %s' % (len(table), table_dir))
+
+
+if __name__ == '__main__':
+    main()
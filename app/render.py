@@ -0,0 +1,30 @@
+"""
+render.py
+
+Renders the odds table with a Jinja macro,
+producing the same markup as DataFrame.to_html
+without needing pandas on the request path
+"""
+
+from app import app
+
+
+def render_odds_table(rows, picks, classes='data'):
+    """ render_odds_table renders the odds table
+    with the odds_table macro in _odds_table.html
+
+    @param rows (list): List of rows with 'name'
+        and 'cells' attributes
+    @param picks (list): List of pick numbers used
+        as column headers
+    @param classes (str): CSS classes added to
+        the table
+
+    Returns:
+
+        - table (str): HTML table
+    """
+
+    macro = app.jinja_env.get_template('_odds_table.html').module.odds_table
+
+    return str(macro(rows, picks, classes))
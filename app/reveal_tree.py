@@ -0,0 +1,123 @@
+"""
+reveal_tree.py
+
+Expands every reveal path from a lottery state down
+to a fixed depth. Nodes are generated depth first, one
+at a time, so a whole lottery can be streamed without
+holding the tree in memory. States reached again by
+another path are looked up in a transposition table
+and only referenced, not expanded twice.
+"""
+
+import itertools
+import json
+
+from app import lottery_odds
+from app import what_if
+from app.lottery_state import LotteryState
+from app.precompute import state_key
+from app.season import DEFAULT_SEASON
+
+
+def transposition_key(teams_selected, top_pick_list, top_pick_order):
+    """ transposition_key identifies the lottery states that
+    have the same odds and the same reveals ahead of them.
+    Only the order of the top picks revealed matters
+
+    Returns:
+
+        - key (str): Key in the format of precompute.state_key
+    """
+
+    return state_key(sorted(teams_selected), sorted(top_pick_list),
+                     top_pick_order)
+
+
+def expand_tree(reveals, depth, season=None):
+    """ expand_tree generates the nodes of the reveal tree
+    below the state reached by reveals, depth first
+
+    @param reveals (list): List of key values for
+        lottery_info in the order they were revealed,
+        as accepted by LotteryState.replay
+    @param depth (int): Number of reveals to expand
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Yields:
+
+        - node (dict): Dictionary with the node 'id', its
+            'parent' id (None at the root), 'depth', the 'slot'
+            of the team revealed, its conditional 'probability'
+            given the parent, the 'path_probability' from the
+            root, the 'state' token and the percentage 'odds'
+            of each team, in slot order, for each pick. A node
+            whose state was already reached has 'same_as' set
+            to the id of that node instead of 'odds', and is
+            not expanded
+    """
+
+    season = season or DEFAULT_SEASON
+    state = LotteryState.replay(season.lottery_info, reveals,
+                                season.top_picks)
+    prob_matrix = lottery_odds.odds_matrix(*state.key, season=season)
+
+    ids = itertools.count()
+    seen = {transposition_key(*state.key): 0}
+    root = _node(next(ids), None, 0, None, 1.0, 1.0, state)
+    root['odds'] = _odds(prob_matrix)
+    yield root
+
+    yield from _expand(state, prob_matrix, root, depth, season, ids, seen)
+
+
+def _expand(state, prob_matrix, parent, depth, season, ids, seen):
+    """ Generates the subtrees below parent, computing the
+    odds of all its children in one batch
+    """
+
+    if parent['depth'] == depth:
+        return
+
+    for branch in what_if.reveal_branches(state, season, prob_matrix):
+        key = transposition_key(*branch.state.key)
+        node = _node(next(ids), parent['id'], parent['depth'] + 1,
+                     branch.team, branch.probability,
+                     parent['path_probability'] * branch.probability,
+                     branch.state)
+        if key in seen:
+            node['same_as'] = seen[key]
+            yield node
+            continue
+
+        seen[key] = node['id']
+        node['odds'] = _odds(branch.prob_matrix)
+        yield node
+
+        yield from _expand(branch.state, branch.prob_matrix, node, depth,
+                           season, ids, seen)
+
+
+def _node(node_id, parent_id, depth, slot, probability, path_probability,
+          state):
+    return {'id': node_id,
+            'parent': parent_id,
+            'depth': depth,
+            'slot': slot,
+            'probability': probability,
+            'path_probability': path_probability,
+            'state': state.token}
+
+
+def _odds(prob_matrix):
+    prob_dict = lottery_odds._round_probabilities(prob_matrix)
+    return [prob_dict[team] for team in sorted(prob_dict)]
+
+
+def ndjson(nodes):
+    """ ndjson serializes nodes as newline-delimited
+    JSON, one encoded line per node
+    """
+
+    for node in nodes:
+        yield json.dumps(node, separators=(',', ':')).encode('utf-8') + b'\n'
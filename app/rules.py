@@ -0,0 +1,241 @@
+"""
+rules.py
+
+Pick protections and swaps declared as data in the
+season files. Rules are applied to the distribution
+of lottery outcomes, so the odds table shows the
+chance of each owner holding each pick while the
+lottery is still live.
+
+    {"type": "protection", "slot": 10, "owner": "Knicks",
+     "first_pick": 11, "last_pick": 14}
+
+conveys the pick of the team in slot 10 to the Knicks
+when it lands between picks 11 and 14, and
+
+    {"type": "most_favorable", "slots": [3, 7],
+     "owners": ["Spurs", "Pacers"]}
+
+gives the Spurs the better of the picks of slots 3 and
+7 and the Pacers the other one.
+"""
+
+import collections
+
+# The pick of the team in slot goes to owner when it
+# lands between first_pick and last_pick
+Protection = collections.namedtuple('Protection', ['slot', 'owner',
+                                                   'first_pick', 'last_pick'])
+
+# The picks of the teams in slots go to owners, the most
+# favorable pick to the first owner
+MostFavorable = collections.namedtuple('MostFavorable', ['slots', 'owners'])
+
+# A row of the owners table: the slot whose pick it holds, the
+# owner's name, the probability of holding each pick and the
+# 0-based pick the owner is certain to hold, or None
+OwnerRow = collections.namedtuple('OwnerRow', ['slot', 'name',
+                                               'probabilities', 'pick'])
+
+
+def parse_rules(name, configs, total_teams):
+    """ parse_rules validates the rules of a season
+
+    @param name (str): Name of the season
+    @param configs (list): List of rule dictionaries
+        with a 'type' key
+    @param total_teams (int): Number of teams in the lottery
+
+    Returns:
+
+        - rules (tuple): Tuple of Protection and
+            MostFavorable rules
+
+    Raises:
+
+        - ValueError: If a rule is invalid
+    """
+
+    rules = []
+    used = set()
+    for config in configs:
+        try:
+            if config['type'] == 'protection':
+                rule = Protection(int(config['slot']), str(config['owner']),
+                                  int(config['first_pick']),
+                                  int(config['last_pick']))
+                slots = [rule.slot]
+                valid = 1 <= rule.first_pick <= rule.last_pick <= total_teams
+            elif config['type'] == 'most_favorable':
+                rule = MostFavorable(tuple(int(x) for x in config['slots']),
+                                     tuple(str(x) for x in config['owners']))
+                slots = list(rule.slots)
+                valid = len(slots) >= 2 and len(rule.owners) == len(slots)
+            else:
+                raise ValueError
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Rule %r of season %s is not a protection or '
+                             'most_favorable rule' % (config, name))
+
+        if not valid or len(set(slots)) < len(slots) or \
+                any(not 1 <= slot <= total_teams for slot in slots):
+            raise ValueError('Rule %r of season %s is out of range'
+                             % (config, name))
+        if used.intersection(slots):
+            raise ValueError('Rule %r of season %s uses a slot already in '
+                             'another rule' % (config, name))
+        used.update(slots)
+        rules.append(rule)
+
+    return tuple(rules)
+
+
+def _favorable_rows(rule, state, season):
+    """ Splits the picks of the teams in a MostFavorable rule
+    by rank over the joint distribution of their picks
+    """
+
+    import numpy as np
+
+    from app.odds_state import weighted_orders
+
+    total_teams = len(season.lotto_chances)
+    ranked = np.zeros((len(rule.slots), total_teams))
+    orders, _, weights = weighted_orders(season.lotto_chances,
+                                         season.top_picks, *state)
+    picks = outcome_picks(orders, state, season.top_picks, rule.slots)
+
+    ordered = np.sort(picks, axis=1)
+    for rank in range(len(rule.slots)):
+        ranked[rank] = np.bincount(ordered[:, rank], weights=weights,
+                                   minlength=total_teams)
+
+    return ranked.tolist()
+
+
+def outcome_picks(orders, state, top_picks, slots):
+    """ outcome_picks finds the pick each team receives
+    in every order of the remaining top picks
+
+    @param orders (ndarray): Array with one row per order of
+        the remaining top picks, holding team lottery orders
+    @param state (tuple): The (teams_selected, top_pick_list,
+        top_pick_order) lottery state
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param slots (list): List of team lottery orders
+
+    Returns:
+
+        - picks (ndarray): Array with one row per order and
+            one column per slot holding the 0-based pick
+    """
+
+    import numpy as np
+
+    teams_selected, top_pick_list, top_pick_order = state
+    picks = np.zeros((len(orders), len(slots)), dtype=np.intp)
+    for column, slot in enumerate(slots):
+        if slot in top_pick_order:
+            count = list(top_pick_order).index(slot)
+            picks[:, column] = top_picks - count - 1
+        elif slot in teams_selected:
+            picks[:, column] = slot - 1 + len([x for x in top_pick_list
+                                                if x > slot])
+        else:
+            # Drawn teams take their draw, the rest fall one spot for
+            # every team behind them that jumped into the top picks
+            drawn = orders == slot
+            picks[:, column] = np.where(drawn.any(axis=1),
+                                        drawn.argmax(axis=1),
+                                        slot - 1 + (orders > slot).sum(axis=1))
+
+    return picks
+
+
+def owner_rows(prob_matrix, state, season, favorable=None):
+    """ owner_rows applies a season's rules to the pick
+    probabilities of a state, giving each owner's chance
+    of holding each pick
+
+    Protections only depend on the protected team's pick,
+    so they mask its row of prob_matrix. Most favorable
+    rules depend on the joint distribution of several
+    picks, which is enumerated over the orders of the
+    remaining top picks
+
+    @param prob_matrix (list): List with one row per team and
+        one column per pick, as returned by odds_matrix
+    @param state (tuple): The (teams_selected, top_pick_list,
+        top_pick_order) lottery state
+    @param season (Season): Season holding the rules
+    @param favorable (dict): Dictionary keyed by MostFavorable
+        rule with the probability of each ranked owner holding
+        each pick, e.g. estimated by app.simulate. Enumerated
+        exactly if None
+
+    Returns:
+
+        - rows (list): List of OwnerRow tuples in slot order,
+            with the rows a rule splits a pick into after
+            the team's own row. Owners holding another team's
+            pick are named like 'Magic (via Bulls)'. Whether an owner's pick is
+            settled follows from the state, not from its
+            probabilities
+    """
+
+    from app.lottery_odds import certain_picks
+
+    if hasattr(prob_matrix, 'tolist'):
+        prob_matrix = prob_matrix.tolist()
+
+    certain = certain_picks(len(season.lottery_info), season.top_picks,
+                            *state)
+    rows = collections.OrderedDict(
+        (slot, [OwnerRow(slot, season.lottery_info[slot]['name'],
+                         prob_matrix[slot - 1], certain.get(slot))])
+        for slot in season.lottery_info)
+
+    for rule in season.rules:
+        if isinstance(rule, Protection):
+            row = rows[rule.slot][0].probabilities
+            conveyed = [prob if rule.first_pick <= pick <= rule.last_pick
+                        else 0.0 for pick, prob in enumerate(row, 1)]
+            kept = [prob - conveyed_prob
+                    for prob, conveyed_prob in zip(row, conveyed)]
+            pick = certain.get(rule.slot)
+            conveyed_pick = pick is not None and \
+                rule.first_pick <= pick + 1 <= rule.last_pick
+            rows[rule.slot] = [OwnerRow(rule.slot, rows[rule.slot][0].name,
+                                        kept,
+                                        None if conveyed_pick else pick),
+                               OwnerRow(rule.slot,
+                                        _via(rule.owner, [rule.slot], season),
+                                        conveyed,
+                                        pick if conveyed_pick else None)]
+        else:
+            if favorable is not None:
+                ranked = favorable[rule]
+            else:
+                ranked = _favorable_rows(rule, state, season)
+            # Settled picks go to the owners in order once every
+            # pick in the rule is settled
+            picks = [certain.get(slot) for slot in rule.slots]
+            picks = [None] * len(picks) if None in picks else sorted(picks)
+            for slot, owner, probabilities, pick in zip(rule.slots,
+                                                        rule.owners, ranked,
+                                                        picks):
+                if owner != season.lottery_info[slot]['name']:
+                    owner = _via(owner, rule.slots, season)
+                rows[slot] = [OwnerRow(slot, owner, probabilities, pick)]
+
+    return [row for slot_rows in rows.values() for row in slot_rows]
+
+
+def _via(owner, slots, season):
+    """ Names the row of an owner holding a pick
+    of the teams in slots
+    """
+
+    return '%s (via %s)' % (owner, '/'.join(season.lottery_info[slot]['name']
+                                            for slot in slots))
@@ -0,0 +1,174 @@
+"""
+season.py
+
+Loads the lottery format of each season from the
+JSON (or YAML, with PyYAML installed) files in
+app/seasons. Every file is validated once at startup
+into immutable Season tuples.
+
+A season file looks like:
+
+    {"title": "2023 NBA Draft Lottery Odds",
+     "top_picks": 4,
+     "teams": [{"name": "Pistons", "id": "1610612765",
+                "chances": 140}, ...],
+     "rules": [{"type": "protection", "slot": 10,
+                "owner": "Knicks", "first_pick": 11,
+                "last_pick": 14}],
+     "reveals": ["Pelicans", "Raptors", ...]}
+
+with teams listed in reverse standings order, pick
+rules as described in app.rules and, once the lottery
+has been drawn, the teams in the order they were
+revealed. The season is named after its file.
+"""
+
+import collections
+import json
+import os
+import types
+
+from app.rules import parse_rules
+from app.utils import LotteryIndex
+
+SEASON_DIR = os.environ.get('SEASON_DIR',
+                            os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                         'seasons'))
+SEASON_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+# State tokens pack each team into a byte past 15 teams, see utils.pack_teams
+MAX_TEAMS = 255
+
+# The lottery format of one season. lottery_info, a utils.LotteryIndex,
+# and lotto_chances are keyed by reverse standings order like the
+# module constants in app.lottery_odds
+Season = collections.namedtuple('Season', ['name', 'title', 'lottery_info',
+                                           'lotto_chances', 'top_picks',
+                                           'rules', 'reveals'])
+
+
+def _read(path):
+    """ Reads a season file, parsing YAML only when
+    the file asks for it
+    """
+
+    with open(path) as season_file:
+        if path.endswith('.json'):
+            return json.load(season_file)
+
+        import yaml
+        return yaml.safe_load(season_file)
+
+
+def parse_season(name, config):
+    """ parse_season validates a season configuration
+
+    @param name (str): Name of the season, e.g. '2023'
+    @param config (dict): Dictionary with 'title', 'top_picks',
+        'teams' and optional 'rules' and 'reveals' keys
+
+    Returns:
+
+        - season (Season): Immutable season
+
+    Raises:
+
+        - ValueError: If the configuration is invalid
+    """
+
+    if not isinstance(config, dict):
+        raise ValueError('Season %s must be a mapping' % name)
+
+    teams = config.get('teams')
+    if not isinstance(teams, list) or not 2 <= len(teams) <= MAX_TEAMS:
+        raise ValueError('Season %s must list 2 to %d teams'
+                         % (name, MAX_TEAMS))
+
+    top_picks = config.get('top_picks')
+    if not isinstance(top_picks, int) or not 1 <= top_picks < len(teams) - 1:
+        raise ValueError('Season %s must draw at least 1 and fewer than '
+                         '%d top picks' % (name, len(teams) - 1))
+
+    lottery_info = {}
+    lotto_chances = {}
+    for slot, team in enumerate(teams, 1):
+        try:
+            team_name, team_id, chances = \
+                team['name'], str(team['id']), team['chances']
+        except (KeyError, TypeError):
+            raise ValueError('Team %d of season %s needs a name, id and '
+                             'chances' % (slot, name))
+        if not isinstance(chances, int) or chances < 1:
+            raise ValueError('Team %s of season %s needs positive integer '
+                             'chances' % (team_name, name))
+        lottery_info[slot] = types.MappingProxyType({'name': team_name,
+                                                     'id': team_id})
+        lotto_chances[slot] = chances
+
+    if len(set(team['name'] for team in lottery_info.values())) < len(teams):
+        raise ValueError('Team names of season %s must be unique' % name)
+
+    lottery_info = LotteryIndex(lottery_info)
+
+    return Season(name,
+                  str(config.get('title', '%s NBA Draft Lottery Odds' % name)),
+                  lottery_info,
+                  types.MappingProxyType(lotto_chances),
+                  top_picks,
+                  parse_rules(name, config.get('rules', []), len(teams)),
+                  _parse_reveals(name, config.get('reveals', []),
+                                 lottery_info, top_picks))
+
+
+def _parse_reveals(name, reveals, lottery_info, top_picks):
+    """ Checks that the drawn teams of a season could have
+    been revealed in that order, returning their lottery
+    orders
+    """
+
+    from app.lottery_state import LotteryState
+
+    try:
+        slots = tuple(lottery_info.by_name[team] for team in reveals)
+        LotteryState.replay(lottery_info, slots, top_picks)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Reveals of season %s are not a valid reveal order'
+                         % name)
+
+    return slots
+
+
+def load_seasons(season_dir=SEASON_DIR):
+    """ load_seasons loads and validates every season
+    file in season_dir
+
+    @param season_dir (str): Directory of season files
+
+    Returns:
+
+        - seasons (mappingproxy): Read-only mapping from
+            season name to Season, sorted by name
+    """
+
+    seasons = {}
+    for filename in sorted(os.listdir(season_dir)):
+        name, extension = os.path.splitext(filename)
+        if extension in SEASON_EXTENSIONS:
+            seasons[name] = parse_season(name, _read(os.path.join(season_dir,
+                                                                  filename)))
+
+    if not seasons:
+        raise ValueError('No seasons found in %s' % season_dir)
+
+    return types.MappingProxyType(seasons)
+
+
+SEASONS = load_seasons()
+
+# Season served at / and used by the module constants of
+# app.lottery_odds, the latest season unless LOTTERY_SEASON is set
+try:
+    DEFAULT_SEASON = SEASONS[os.environ.get('LOTTERY_SEASON', max(SEASONS))]
+except KeyError:
+    raise ValueError('LOTTERY_SEASON %s has no season file'
+                     % os.environ['LOTTERY_SEASON'])
@@ -0,0 +1,319 @@
+"""
+simulate.py
+
+Monte Carlo estimates of lottery pick probabilities
+for formats where exact enumeration is too slow.
+Lotteries are sampled in seeded chunks so results are
+reproducible however the chunks are spread across
+processes. Pick rules are applied to the sampled
+outcomes, so owners of protected and swapped picks
+are estimated too.
+"""
+
+import concurrent.futures
+
+import numpy as np
+
+from app.lottery_odds import add_fall_spots, certain_picks
+from app.rules import MostFavorable, outcome_picks, owner_rows
+
+
+class SimulationResult(object):
+    """ SimulationResult accumulates pick counts
+    from simulated lotteries
+
+    @param counts (ndarray): Array with one row per team and
+        one column per pick summing the weights of simulated
+        outcomes
+    @param samples (int): Number of simulated lotteries
+    @param certain (dict): Dictionary keyed by team lottery
+        order with the pick already known for that team
+    @param ranked (list): One array per MostFavorable rule
+        simulated, with one row per rank summing the weights
+        of the picks the rule's owner of that rank received
+    @param weights (tuple): Sum and sum of squares of the
+        lotteries' likelihood weights, (samples, samples)
+        when every lottery has weight 1
+    """
+
+    def __init__(self, counts, samples, certain, ranked=(), weights=None):
+        self.counts = counts
+        self.samples = samples
+        self.certain = certain
+        self.ranked = ranked
+        self.weights = weights if weights is not None else (samples, samples)
+
+    @property
+    def effective_samples(self):
+        """ effective_samples is the number of unweighted
+        lotteries estimating the odds as precisely as the
+        weighted ones simulated, (sum w) ** 2 / sum w ** 2
+        """
+
+        total, squares = self.weights
+        return total * total / squares if squares else 0.0
+
+    def probabilities(self):
+        """ probabilities returns the estimated probability
+        of each team receiving each pick
+
+        Returns:
+
+            - prob_matrix (ndarray): Array with one row per team
+                and one column per pick
+        """
+
+        totals = self.counts.sum(axis=1, keepdims=True).astype(float)
+        prob_matrix = np.zeros(self.counts.shape)
+        np.divide(self.counts, totals, out=prob_matrix, where=totals != 0)
+        for team, pick in self.certain.items():
+            prob_matrix[team - 1] = 0
+            prob_matrix[team - 1, pick] = 1
+
+        return prob_matrix
+
+    def confidence_interval(self, z=1.96):
+        """ confidence_interval returns Wilson score bounds
+        on each estimated probability. Picks already known
+        have no uncertainty
+
+        @param z (float): Standard normal quantile of the
+            interval, 1.96 for 95%
+
+        Returns:
+
+            - lower (ndarray): Lower bound of each probability
+            - upper (ndarray): Upper bound of each probability
+        """
+
+        prob_matrix = self.probabilities()
+        lower, upper = self.bounds(prob_matrix, z)
+        for team in self.certain:
+            lower[team - 1] = upper[team - 1] = prob_matrix[team - 1]
+
+        return lower, upper
+
+    def bounds(self, probabilities, z=1.96):
+        """ bounds returns Wilson score bounds on probabilities
+        estimated from these lotteries, such as those of
+        owner rows, over the effective number of samples
+
+        @param probabilities (array_like): Estimated probabilities
+        @param z (float): Standard normal quantile of the
+            interval, 1.96 for 95%
+
+        Returns:
+
+            - lower (ndarray): Lower bound of each probability
+            - upper (ndarray): Upper bound of each probability
+        """
+
+        probabilities = np.asarray(probabilities, dtype=float)
+        samples = self.effective_samples
+        if not samples:
+            return (np.zeros(probabilities.shape),
+                    np.ones(probabilities.shape))
+
+        spread = z * z / samples
+        center = (probabilities + spread / 2) / (1 + spread)
+        half_width = z / (1 + spread) * \
+            np.sqrt(probabilities * (1 - probabilities) / samples +
+                    spread / (4 * samples))
+
+        return (np.clip(center - half_width, 0, 1),
+                np.clip(center + half_width, 0, 1))
+
+    def owner_rows(self, state, season):
+        """ owner_rows applies a season's rules to the
+        estimated probabilities, as rules.owner_rows does
+        to exact ones. The season's MostFavorable rules
+        must be the ones simulated
+
+        @param state (tuple): The (teams_selected, top_pick_list,
+            top_pick_order) lottery state simulated
+        @param season (Season): Season holding the rules
+
+        Returns:
+
+            - rows (list): List of rules.OwnerRow tuples
+        """
+
+        favorable = [rule for rule in season.rules
+                     if isinstance(rule, MostFavorable)]
+        total = self.weights[0] or 1
+        ranked = {rule: (counts / total).tolist()
+                  for rule, counts in zip(favorable, self.ranked)}
+
+        return owner_rows(self.probabilities(), state, season, ranked)
+
+
+def _simulate_chunk(chances, top_picks, teams_selected,
+                    top_pick_list, top_pick_order, favorable_slots,
+                    size, seed):
+    """ Simulates size lotteries from one seed, returning
+    the weighted pick counts, the sum and sum of squares
+    of the weights and the weighted ranked pick counts of
+    each set of favorable_slots
+    """
+
+    rng = np.random.default_rng(seed)
+    total_teams = len(chances)
+    draws = max(top_picks - len(top_pick_order), 0)
+    pool = np.array([team - 1 for team in range(1, total_teams + 1)
+                     if team not in teams_selected], dtype=np.intp)
+    pool_chances = chances[pool]
+    required = np.isin(pool, [team - 1 for team in top_pick_list
+                              if team not in teams_selected])
+
+    # Teams are drawn one pick at a time without replacement.
+    # Each draw is one of the teams known to be in the top
+    # picks with probability missing / left, as it would be if
+    # they were equally likely to fill any draw left, and
+    # otherwise one of the other teams. Within that group the
+    # team with the largest Gumbel-perturbed log chances is
+    # drawn. Every lottery is consistent with the state and
+    # is weighted by its likelihood over that of the draw, so
+    # no lottery is discarded
+    with np.errstate(divide='ignore'):
+        log_chances = np.log(pool_chances)
+    rows = np.arange(size)
+    drawn = np.zeros((size, len(pool)), dtype=bool)
+    order = np.zeros((size, draws), dtype=np.intp)
+    weights = np.ones(size)
+    missing = np.full(size, required.sum())
+    remaining = np.full(size, pool_chances.sum())
+    for pick in range(draws):
+        left = draws - pick
+        share = missing / left
+        from_required = rng.random(size) < share
+        eligible = ~drawn & (required == from_required[:, None])
+        eligible_chances = (pool_chances * eligible).sum(axis=1)
+        weights *= eligible_chances / remaining / \
+            np.where(from_required, share, 1 - share)
+        keys = np.where(eligible,
+                        log_chances - np.log(-np.log(rng.random(drawn.shape))),
+                        -np.inf)
+        team = keys.argmax(axis=1)
+        order[:, pick] = team
+        drawn[rows, team] = True
+        missing -= required[team]
+        remaining -= pool_chances[team]
+
+    counts = np.zeros((total_teams, total_teams))
+    for pick in range(draws):
+        np.add.at(counts, (pool[order[:, pick]], pick), weights)
+    add_fall_spots(counts, drawn, weights, pool, top_picks)
+
+    state = (teams_selected, top_pick_list, top_pick_order)
+    ranked = []
+    for slots in favorable_slots:
+        picks = np.sort(outcome_picks(pool[order] + 1, state, top_picks,
+                                      slots), axis=1)
+        ranked.append(np.array([np.bincount(picks[:, rank], weights=weights,
+                                            minlength=total_teams)
+                                for rank in range(len(slots))]))
+
+    return counts, (weights.sum(), (weights * weights).sum()), ranked
+
+
+def simulate_iter(lotto_combos, top_picks, teams_selected,
+                  top_pick_list, top_pick_order, lotteries=100000,
+                  chunk_size=10000, seed=0, processes=1, rules=()):
+    """ simulate_iter simulates lotteries consistent with a
+    revealed state, yielding the running result after each
+    chunk so callers can show the odds converging
+
+    @param lotto_combos (dict): Dictionary keyed by team
+        lottery order with values corresponding to each team's
+        lottery chances
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+    @param teams_selected (list): List containing the team lottery
+        order of teams already revealed in the lottery
+    @param top_pick_list (list): List containing the team lottery
+        order of teams already revealed to be in the top picks
+    @param top_pick_order (list): List containing the order of the
+        top picks as they are revealed
+    @param lotteries (int): Number of lotteries to simulate
+    @param chunk_size (int): Number of lotteries per chunk
+    @param seed (int): Seed the chunk seeds are spawned from
+    @param processes (int): Number of worker processes, or 1
+        to simulate in this process
+    @param rules (tuple): Pick rules of the season, see
+        app.rules. The picks of MostFavorable rules are
+        ranked in every simulated lottery
+
+    Returns:
+
+        - results (generator): Generator of SimulationResult
+            objects covering the chunks completed so far
+    """
+
+    total_teams = len(lotto_combos)
+    chances = np.array([lotto_combos[team] for team in range(1, total_teams + 1)],
+                       dtype=float)
+    sizes = [min(chunk_size, lotteries - start)
+             for start in range(0, lotteries, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    certain = certain_picks(total_teams, top_picks, teams_selected,
+                            top_pick_list, top_pick_order)
+
+    favorable_slots = [rule.slots for rule in rules
+                       if isinstance(rule, MostFavorable)]
+    args = [(chances, top_picks, list(teams_selected), list(top_pick_list),
+             list(top_pick_order), favorable_slots, size, chunk_seed)
+            for size, chunk_seed in zip(sizes, seeds)]
+
+    if processes == 1:
+        yield from _accumulate((_simulate_chunk(*chunk_args)
+                                for chunk_args in args),
+                               sizes, total_teams, favorable_slots, certain)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            yield from _accumulate(executor.map(_simulate_chunk, *zip(*args)),
+                                   sizes, total_teams, favorable_slots,
+                                   certain)
+
+
+def _accumulate(chunks, sizes, total_teams, favorable_slots, certain):
+    """ Sums the chunks of simulated lotteries, yielding
+    the running result after each one
+    """
+
+    counts = np.zeros((total_teams, total_teams))
+    ranked = [np.zeros((len(slots), total_teams)) for slots in favorable_slots]
+    samples, total, squares = 0, 0.0, 0.0
+    for size, (chunk_counts, chunk_weights, chunk_ranked) in \
+            zip(sizes, chunks):
+        counts += chunk_counts
+        samples += size
+        total += chunk_weights[0]
+        squares += chunk_weights[1]
+        for ranks, chunk in zip(ranked, chunk_ranked):
+            ranks += chunk
+        yield SimulationResult(counts.copy(), samples, certain,
+                               [ranks.copy() for ranks in ranked],
+                               (total, squares))
+
+
+def simulate(lotto_combos, top_picks, teams_selected,
+             top_pick_list, top_pick_order, lotteries=100000,
+             chunk_size=10000, seed=0, processes=1, rules=()):
+    """ simulate estimates the probability of each team
+    receiving each pick from simulated lotteries. Takes
+    the same arguments as simulate_iter
+
+    Returns:
+
+        - result (SimulationResult): Result covering
+            every simulated lottery
+    """
+
+    result = None
+    for result in simulate_iter(lotto_combos, top_picks, teams_selected,
+                                top_pick_list, top_pick_order, lotteries,
+                                chunk_size, seed, processes, rules):
+        pass
+
+    return result
@@ -0,0 +1,128 @@
+"""
+startup.py
+
+Measures the cold start of the site in fresh
+interpreters: an import-time breakdown of main
+and the time to serve the first request.
+
+    python -m app.startup --budget-ms 1000
+
+exits with status 1 when the time to first
+response is over budget.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Imported in a fresh interpreter to time the first request
+FIRST_RESPONSE_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+response = main.app.test_client().get('/')
+served = time.perf_counter()
+json.dump({'import_ms': 1000 * (imported - start),
+           'first_response_ms': 1000 * (served - start),
+           'status': response.status_code,
+           'modules': sorted(sys.modules)}, sys.stdout)
+'''
+
+
+def _run(args):
+    """ Runs python with args from the repository
+    root, returning the completed process
+    """
+
+    return subprocess.run([sys.executable] + args, cwd=ROOT,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+
+
+def import_times(module='main'):
+    """ import_times imports module in a fresh interpreter
+    with -X importtime and returns the modules it imports
+    directly, slowest first
+
+    @param module (str): Module to import
+
+    Returns:
+
+        - times (list): List of (name, milliseconds) tuples
+            with the cumulative import time of each module
+    """
+
+    stderr = _run(['-X', 'importtime', '-c', 'import %s' % module]).stderr
+
+    # Modules are listed after everything they import, so the direct
+    # imports of module are the entries one level deeper just before it
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0:
+            if name.strip() == module:
+                break
+            times = []
+        elif depth == 1:
+            times.append((name.strip(), int(cumulative) / 1000.0))
+
+    return sorted(times, key=lambda item: -item[1])
+
+
+def first_response():
+    """ first_response starts a fresh interpreter, imports
+    main and serves one request to '/'
+
+    Returns:
+
+        - timings (dict): Dictionary with 'import_ms',
+            'first_response_ms', the response 'status' and
+            the 'modules' loaded by then
+    """
+
+    return json.loads(_run(['-c', FIRST_RESPONSE_SCRIPT]).stdout)
+
+
+def main(argv=None):
+    """ Command line entry point that prints the
+    startup report and checks the budget
+    """
+
+    parser = argparse.ArgumentParser(description='Report cold start time')
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Fail if the first response takes longer')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of imports to list')
+    args = parser.parse_args(argv)
+
+    print('Slowest imports under main:')
+    for name, milliseconds in import_times()[:args.top]:
+        print('  %8.1f ms  %s' % (milliseconds, name))
+
+    timings = first_response()
+    print('Import main:     %8.1f ms' % timings['import_ms'])
+    print('First response:  %8.1f ms (status %d)' %
+          (timings['first_response_ms'], timings['status']))
+    for heavy in ('numpy', 'pandas'):
+        print('%s loaded: %s' % (heavy, heavy in timings['modules']))
+
+    if args.budget_ms is not None and \
+            timings['first_response_ms'] > args.budget_ms:
+        print('Over the %.0f ms budget' % args.budget_ms)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+test_api.py
+
+This file contains the tests for
+functions in the api.py file
+"""
+
+import json
+
+from app import api
+
+
+def test_odds_json():
+    """ This function tests odds_json
+    in app.api.py
+    """
+
+    body, etag = api.odds_json('4A')
+    payload = json.loads(body.decode('utf-8'))
+
+    assert payload['state'] == '4A'
+    assert payload['teams_selected'] == [14]
+    assert payload['teams'][0]['id'] == '1610612765'
+    assert payload['teams'][13]['odds'][13] == 100
+    assert api.odds_json('4A')[0] is body
+
+    try:
+        api.odds_json('not a token')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('Invalid token accepted')
+
+
+def test_what_if_json():
+    """ This function tests what_if_json
+    in app.api.py
+    """
+
+    body, _ = api.what_if_json('')
+    payload = json.loads(body.decode('utf-8'))
+
+    assert payload['state'] == ''
+    assert [reveal['slot'] for reveal in payload['reveals']] == \
+        [14, 13, 12, 11, 10]
+    assert payload['reveals'][0]['state'] == '4A'
+    assert payload['reveals'][0]['teams'] == \
+        json.loads(api.odds_json('4A')[0].decode('utf-8'))['teams']
+    assert abs(sum(reveal['chance'] for reveal in payload['reveals'])
+               - 100) < 0.5
+
+
+def test_outcomes_json():
+    """ This function tests outcomes_json
+    in app.api.py
+    """
+
+    body, _ = api.outcomes_json('4A')
+    payload = json.loads(body.decode('utf-8'))
+
+    assert payload['state'] == '4A'
+    assert payload['total_teams'] == 14 and payload['top_picks'] == 4
+    assert len(payload['index']) == len(payload['probability']) == \
+        13 * 12 * 11 * 10
+    assert abs(sum(payload['probability']) - 1) < 1e-12
+    assert api.outcomes_json('4A')[0] is body
+
+
+def test_simulation_ndjson():
+    """ This function tests simulation_ndjson
+    in app.api.py
+    """
+
+    lines = [json.loads(line.decode('utf-8'))
+             for line in api.simulation_ndjson('4A', lotteries=25000)]
+
+    assert [line['lotteries'] for line in lines] == [10000, 20000, 25000]
+    assert lines[-1]['state'] == '4A'
+    assert [row['name'] for row in lines[-1]['rows']][11:13] == \
+        ['Bulls', 'Magic (via Bulls)']
+    assert lines[-1]['rows'][-1]['odds'][13] == 100
+    assert lines[-1]['rows'][-1]['lower'][13] == 100
+    assert all(lower <= odds <= upper
+               for row in lines[-1]['rows']
+               for lower, odds, upper in zip(row['lower'], row['odds'],
+                                             row['upper']))
+
+    try:
+        api.simulation_ndjson('not a token')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('Invalid token accepted')
@@ -0,0 +1,76 @@
+"""
+test_archive.py
+
+This file contains the tests for
+functions in the archive.py file
+"""
+
+import json
+
+from app import archive
+from app import lottery_odds
+from app.season import DEFAULT_SEASON, SEASON_DIR, SEASONS
+
+
+def test_import_seasons(tmp_path):
+    """ This function tests import_seasons and
+    load_configs in app.archive.py
+    """
+
+    names = archive.import_seasons(list(SEASONS.values()), str(tmp_path))
+    assert names == [name for name in SEASONS if SEASONS[name].reveals]
+
+    teams = archive.read_table(str(tmp_path), 'teams')
+    assert len(teams['slot']) == 14 * len(names)
+    assert list(archive.read_table(str(tmp_path), 'reveals')['slot'][:3]) == \
+        [14, 13, 12]
+
+    name, config = archive.load_configs(str(tmp_path))[0]
+    season = archive.parse_season(name, config)
+    assert season.lottery_info == SEASONS[name].lottery_info
+    assert season.lotto_chances == SEASONS[name].lotto_chances
+    assert season.reveals == SEASONS[name].reveals
+
+
+def test_archive_seasons(tmp_path):
+    """ This function tests that archive_seasons in
+    app.archive.py reads past seasons without serving them
+    """
+
+    assert archive.archive_seasons(str(tmp_path / 'missing')) == \
+        dict(SEASONS)
+
+    with open('%s/%s.json' % (SEASON_DIR, DEFAULT_SEASON.name)) as config:
+        past = json.load(config)
+    past['title'] = 'A Past Lottery'
+    with open(str(tmp_path / '1999.json'), 'w') as season_file:
+        json.dump(past, season_file)
+
+    seasons = archive.archive_seasons(str(tmp_path))
+
+    assert list(seasons) == ['1999'] + list(SEASONS)
+    assert seasons['1999'].reveals == DEFAULT_SEASON.reveals
+    assert '1999' not in SEASONS
+    assert '1999' not in lottery_odds.ODDS_CACHES
+
+
+def test_backtest(tmp_path):
+    """ This function tests backtest
+    in app.archive.py
+    """
+
+    archive.import_seasons([DEFAULT_SEASON], str(tmp_path))
+    steps = archive.backtest(str(tmp_path), processes=2)
+
+    count = len(steps['step'])
+    assert steps['season'] == [DEFAULT_SEASON.name] * count
+    assert steps['step'] == list(range(count))
+    # The odds sharpen as teams are revealed, down to the actual order
+    assert steps['log_loss'] == sorted(steps['log_loss'], reverse=True)
+    assert steps['brier'] == sorted(steps['brier'], reverse=True)
+    assert steps['log_loss'][-1] == 0 and steps['brier'][-1] == 0
+
+    odds = archive.read_table(str(tmp_path), 'odds')
+    assert len(odds['probability']) == count * 14 * 14
+    start = odds['probability'][:14 * 14].reshape(14, 14)
+    assert abs(start - lottery_odds.odds_matrix([], [], [])).max() < 1e-9
@@ -0,0 +1,51 @@
+"""
+test_cache.py
+
+This file contains the tests for
+functions in the cache.py file
+"""
+
+from app import cache
+from app import lottery_odds
+
+
+def test_lru_cache():
+    """ This function tests LRUCache
+    in app.cache.py
+    """
+
+    lru = cache.LRUCache(max_size=2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+
+    assert lru.get('a') == 1
+    lru.put('c', 3)
+
+    assert lru.get('b') is None
+    assert lru.get('c') == 3
+    assert lru.get_or_compute('d', lambda: 4) == 4
+    assert lru.stats() == {'size': 2, 'max_size': 2, 'hits': 2,
+                           'misses': 2, 'evictions': 2}
+
+    lru.clear()
+
+    assert len(lru) == 0
+
+
+def test_odds_table_html():
+    """ This function tests odds_table_html
+    in app.lottery_odds.py
+    """
+
+    lottery_odds.set_odds_table(None)
+    hits = lottery_odds.ODDS_CACHE.hits
+
+    table = lottery_odds.odds_table_html([14, 13, 11], [12], [])
+
+    assert table.startswith('<table border="1" class="dataframe data">')
+    assert lottery_odds.odds_table_html((14, 13, 11), (12,), ()) is table
+    assert lottery_odds.ODDS_CACHE.hits == hits + 1
+
+    lottery_odds.set_odds_table(None)
+
+    assert len(lottery_odds.ODDS_CACHE) == 0
@@ -0,0 +1,64 @@
+"""
+test_exact_odds.py
+
+This file contains the tests for
+functions in the exact_odds.py file
+"""
+
+from fractions import Fraction
+
+from app import exact_odds
+from app import lottery_odds
+from app.season import DEFAULT_SEASON
+
+STATES = [([], [], []),
+          ([14, 13, 11], [12], []),
+          ([14, 13, 11, 9], [12, 10], []),
+          ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11], [11, 7, 2, 1], [11]),
+          ([14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3], [], [4, 3])]
+
+
+def test_exact_pick_probability_matrix():
+    """ This function tests exact_pick_probability_matrix
+    in app.exact_odds.py
+    """
+
+    prob_matrix = exact_odds.exact_pick_probability_matrix(
+        DEFAULT_SEASON.lotto_chances, DEFAULT_SEASON.top_picks, [], [], [])
+
+    assert prob_matrix[0][0] == Fraction(140, 1000)
+    assert prob_matrix[13][0] == Fraction(5, 1000)
+    assert all(sum(row) == 1 for row in prob_matrix)
+    assert all(sum(column) == 1 for column in zip(*prob_matrix))
+
+    prob_matrix = exact_odds.exact_pick_probability_matrix(
+        DEFAULT_SEASON.lotto_chances, DEFAULT_SEASON.top_picks, *STATES[3])
+    assert prob_matrix[10][3] == 1
+    assert prob_matrix[6][0] + prob_matrix[6][1] + prob_matrix[6][2] == 1
+
+
+def test_percentages():
+    """ This function tests percentages
+    in app.exact_odds.py
+    """
+
+    prob_matrix = exact_odds.exact_pick_probability_matrix(
+        DEFAULT_SEASON.lotto_chances, DEFAULT_SEASON.top_picks, [], [], [])
+
+    assert exact_odds.percentages(prob_matrix) == \
+        lottery_odds.calculate_pick_probabilities(
+            DEFAULT_SEASON.lotto_chances, DEFAULT_SEASON.top_picks,
+            [], [], [])
+    assert exact_odds.percentages([[Fraction(1, 2000), Fraction(1, 3)]]) == \
+        {1: [0.1, 33.3]}
+
+
+def test_cross_validate():
+    """ This function tests cross_validate
+    in app.exact_odds.py
+    """
+
+    count, max_error = exact_odds.cross_validate(DEFAULT_SEASON, STATES)
+
+    assert count == len(STATES)
+    assert max_error < 1e-12
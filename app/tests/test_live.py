@@ -0,0 +1,91 @@
+"""
+test_live.py
+
+This file contains the tests for
+functions in the live.py file
+"""
+
+import json
+
+from app import live
+from app import lottery_odds
+
+
+class Request(object):
+        pass
+
+
+def test_live_broadcast(tmp_path):
+    """ This function tests LiveBroadcast
+    in app.live.py
+    """
+
+    store = live.FileLiveStore(str(tmp_path / 'live.json'))
+    broadcast = live.LiveBroadcast(lottery_odds.LOTTERY_INFO, store=store)
+    events = broadcast.events()
+
+    assert broadcast.version == 1
+    assert next(events).startswith('id: 1\nevent: odds\ndata: ')
+
+    broadcast.reveal('Pelicans')
+
+    event = next(events)
+    payload = json.loads(event.split('data: ')[1])
+
+    assert event.startswith('id: 2\n')
+    assert payload['version'] == 2
+    assert payload['state'] == '4A'
+    assert payload['teams'][13]['odds'][13] == 100
+    assert broadcast.wait(2, timeout=0) == (2, broadcast.payload)
+
+    broadcast.reset()
+
+    assert json.loads(broadcast.payload)['state'] == ''
+
+
+def test_shared_store(tmp_path):
+    """ This function tests that LiveBroadcasts of
+    different workers share the live state
+    """
+
+    path = str(tmp_path / 'live.json')
+    admin = live.LiveBroadcast(lottery_odds.LOTTERY_INFO,
+                               store=live.FileLiveStore(path))
+    viewer = live.LiveBroadcast(lottery_odds.LOTTERY_INFO,
+                                store=live.FileLiveStore(path))
+
+    assert viewer.wait(0, timeout=0)[0] == 1
+
+    admin.reveal('Pelicans')
+
+    version, payload = viewer.wait(1, timeout=5)
+
+    assert version == 2
+    assert payload == admin.payload
+    assert json.loads(payload)['state'] == '4A'
+    assert viewer.teams_selected == [14]
+
+    viewer.reveal('Raptors')
+
+    assert admin.wait(2, timeout=5)[0] == 3
+    assert admin.teams_selected == [14, 13]
+
+
+def test_is_admin():
+    """ This function tests is_admin
+    in app.live.py
+    """
+
+    request = Request()
+    request.headers = {'Authorization': 'Bearer secret'}
+
+    live.ADMIN_TOKEN = ''
+    assert not live.is_admin(request)
+
+    live.ADMIN_TOKEN = 'secret'
+    assert live.is_admin(request)
+
+    request.headers = {'Authorization': 'Bearer wrong'}
+    assert not live.is_admin(request)
+
+    live.ADMIN_TOKEN = ''
@@ -0,0 +1,264 @@
+"""
+test_lottery_odds.py
+
+This file contains the tests for
+functions in the lottery_odds.py file
+"""
+
+import itertools
+
+import numpy as np
+
+from app import lottery_odds
+from app import rules
+
+STATES = [([], [], []),
+          ([14, 13, 12], [], []),
+          ([14, 13, 11], [12], []),
+          ([14, 13, 11, 9], [12, 10], []),
+          ([14, 13, 11, 9, 8, 6, 5, 3, 2, 1], [12, 10, 7, 4], []),
+          ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3], [11, 7, 2, 1], []),
+          ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11], [11, 7, 2, 1], [11]),
+          ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11, 7, 2],
+           [11, 7, 2, 1], [11, 7, 2]),
+          ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11, 7, 2, 1],
+           [11, 7, 2, 1], [11, 7, 2, 1])]
+
+
+def legacy_pick_probabilities(lotto_combos, top_picks,
+                              teams_selected, top_pick_list,
+                              top_pick_order):
+    """ Reference implementation enumerating every permutation
+    of the top picks, kept to validate the dynamic program
+    """
+
+    prob_dict = {}
+    total_teams = len(lotto_combos)
+    total_combos = 0
+    for num in lotto_combos:
+        if num not in teams_selected:
+            total_combos += lotto_combos[num]
+
+    team_list = list(lotto_combos.keys())
+    for team in range(1, total_teams + 1):
+        prob_list = [0] * total_teams
+        if team in teams_selected and team not in top_pick_order:
+            fall_spot = len([x for x in top_pick_list if x > team])
+            prob_list[team - 1 + fall_spot] = 1
+        elif team in top_pick_order:
+            for count, team_here in enumerate(top_pick_order):
+                if team_here == team:
+                    prob_list[top_picks - count - 1] = 1
+        else:
+            prob_fall = [0] * (top_picks + 1)
+            for order in itertools.permutations(team_list,
+                                                top_picks - len(top_pick_order)):
+                if any(x not in order and x not in teams_selected
+                       for x in top_pick_list):
+                    continue
+                if any(x in teams_selected for x in order):
+                    continue
+                balls_remaining = total_combos
+                order_probability = 1
+                for pick in order:
+                    order_probability *= lotto_combos[pick]/float(balls_remaining)
+                    balls_remaining -= lotto_combos[pick]
+                if team in order:
+                    prob_list[order.index(team)] += order_probability
+                else:
+                    prob_fall[len([x for x in order if x > team])] += \
+                        order_probability
+
+            for spot in range(team - 1, team + top_picks - len(top_pick_order)):
+                if spot <= total_teams - 1 and spot > top_picks - 1:
+                    prob_list[spot] = prob_fall[spot - team + 1]
+
+        prob_dict[team] = [0 if sum(prob_list) == 0 else x/sum(prob_list)
+                           for x in prob_list]
+
+    return prob_dict
+
+
+def test_pick_probability_matrix():
+    """ This function tests pick_probability_matrix
+    in app.lottery_odds.py against the permutation
+    enumeration it replaces
+    """
+
+    for teams_selected, top_pick_list, top_pick_order in STATES:
+        prob_matrix = \
+            lottery_odds.pick_probability_matrix(lottery_odds.LOTTO_CHANCES,
+                                                 lottery_odds.TOP_PICKS,
+                                                 teams_selected,
+                                                 top_pick_list,
+                                                 top_pick_order)
+        legacy = legacy_pick_probabilities(lottery_odds.LOTTO_CHANCES,
+                                           lottery_odds.TOP_PICKS,
+                                           teams_selected,
+                                           top_pick_list,
+                                           top_pick_order)
+        for team in legacy:
+            assert np.allclose(prob_matrix[team - 1], legacy[team],
+                               rtol=0, atol=1e-12)
+
+    lotto_combos = {1: 40, 2: 30, 3: 20, 4: 15, 5: 10, 6: 5, 7: 3, 8: 1}
+    for teams_selected, top_pick_list in [([], []), ([8, 6], [7]),
+                                          ([8, 6, 4, 2], [7, 5, 3])]:
+        prob_matrix = \
+            lottery_odds.pick_probability_matrix(lotto_combos, 3,
+                                                 teams_selected,
+                                                 top_pick_list, [])
+        legacy = legacy_pick_probabilities(lotto_combos, 3,
+                                           teams_selected,
+                                           top_pick_list, [])
+        for team in legacy:
+            assert np.allclose(prob_matrix[team - 1], legacy[team],
+                               rtol=0, atol=1e-12)
+
+
+def test_pick_probability_matrix_formats():
+    """ This function tests pick_probability_matrix
+    in app.lottery_odds.py on a 16 team, 5 pick lottery
+    """
+
+    lotto_combos = {x: 17 - x for x in range(1, 17)}
+    prob_matrix = lottery_odds.pick_probability_matrix(lotto_combos, 5,
+                                                       [], [], [])
+
+    assert prob_matrix.shape == (16, 16)
+    assert np.allclose(prob_matrix.sum(axis=0), 1)
+    assert np.allclose(prob_matrix.sum(axis=1), 1)
+    assert prob_matrix[15][:5].sum() > 0
+    assert prob_matrix[0][6:].sum() == 0
+
+
+def test_pick_probability_matrices():
+    """ This function tests pick_probability_matrices
+    in app.lottery_odds.py against pick_probability_matrix
+    """
+
+    prob_matrices = \
+        lottery_odds.pick_probability_matrices(lottery_odds.LOTTO_CHANCES,
+                                               lottery_odds.TOP_PICKS,
+                                               STATES)
+
+    assert prob_matrices.shape == (len(STATES), 14, 14)
+    for prob_matrix, state in zip(prob_matrices, STATES):
+        expected = \
+            lottery_odds.pick_probability_matrix(lottery_odds.LOTTO_CHANCES,
+                                                 lottery_odds.TOP_PICKS,
+                                                 *state)
+        assert np.allclose(prob_matrix, expected, rtol=0, atol=1e-12)
+
+    lotto_combos = {x: 17 - x for x in range(1, 17)}
+    states = [([], [], []), ([16, 14], [15], [])]
+    prob_matrices = lottery_odds.pick_probability_matrices(lotto_combos, 5,
+                                                           states)
+    for prob_matrix, state in zip(prob_matrices, states):
+        expected = lottery_odds.pick_probability_matrix(lotto_combos, 5,
+                                                        *state)
+        assert np.allclose(prob_matrix, expected, rtol=0, atol=1e-12)
+
+
+def test_certain_picks():
+    """ This function tests certain_picks
+    in app.lottery_odds.py
+    """
+
+    for state in STATES:
+        prob_matrix = \
+            lottery_odds.pick_probability_matrix(lottery_odds.LOTTO_CHANCES,
+                                                 lottery_odds.TOP_PICKS,
+                                                 *state)
+        certain = lottery_odds.certain_picks(14, lottery_odds.TOP_PICKS,
+                                             *state)
+        settled = {team: int(np.argmax(row))
+                   for team, row in enumerate(prob_matrix, 1)
+                   if row.max() > 1 - 1e-12}
+        assert certain == settled
+
+    assert lottery_odds.certain_picks(14, 4, [14, 13, 11], [12], []) == \
+        {14: 13, 13: 12, 11: 11}
+    # The last top pick left to draw goes to the last team known to be in it
+    assert lottery_odds.certain_picks(14, 4, [14, 13, 12, 11, 10, 9],
+                                      [11, 10, 9, 1], [10, 9, 11]) == \
+        {14: 13, 13: 12, 12: 11, 10: 3, 9: 2, 11: 1, 1: 0,
+         2: 4, 3: 5, 4: 6, 5: 7, 6: 8, 7: 9, 8: 10}
+
+
+def test_add_fall_spots():
+    """ This function tests add_fall_spots
+    in app.lottery_odds.py
+    """
+
+    # One top pick drawn from five teams, by team 4 with
+    # weight 3 or team 2 with weight 1
+    prob_matrix = np.zeros((5, 5))
+    lottery_odds.add_fall_spots(prob_matrix,
+                                [[0, 0, 0, 1, 0], [0, 1, 0, 0, 0]],
+                                [3, 1], np.arange(5), 1)
+
+    assert prob_matrix.tolist() == [[0, 4, 0, 0, 0],
+                                    [0, 0, 3, 0, 0],
+                                    [0, 0, 1, 3, 0],
+                                    [0, 0, 0, 1, 0],
+                                    [0, 0, 0, 0, 4]]
+
+    # A batch of states, each with its own pool
+    batch = np.zeros((2, 5, 5))
+    lottery_odds.add_fall_spots(batch, [[1, 0], [0, 1]], [[1, 0], [0, 1]],
+                                [[3, 4], [0, 4]], 1)
+
+    assert batch[0, 4].tolist() == [0, 0, 0, 0, 1]
+    assert batch[1, 0].tolist() == [0, 1, 0, 0, 0]
+
+
+def test_format_rows():
+    """ This function tests _format_rows
+    in app.lottery_odds.py
+    """
+
+    season = lottery_odds.DEFAULT_SEASON
+    rows = [rules.OwnerRow(1, 'Settled', [0.0, 1.0, 0.0], 1),
+            rules.OwnerRow(2, 'Likely', [0.9996, 0.0, 0.0004], None),
+            rules.OwnerRow(3, 'Never', [0.0, 0.0, 0.0], None),
+            rules.OwnerRow(4, 'Even', [0.25, 0.125, 0.625], None),
+            rules.OwnerRow(5, 'Tied', [0.1625, 0.00125, 0.8365], None)]
+
+    assert lottery_odds._format_rows(rows, season) == \
+        [lottery_odds.TableRow('Likely', ['>99.9', '0', '<0.1']),
+         lottery_odds.TableRow('Even', ['25.0', '12.5', '62.5']),
+         lottery_odds.TableRow('Tied', ['16.3', '0.1', '83.7']),
+         lottery_odds.TableRow('Settled', ['0', '100', '0'])]
+
+    # The vectorized and per cell formatting agree
+    for state in STATES:
+        shown = [row for row in
+                 rules.owner_rows(lottery_odds.odds_matrix(*state), state,
+                                  season)
+                 if any(row.probabilities)]
+
+        assert lottery_odds._format_matrix(shown, season.top_picks) == \
+            lottery_odds._format_cells(shown, season.top_picks)
+
+
+def test_calculate_pick_probabilities():
+    """ This function tests calculate_pick_probabilities
+    in app.lottery_odds.py
+    """
+
+    prob_dict = \
+        lottery_odds.calculate_pick_probabilities(lottery_odds.LOTTO_CHANCES,
+                                                  lottery_odds.TOP_PICKS,
+                                                  [], [], [])
+
+    assert prob_dict[1][:5] == [14.0, 13.4, 12.7, 12.0, 47.9]
+    assert prob_dict[14][:4] == [0.5, 0.6, 0.6, 0.7]
+    assert prob_dict[14][13] == 97.6
+
+    # Exact ties round up, as in exact_odds.percentages
+    prob_dict = lottery_odds.calculate_pick_probabilities(
+        lottery_odds.LOTTO_CHANCES, lottery_odds.TOP_PICKS,
+        [12, 10, 9, 8, 6, 5, 4, 3, 2, 1, 13], [7, 11, 13, 14], [13])
+
+    assert prob_dict[14][:3] == [5.0, 16.3, 78.8]
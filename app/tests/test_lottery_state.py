@@ -0,0 +1,157 @@
+"""
+test_lottery_state.py
+
+This file contains the tests for
+functions in the lottery_state.py file
+"""
+
+from app import utils
+from app.lottery_state import LotteryState, STATE_CACHE
+from app.season import DEFAULT_SEASON
+
+LOTTERY_INFO = DEFAULT_SEASON.lottery_info
+
+# Reveal sequences, including a skip at pick 14, the fast
+# forward once the top picks are known and the full lottery
+PATHS = [[11, 9, 14, 13, 12],
+         [14, 12, 10, 8, 7, 5, 13],
+         [14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2]]
+
+
+class Request(object):
+    """ Form submitted when a team is revealed
+    """
+
+    method = 'POST'
+
+    def __init__(self, team):
+        self.form = {'teams': team}
+
+
+def legacy_reveal(teams_selected, name, top_picks=4):
+    """ Reveals a team with the reveal functions of
+    app.utils.py, chained as the site first did
+    """
+
+    teams_selected = list(teams_selected)
+    top_pick_list, top_pick_order = \
+        utils.get_top_picks(teams_selected, LOTTERY_INFO, top_picks)
+    teams_selected, top_pick_list, top_pick_order, current_slot = \
+        utils.update_teams(LOTTERY_INFO, top_pick_list, teams_selected,
+                           top_pick_order, Request(name), top_picks)
+    if len(LOTTERY_INFO) > current_slot > top_picks and \
+            len(top_pick_list) == top_picks:
+        teams_selected, current_slot = \
+            utils.fast_forward(LOTTERY_INFO, top_pick_list, teams_selected,
+                               current_slot, top_picks)
+    teams, teams_selected, top_pick_order = \
+        utils.populate_dropdown(LOTTERY_INFO, top_pick_list, teams_selected,
+                                top_pick_order, current_slot, top_picks)
+
+    return tuple(teams_selected), tuple(top_pick_list), \
+        tuple(top_pick_order), tuple(teams)
+
+
+def test_reveal():
+    """ This function tests that reveal follows the
+    reveal functions in app.utils.py on every reachable
+    state, except for the fast forward when the first
+    reveal completes the top picks
+    """
+
+    start = LotteryState.start(LOTTERY_INFO)
+    states = [start]
+    count = 0
+    while states:
+        state = states.pop()
+        for name in state.teams[:-1]:
+            child = state.reveal(name)
+            expected = legacy_reveal(state.teams_selected, name)
+            if state is start and len(child.top_pick_list) == 4:
+                assert expected[1] == child.top_pick_list
+                assert len(expected[0]) == len(LOTTERY_INFO)
+                assert child.current_slot == 4
+            else:
+                assert child.key + (child.teams,) == expected
+            states.append(child)
+            count += 1
+
+    assert count == 41755
+
+    state = LotteryState.replay(LOTTERY_INFO, PATHS[-1])
+    assert state.teams == (None,)
+    assert state.top_pick_order[-1] == 1
+    assert state.current_slot == 0
+
+
+def test_invalid_reveal():
+    """ This function tests that teams outside
+    the dropdown cannot be revealed
+    """
+
+    state = LotteryState.start(LOTTERY_INFO)
+    for team in [1, 'Nets', None, 15, state.reveal(14).teams_selected[0]]:
+        try:
+            state.reveal(14).reveal(team)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(team)
+
+
+def test_state_identity():
+    """ This function tests that states are
+    immutable, hashable and cached by token
+    """
+
+    state = LotteryState.replay(LOTTERY_INFO, PATHS[0])
+    same = LotteryState.start(LOTTERY_INFO)
+    for team in PATHS[0]:
+        same = same.reveal(team)
+
+    assert state == same and hash(state) == hash(same)
+    assert len({state, same, LotteryState.start(LOTTERY_INFO)}) == 2
+
+    try:
+        state.top_picks = 3
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError('LotteryState changed')
+
+    STATE_CACHE.clear()
+    token = state.token
+    assert LotteryState.from_token(token, LOTTERY_INFO) == state
+    assert LotteryState.from_token(token, LOTTERY_INFO) is \
+        LotteryState.from_token(token, LOTTERY_INFO)
+
+    # Valid tokens whose teams could not be revealed in that order
+    for teams_selected in [[1], [14, 1], [14, 13, 7]]:
+        try:
+            LotteryState.from_token(utils.encode_state(teams_selected),
+                                    LOTTERY_INFO)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(teams_selected)
+
+
+def test_first_reveal_fast_forward():
+    """ This function tests that a first reveal completing
+    the top picks fast forwards to them
+    """
+
+    state = LotteryState.start(LOTTERY_INFO).reveal('Mavericks')
+
+    assert state.key == ((10, 9, 8, 7, 6, 5, 4, 3, 2, 1),
+                         (14, 13, 12, 11), ())
+    assert state.current_slot == 4
+    assert len(state.teams) == 5
+
+    try:
+        LotteryState._settle(LOTTERY_INFO, 4, (10,), (14, 13, 12, 11, 9),
+                             (), 14)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('Inconsistent state settled')
@@ -0,0 +1,76 @@
+"""
+test_main.py
+
+This file contains the tests for
+the page routes in main.py
+"""
+
+import main
+from app import utils
+from app.season import DEFAULT_SEASON
+
+
+def test_show_tables():
+    """ This function tests show_tables
+    in main.py
+    """
+
+    client = main.app.test_client()
+    main.PAGE_CACHE.clear()
+
+    response = client.get('/')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert b'name="state" value=""' in response.data
+
+    # Submitting the form redirects to the page of the new state
+    team = DEFAULT_SEASON.lottery_info[14]['name']
+    response = client.get('/', query_string={'state': '', 'teams': team})
+    assert response.status_code == 303
+    assert response.headers['Location'].endswith('/?state=4A')
+
+    response = client.get('/?state=4A')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert b'14. ' + team.encode('utf-8') in response.data
+    etag = response.headers['ETag']
+    hits = main.PAGE_CACHE.hits
+    assert client.get('/?state=4A').data == response.data
+    assert main.PAGE_CACHE.hits == hits + 1
+    assert client.get('/?state=4A', headers={'If-None-Match': etag}) \
+        .status_code == 304
+
+    # Forms posted by older pages still work
+    response = client.post('/?state=4A', data={'teams': 'None'})
+    assert response.status_code == 303
+    assert response.headers['Location'].endswith('/?state=4A')
+
+    # Only the pages of a named season are cached for good
+    url = '/seasons/%s/?state=4A' % DEFAULT_SEASON.name
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == main.IMMUTABLE
+    response = client.get('/seasons/%s/' % DEFAULT_SEASON.name,
+                          query_string={'state': '', 'teams': team})
+    assert response.headers['Location'].endswith(url)
+    assert response.headers['Cache-Control'] == main.IMMUTABLE
+    response = client.get('/', query_string={'state': '', 'teams': team})
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    assert client.get('/?state=AB').status_code == 400
+    assert client.get('/', query_string={'state': '4A', 'teams': team}) \
+        .status_code == 400
+    assert client.get('/?state=' + utils.encode_state([14, 1])) \
+        .status_code == 400
+
+
+def test_live():
+    """ This function tests live
+    in main.py
+    """
+
+    response = main.app.test_client().get('/live')
+
+    assert response.status_code == 200
+    assert DEFAULT_SEASON.title.encode('utf-8') in response.data
+    assert b'var topPicks = %d;' % DEFAULT_SEASON.top_picks in response.data
@@ -0,0 +1,81 @@
+"""
+test_metrics.py
+
+This file contains the tests for
+functions in the metrics.py file
+"""
+
+import logging
+import threading
+import time
+
+from app import lottery_odds
+from app import metrics
+
+
+def test_histogram():
+    """ This function tests Histogram
+    in app.metrics.py
+    """
+
+    histogram = metrics.Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+    cumulative, total = histogram.snapshot()
+
+    assert cumulative == [(0.1, 2), (1.0, 3), ('+Inf', 4)]
+    assert total == 2.65
+
+
+def test_exposition():
+    """ This function tests stage and exposition
+    in app.metrics.py
+    """
+
+    metrics.clear_metrics()
+    lottery_odds.set_odds_table(None)
+    lottery_odds.odds_table_html([14, 13, 12], [], [])
+    text = metrics.exposition()
+
+    assert '# TYPE lottery_stage_seconds histogram' in text
+    assert 'lottery_stage_seconds_count{stage="calculate_pick_probabilities"} 1' \
+        in text
+    assert 'lottery_stage_seconds_bucket{stage="render_table",le="+Inf"} 1' \
+        in text
+
+    metrics.clear_metrics()
+
+    assert 'stage=' not in metrics.exposition()
+
+
+def test_log_event(caplog):
+    """ This function tests log_event
+    in app.metrics.py
+    """
+
+    logger = logging.getLogger('test_metrics')
+    with caplog.at_level(logging.INFO, logger='test_metrics'):
+        metrics.log_event(logger, logging.DEBUG, 'hidden', value=1)
+        metrics.log_event(logger, logging.INFO, 'shown', teams=[14, 13])
+
+    assert [record.getMessage() for record in caplog.records] == \
+        ['{"event": "shown", "teams": [14, 13]}']
+
+
+def test_sampling_profiler():
+    """ This function tests SamplingProfiler
+    in app.metrics.py
+    """
+
+    def busy_wait():
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+
+    profiler = metrics.SamplingProfiler(threading.get_ident(), 0.001).start()
+    busy_wait()
+    stacks = profiler.stop()
+
+    assert any(stack.endswith('test_metrics.py:busy_wait')
+               for stack in stacks)
+    assert metrics.folded(stacks).endswith('\n')
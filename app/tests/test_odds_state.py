@@ -0,0 +1,59 @@
+"""
+test_odds_state.py
+
+This file contains the tests for
+functions in the odds_state.py file
+"""
+
+import numpy as np
+import pytest
+
+from app import lottery_odds
+from app.odds_state import OddsState
+
+# Teams revealed in order, following the dropdown
+PATHS = [[11, 9, 14, 13, 12],
+         [14, 12, 10, 8, 7, 5, 13],
+         [13, 12, 11, 10, 9, 8, 6],
+         [14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2]]
+
+
+def test_apply_reveal():
+    """ This function tests OddsState.apply_reveal
+    in app.odds_state.py against a full recompute
+    of every state along each path
+    """
+
+    for path in PATHS:
+        odds_state = OddsState.start()
+        for team in path:
+            odds_state = odds_state.apply_reveal(team)
+            expected = lottery_odds.pick_probability_matrix(
+                lottery_odds.LOTTO_CHANCES, lottery_odds.TOP_PICKS,
+                list(odds_state.teams_selected),
+                list(odds_state.top_pick_list),
+                list(odds_state.top_pick_order))
+
+            assert np.allclose(odds_state.prob_matrix, expected,
+                               rtol=0, atol=1e-12)
+
+    assert odds_state.pick_probabilities()[1][:4] == [100.0, 0.0, 0.0, 0.0]
+
+
+def test_odds_state_immutable():
+    """ This function tests that OddsState
+    in app.odds_state.py cannot be changed
+    """
+
+    start = OddsState.start()
+    after = start.apply_reveal(14)
+
+    assert start.teams_selected == ()
+    assert after.teams_selected == (14,)
+    assert len(after.orders) < len(start.orders)
+    with pytest.raises(AttributeError):
+        start.teams_selected = (14,)
+    with pytest.raises(ValueError):
+        start.weights[0] = 1
+    with pytest.raises(ValueError):
+        start.apply_reveal(1)
@@ -0,0 +1,70 @@
+"""
+test_outcomes.py
+
+This file contains the tests for
+functions in the outcomes.py file
+"""
+
+import numpy as np
+
+from app import lottery_odds
+from app import outcomes
+from app.lottery_state import LotteryState
+from app.season import DEFAULT_SEASON
+
+
+def test_encode_order():
+    """ This function tests encode_order and
+    decode_order in app.outcomes.py
+    """
+
+    assert outcomes.encode_order((1, 2, 3, 4), 14) == \
+        0 + 1 * 14 + 2 * 14 ** 2 + 3 * 14 ** 3
+    for order in [(1, 2, 3, 4), (14, 13, 12, 11), (3, 14, 1, 7)]:
+        assert outcomes.decode_order(outcomes.encode_order(order, 14),
+                                     14, 4) == order
+
+
+def test_joint_outcomes():
+    """ This function tests joint_outcomes and
+    marginals in app.outcomes.py
+    """
+
+    start = outcomes.joint_outcomes([], [], [])
+    assert len(start.index) == 14 * 13 * 12 * 11
+    assert list(start.index) == sorted(start.index)
+    assert abs(start.probability.sum() - 1) < 1e-12
+    assert outcomes.joint_outcomes([], [], []) is start
+
+    lottery_info = DEFAULT_SEASON.lottery_info
+    for reveals in [[], [14, 12, 9], [14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4],
+                    [14, 13, 12, 11, 10, 9, 8, 7, 6, 1, 2]]:
+        key = LotteryState.replay(lottery_info, reveals).key
+        joint = outcomes.joint_outcomes(*key)
+        expected = lottery_odds.pick_probability_matrix(
+            DEFAULT_SEASON.lotto_chances, DEFAULT_SEASON.top_picks,
+            *[list(part) for part in key])
+        assert abs(outcomes.marginals(joint) - expected).max() < 1e-12
+
+    # Once the top picks are revealed a single order is left
+    key = LotteryState.replay(lottery_info, DEFAULT_SEASON.reveals).key
+    joint = outcomes.joint_outcomes(*key)
+    assert list(joint.probability) == [1.0]
+    assert outcomes.decode_order(joint.index[0], 14, 4) == (3, 4, 5, 2)
+
+
+def test_pairwise():
+    """ This function tests pairwise and
+    probability in app.outcomes.py
+    """
+
+    joint = outcomes.joint_outcomes([], [], [])
+    top_three = outcomes.pairwise(joint, 3)
+
+    assert np.allclose(top_three, top_three.T)
+    assert np.allclose(np.diag(top_three),
+                       outcomes.marginals(joint)[:, :3].sum(axis=1))
+    assert abs(top_three[0, 1] - outcomes.probability(joint, [1, 2], 3)) \
+        < 1e-12
+    assert outcomes.probability(joint, [1, 2, 3, 4], 3) == 0
+    assert abs(outcomes.probability(joint, [], 3) - 1) < 1e-12
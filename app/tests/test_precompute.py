@@ -0,0 +1,79 @@
+"""
+test_precompute.py
+
+This file contains the tests for
+functions in the precompute.py file
+"""
+
+import json
+import os
+
+import numpy as np
+
+from app import lottery_odds
+from app import precompute
+
+
+def test_enumerate_states():
+    """ This function tests enumerate_states
+    in app.precompute.py
+    """
+
+    states = precompute.enumerate_states(lottery_odds.LOTTERY_INFO)
+
+    assert len(states) == len(set(states))
+    assert states[0] == ((), (), ())
+    assert ((14, 13, 11), (12,), ()) in states
+    assert ((14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11),
+            (1, 2, 7, 11), (11,)) in states
+
+
+def test_table_round_trip(tmp_path):
+    """ This function tests build_table, save_table
+    and load_table in app.precompute.py
+    """
+
+    table = precompute.build_table()
+    precompute.save_table(table, str(tmp_path))
+    loaded = precompute.load_table(str(tmp_path))
+
+    assert len(loaded) == len(table)
+    assert isinstance(loaded.matrices, precompute.MappedMatrices)
+
+    for state in [([], [], []),
+                  ([14, 13, 11], [12], []),
+                  ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11],
+                   [1, 2, 7, 11], [11])]:
+        expected = \
+            lottery_odds.pick_probability_matrix(lottery_odds.LOTTO_CHANCES,
+                                                 lottery_odds.TOP_PICKS,
+                                                 *state)
+        assert np.allclose(loaded.lookup(*state), expected,
+                           rtol=0, atol=1e-12)
+
+    assert loaded.lookup([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11, 7, 1, 2],
+                         [1, 2, 7, 11], [11, 7, 1, 2]) is None
+
+    index_path = os.path.join(str(tmp_path), precompute.INDEX_FILE)
+    with open(index_path) as index_file:
+        saved = json.load(index_file)
+    saved['fingerprint'] = 'stale'
+    with open(index_path, 'w') as index_file:
+        json.dump(saved, index_file)
+
+    assert precompute.load_table(str(tmp_path)) is None
+
+
+def test_load_or_build(tmp_path):
+    """ This function tests load_or_build
+    in app.precompute.py
+    """
+
+    table = precompute.load_or_build(table_dir=str(tmp_path))
+
+    # A rebuilt table is served from the saved file, shared by every process
+    assert isinstance(table.matrices, precompute.MappedMatrices)
+    assert sorted(os.listdir(str(tmp_path))) == \
+        sorted([precompute.INDEX_FILE, precompute.TABLE_FILE])
+    assert precompute.load_or_build(table_dir=str(tmp_path)).index == \
+        table.index
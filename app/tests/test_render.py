@@ -0,0 +1,46 @@
+"""
+test_render.py
+
+This file contains the tests for
+functions in the render.py file
+"""
+
+import pytest
+
+from app import lottery_odds
+from app import render
+
+STATES = [([], [], []),
+          ([14, 13, 11], [12], []),
+          ([11, 9, 8, 7, 6, 5, 4, 3, 2, 1], [14, 13, 12, 10], []),
+          ([11, 10, 8, 7, 6, 5, 4, 3, 2, 1], [14, 13, 12, 9], []),
+          ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11],
+           [1, 2, 7, 11], [11])]
+
+
+def test_render_odds_table():
+    """ This function tests render_odds_table
+    in app.render.py against DataFrame.to_html
+    """
+
+    pytest.importorskip('pandas')
+
+    for state in STATES:
+        rows = lottery_odds.odds_rows(*state)
+        table = render.render_odds_table(rows, list(range(1, 15)))
+
+        assert table == lottery_odds.update_odds(*state).to_html(classes='data')
+
+
+def test_odds_rows():
+    """ This function tests odds_rows
+    in app.lottery_odds.py
+    """
+
+    rows = lottery_odds.odds_rows([11, 10, 8, 7, 6, 5, 4, 3, 2, 1],
+                                  [14, 13, 12, 9], [])
+
+    assert [row.name for row in rows][:4] == ['Jazz', 'Thunder',
+                                              'Raptors', 'Pelicans']
+    assert rows[-2] == ('Knicks (via Mavericks)', ['0'] * 12 + ['100', '0'])
+    assert rows[-1] == ('Magic (via Bulls)', ['0'] * 13 + ['100'])
@@ -0,0 +1,100 @@
+"""
+test_reveal_tree.py
+
+This file contains the tests for
+functions in the reveal_tree.py file
+"""
+
+import itertools
+import json
+
+from app import lottery_odds
+from app import reveal_tree
+from app.lottery_state import LotteryState
+from app.season import DEFAULT_SEASON
+
+
+def test_expand_tree():
+    """ This function tests expand_tree
+    in app.reveal_tree.py
+    """
+
+    nodes = list(reveal_tree.expand_tree([], 2))
+    root = nodes[0]
+
+    assert root['parent'] is None and root['state'] == ''
+    assert [node['id'] for node in nodes] == list(range(len(nodes)))
+    assert all('same_as' not in node for node in nodes)
+    # The reveals of each expanded node cover all its outcomes
+    children = {}
+    for node in nodes[1:]:
+        children[node['parent']] = \
+            children.get(node['parent'], 0) + node['probability']
+    assert len(children) > 1
+    assert all(abs(total - 1) < 1e-9 for total in children.values())
+
+    # Depth first: each child follows its parent's earlier children subtrees
+    first = nodes[1]
+    assert first['slot'] == 14 and first['state'] == '4A'
+    assert nodes[2]['parent'] == first['id']
+    assert first['odds'][13] == \
+        lottery_odds.odds_payload([14], [], [])['teams'][13]['odds']
+
+    leaves = list(reveal_tree.expand_tree([14, 13, 12, 11, 10, 9, 8, 7, 6, 5],
+                                          14))
+    assert len(leaves) == 1 + 4 + 4 * 3 + 4 * 3 * 2
+    assert leaves[-1]['odds'][0][0] in (0, 100)
+
+
+def test_transpositions():
+    """ This function tests that states already in the
+    transposition table are referenced, not expanded
+    """
+
+    state = LotteryState.start(DEFAULT_SEASON.lottery_info)
+    prob_matrix = lottery_odds.odds_matrix(*state.key)
+    parent = {'id': 0, 'depth': 0, 'path_probability': 1.0}
+    seen = {reveal_tree.transposition_key([14], [], []): 99}
+
+    nodes = list(reveal_tree._expand(state, prob_matrix, parent, 2,
+                                     DEFAULT_SEASON, itertools.count(1), seen))
+
+    assert nodes[0]['same_as'] == 99 and 'odds' not in nodes[0]
+    assert all(node['parent'] != nodes[0]['id'] for node in nodes)
+    assert reveal_tree.transposition_key([13, 14], [], [2, 1]) == \
+        reveal_tree.transposition_key([14, 13], [], [2, 1])
+
+
+def test_ndjson():
+    """ This function tests ndjson
+    in app.reveal_tree.py
+    """
+
+    lines = list(reveal_tree.ndjson(reveal_tree.expand_tree([], 1)))
+
+    assert all(line.endswith(b'\n') for line in lines)
+    assert [json.loads(line.decode('utf-8'))['depth'] for line in lines] == \
+        [0, 1, 1, 1, 1, 1]
+
+
+def test_api_tree_depth():
+    """ This function tests the depth limit
+    of api_tree in main.py
+    """
+
+    import main
+    from app import live
+
+    client = main.app.test_client()
+
+    assert client.get('/api/tree?depth=%d' % main.TREE_MAX_DEPTH) \
+        .status_code == 200
+    assert client.get('/api/tree?depth=%d' % (main.TREE_MAX_DEPTH + 1)) \
+        .status_code == 400
+
+    live.ADMIN_TOKEN = 'secret'
+    response = client.get('/api/tree?state=7cuph2U&depth=14',
+                          headers={'Authorization': 'Bearer secret'})
+    live.ADMIN_TOKEN = ''
+
+    assert response.status_code == 200
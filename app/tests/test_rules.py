@@ -0,0 +1,93 @@
+"""
+test_rules.py
+
+This file contains the tests for
+functions in the rules.py file
+"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from app import lottery_odds
+from app import rules
+from app.season import DEFAULT_SEASON
+
+
+def test_parse_rules():
+    """ This function tests parse_rules
+    in app.rules.py
+    """
+
+    parsed = rules.parse_rules('2023', [
+        {'type': 'protection', 'slot': 10, 'owner': 'Knicks',
+         'first_pick': 11, 'last_pick': 14},
+        {'type': 'most_favorable', 'slots': [3, 7],
+         'owners': ['Spurs', 'Pacers']}], 14)
+
+    assert parsed == (rules.Protection(10, 'Knicks', 11, 14),
+                      rules.MostFavorable((3, 7), ('Spurs', 'Pacers')))
+
+    for configs in [[{'type': 'trade', 'slot': 1}],
+                    [{'type': 'protection', 'slot': 10, 'owner': 'Knicks'}],
+                    [{'type': 'protection', 'slot': 10, 'owner': 'Knicks',
+                      'first_pick': 11, 'last_pick': 15}],
+                    [{'type': 'most_favorable', 'slots': [3],
+                      'owners': ['Spurs']}],
+                    [{'type': 'protection', 'slot': 3, 'owner': 'Knicks',
+                      'first_pick': 5, 'last_pick': 14},
+                     {'type': 'most_favorable', 'slots': [3, 7],
+                      'owners': ['Spurs', 'Pacers']}]]:
+        with pytest.raises(ValueError):
+            rules.parse_rules('2023', configs, 14)
+
+
+def test_owner_rows_protection():
+    """ This function tests owner_rows in app.rules.py
+    with the protections of the default season
+    """
+
+    prob_matrix = lottery_odds.odds_matrix([], [], [])
+    rows = rules.owner_rows(prob_matrix, ([], [], []), DEFAULT_SEASON)
+    by_name = {}
+    for row in rows:
+        by_name.setdefault(row.name, []).append(row)
+
+    assert len(rows) == 16
+    assert [row.slot for row in by_name['Magic']] == [6]
+    assert [row.slot for row in by_name['Magic (via Bulls)']] == [11]
+    assert sum(by_name['Knicks (via Mavericks)'][0].probabilities[:10]) == 0
+    assert np.allclose(np.add(by_name['Mavericks'][0].probabilities,
+                              by_name['Knicks (via Mavericks)'][0]
+                              .probabilities),
+                       prob_matrix[9], rtol=0, atol=1e-15)
+
+
+def test_owner_rows_most_favorable():
+    """ This function tests owner_rows in app.rules.py
+    against every order of the top picks
+    """
+
+    season = DEFAULT_SEASON._replace(
+        rules=(rules.MostFavorable((3, 7), ('Spurs', 'Pacers')),))
+    chances = season.lotto_chances
+    expected = np.zeros((2, 14))
+    for order in itertools.permutations(range(1, 15), 4):
+        weight, balls = 1.0, sum(chances.values())
+        for team in order:
+            weight *= chances[team] / float(balls)
+            balls -= chances[team]
+        draft = list(order) + [team for team in range(1, 15)
+                               if team not in order]
+        picks = sorted([draft.index(3), draft.index(7)])
+        expected[0, picks[0]] += weight
+        expected[1, picks[1]] += weight
+
+    rows = rules.owner_rows(lottery_odds.odds_matrix([], [], []),
+                            ([], [], []), season)
+
+    assert [(row.slot, row.name) for row in rows[2:7:4]] == \
+        [(3, 'Spurs'), (7, 'Pacers')]
+    assert np.allclose(rows[2].probabilities, expected[0], rtol=0, atol=1e-12)
+    assert np.allclose(rows[6].probabilities, expected[1], rtol=0, atol=1e-12)
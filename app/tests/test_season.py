@@ -0,0 +1,139 @@
+"""
+test_season.py
+
+This file contains the tests for
+functions in the season.py file
+"""
+
+import json
+
+import pytest
+
+from app import lottery_odds
+from app import precompute
+from app import rules
+from app import season
+from app import utils
+
+HYPOTHETICAL = {'title': 'Eight Team Lottery',
+                'top_picks': 3,
+                'teams': [{'name': 'Team %d' % slot, 'id': str(slot),
+                           'chances': 9 - slot} for slot in range(1, 9)],
+                'rules': [{'type': 'protection', 'slot': 2,
+                           'owner': 'Owner', 'first_pick': 4,
+                           'last_pick': 8}]}
+
+
+def test_load_seasons(tmp_path):
+    """ This function tests load_seasons
+    and parse_season in app.season.py
+    """
+
+    with open(str(tmp_path / '1999.json'), 'w') as season_file:
+        json.dump(HYPOTHETICAL, season_file)
+    (tmp_path / 'notes.txt').write_text('not a season')
+
+    seasons = season.load_seasons(str(tmp_path))
+    hypothetical = seasons['1999']
+
+    assert list(seasons) == ['1999']
+    assert hypothetical.title == 'Eight Team Lottery'
+    assert hypothetical.top_picks == 3
+    assert hypothetical.lottery_info[8]['name'] == 'Team 8'
+    assert hypothetical.lotto_chances[1] == 8
+    assert hypothetical.rules == (rules.Protection(2, 'Owner', 4, 8),)
+    with pytest.raises(TypeError):
+        hypothetical.lottery_info[1] = {'name': 'Other', 'id': '0'}
+
+    for change in [{'top_picks': 7}, {'teams': []},
+                   {'teams': HYPOTHETICAL['teams'][:4] * 2},
+                   {'rules': [{'type': 'protection', 'slot': 9,
+                               'owner': 'Owner', 'first_pick': 1,
+                               'last_pick': 8}]}]:
+        config = dict(HYPOTHETICAL, **change)
+        with pytest.raises(ValueError):
+            season.parse_season('1999', config)
+
+
+def test_season_odds():
+    """ This function tests the odds of a season with
+    another format in app.lottery_odds.py
+    """
+
+    hypothetical = season.parse_season('1999', HYPOTHETICAL)
+    states = precompute.enumerate_states(hypothetical.lottery_info, 3)
+
+    assert states[0] == ((), (), ())
+    assert ((8, 7, 5), (6,), ()) in states
+
+    teams_selected, top_pick_list, top_pick_order, teams = \
+        utils.replay_state(hypothetical.lottery_info, [8, 7, 5], 3)
+
+    assert top_pick_list == [6]
+    assert teams == ['Team 4', 'Team 3', 'Team 2', None]
+
+    rows = lottery_odds.odds_rows(teams_selected, top_pick_list,
+                                  top_pick_order, hypothetical)
+
+    # The protected pick is split between its two possible owners
+    assert len(rows) == 9
+    assert 'Owner (via Team 2)' in [row.name for row in rows]
+    assert rows[-1].name == 'Team 8'
+    assert rows[-1].cells[7] == '100'
+    assert 'Team 1' in lottery_odds.odds_table_html(
+        teams_selected, top_pick_list, top_pick_order, hypothetical)
+
+    teams_selected, top_pick_list, top_pick_order, _ = \
+        utils.replay_state(hypothetical.lottery_info, [8, 7, 6, 5, 2], 3)
+    rows = lottery_odds.odds_rows(teams_selected, top_pick_list,
+                                  top_pick_order, hypothetical)
+
+    assert len(rows) == 8
+    assert 'Owner (via Team 2)' in [row.name for row in rows]
+    assert 'Team 2' not in [row.name for row in rows]
+
+
+def test_sixteen_teams():
+    """ This function tests a season with more teams
+    than fit in 4-bit state tokens
+    """
+
+    from app.lottery_state import LotteryState
+
+    config = dict(HYPOTHETICAL, top_picks=4, rules=[],
+                  teams=[{'name': 'Team %d' % slot, 'id': str(slot),
+                          'chances': 17 - slot} for slot in range(1, 17)])
+    sixteen = season.parse_season('1999', config)
+    state = LotteryState.start(sixteen.lottery_info, 4) \
+        .reveal('Team 16').reveal('Team 15')
+
+    assert LotteryState.from_token(state.token, sixteen.lottery_info, 4) \
+        .key == ((16, 15), (), ())
+    assert lottery_odds.odds_matrix(*state.key, season=sixteen)[15, 15] == 1
+
+
+def test_season_routes():
+    """ This function tests the season routes in main.py
+    """
+
+    import main
+
+    client = main.app.test_client()
+    response = client.get('/seasons/%s/' % season.DEFAULT_SEASON.name)
+
+    assert response.status_code == 200
+    assert season.DEFAULT_SEASON.title.encode('utf-8') in response.data
+    assert client.get('/seasons/1800/').status_code == 404
+
+    response = client.get('/api/seasons/%s/odds?state=4A'
+                          % season.DEFAULT_SEASON.name)
+
+    assert response.status_code == 200
+    assert response.get_json()['season'] == season.DEFAULT_SEASON.name
+    assert response.headers['Cache-Control'] == main.IMMUTABLE
+
+    # The API without a season follows the default season
+    for kind in ('odds', 'what-if', 'outcomes', 'tree'):
+        response = client.get('/api/%s?state=4A' % kind)
+        assert response.status_code == 200
+        assert response.headers['Cache-Control'] == 'no-cache'
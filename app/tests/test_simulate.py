@@ -0,0 +1,82 @@
+"""
+test_simulate.py
+
+This file contains the tests for
+functions in the simulate.py file
+"""
+
+import numpy as np
+
+from app import lottery_odds
+from app import simulate
+
+
+def test_simulate():
+    """ This function tests simulate
+    in app.simulate.py against the exact engine
+    """
+
+    for state in [([], [], []),
+                  ([11], [14, 13, 12], []),
+                  ([14, 13, 12, 10, 9, 8, 6, 5, 4, 3, 11],
+                   [1, 2, 7, 11], [11])]:
+        result = simulate.simulate(lottery_odds.LOTTO_CHANCES,
+                                   lottery_odds.TOP_PICKS,
+                                   *state, lotteries=100000, seed=1)
+        expected = \
+            lottery_odds.pick_probability_matrix(lottery_odds.LOTTO_CHANCES,
+                                                 lottery_odds.TOP_PICKS,
+                                                 *state)
+        lower, upper = result.confidence_interval(z=4)
+
+        assert result.samples == 100000
+        assert result.effective_samples > 50000
+        assert np.all(lower <= expected + 1e-12)
+        assert np.all(expected <= upper + 1e-12)
+
+
+def test_simulate_iter():
+    """ This function tests simulate_iter
+    in app.simulate.py
+    """
+
+    results = list(simulate.simulate_iter(lottery_odds.LOTTO_CHANCES,
+                                          lottery_odds.TOP_PICKS,
+                                          [14, 13, 11], [12], [],
+                                          lotteries=20000, chunk_size=5000))
+
+    assert len(results) == 4
+    assert results[0].samples < results[-1].samples
+    assert np.all(results[-1].probabilities()[13] == np.eye(14)[13])
+
+    parallel = simulate.simulate(lottery_odds.LOTTO_CHANCES,
+                                 lottery_odds.TOP_PICKS,
+                                 [14, 13, 11], [12], [],
+                                 lotteries=20000, chunk_size=5000,
+                                 processes=2)
+
+    assert np.array_equal(parallel.counts, results[-1].counts)
+
+
+def test_simulate_rules():
+    """ This function tests that simulate applies
+    the season's pick rules
+    """
+
+    from app import rules
+    from app.season import DEFAULT_SEASON
+
+    season = DEFAULT_SEASON._replace(
+        rules=DEFAULT_SEASON.rules +
+        (rules.MostFavorable((3, 7), ('Spurs', 'Pacers')),))
+    state = ([14, 13], [], [])
+    result = simulate.simulate(season.lotto_chances, season.top_picks,
+                               *state, lotteries=50000, seed=2,
+                               rules=season.rules)
+    expected = rules.owner_rows(lottery_odds.odds_matrix(*state), state,
+                                season)
+    estimated = result.owner_rows(state, season)
+
+    assert [row.name for row in estimated] == [row.name for row in expected]
+    assert np.allclose([row.probabilities for row in estimated],
+                       [row.probabilities for row in expected], atol=0.01)
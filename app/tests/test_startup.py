@@ -0,0 +1,62 @@
+"""
+test_startup.py
+
+This file contains the cold start
+regression tests for the site
+"""
+
+import os
+
+from app import precompute
+from app import startup
+
+# Generous so the test only catches regressions such as
+# rebuilding the odds table or loading pandas at startup
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 2000))
+
+
+def test_first_response(tmp_path, monkeypatch):
+    """ This function tests the time to first
+    response of a fresh interpreter
+    """
+
+    precompute.save_table(precompute.build_table(),
+                          precompute.season_table_dir(table_dir=str(tmp_path)))
+    monkeypatch.setenv('ODDS_TABLE_DIR', str(tmp_path))
+
+    timings = startup.first_response()
+
+    assert timings['status'] == 200
+    assert 'pandas' not in timings['modules']
+    assert 'numpy' not in timings['modules']
+    assert timings['first_response_ms'] < STARTUP_BUDGET_MS
+
+
+def test_first_response_without_table(tmp_path, monkeypatch):
+    """ This function tests that a fresh interpreter without
+    a prebuilt odds table serves the first response and
+    saves the table to the fallback directory when the
+    table directory is read-only
+    """
+
+    # A directory below a regular file cannot be created
+    (tmp_path / 'app').write_text('')
+    monkeypatch.setenv('ODDS_TABLE_DIR', str(tmp_path / 'app' / 'data'))
+    monkeypatch.setenv('ODDS_TABLE_FALLBACK_DIR', str(tmp_path / 'tmp'))
+
+    timings = startup.first_response()
+
+    assert timings['status'] == 200
+    assert precompute.load_table(
+        precompute.season_table_dir(table_dir=str(tmp_path / 'tmp'))) \
+        is not None
+
+
+def test_import_times():
+    """ This function tests import_times
+    in app.startup.py
+    """
+
+    times = dict(startup.import_times('app.cache'))
+
+    assert 'app.utils' in times
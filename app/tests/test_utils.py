@@ -38,33 +38,14 @@ def test_get_teams_selected():
     get_teams_selected in app.utils.py
     """
 
-    test_teams_1 = "{14: '14. ', 13: '13. ', 12: '12. ', \
-                     11: '11. ', 10: '10. ', 9: '9. ', \
-                     8: '8. ', 7: '7. ', 6: '6. ', \
-                     5: '5. ', 4: '4. ', 3: '3. ', \
-                     2: '2. ', 1: '1. '}"
-    test_teams_2 = "{14: '14. Trailblazers', 13: '13. Pelicans', \
-                     12: '12. Kings', \
-                     11: '11. ', 10: '10. ', 9: '9. ', \
-                     8: '8. ', 7: '7. ', 6: '6. ', \
-                     5: '5. ', 4: '4. ', 3: '3. ', \
-                     2: '2. ', 1: '1. '}"
-    test_teams_3 = "{14: '14. Trailblazers', 13: '13. Pelicans', \
-                     12: '12. Kings', \
-                     11: '11. Spurs', 10: '10. Wizards', 9: '9. Bulls', \
-                     8: '8. Knicks', 7: '7. Hawks', 6: '6. Timberwolves', \
-                     5: '5. Cavaliers', 4: '4. Warriors', 3: '3. Suns', \
-                     2: '2. Pistons', 1: '1. Hornets'}"
-
     request = Request()
     request.args = {}
-    request.args['teams_selected'] = test_teams_1
     teams_selected_1 = utils.get_teams_selected(request, LOTTERY_INFO)
 
-    request.args['teams_selected'] = test_teams_2
+    request.args['state'] = '7cA'
     teams_selected_2 = utils.get_teams_selected(request, LOTTERY_INFO)
 
-    request.args['teams_selected'] = test_teams_3
+    request.args['state'] = '7cuXZDIaWA'
     teams_selected_3 = utils.get_teams_selected(request, LOTTERY_INFO)
 
     assert teams_selected_1 == []
@@ -73,6 +54,68 @@ def test_get_teams_selected():
                                 7, 6, 4, 3, 2, 1,
                                 10, 5, 8]
 
+    for token in ['7c', '7cB', '7u4', 'AA', '7c=', '7c A',
+                  "{14: '14. Trailblazers'}", '7cuXZDIaWAAAA']:
+        request.args['state'] = token
+        try:
+            utils.get_teams_selected(request, LOTTERY_INFO)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(token)
+
+
+def test_lottery_index():
+    """ This function tests LotteryIndex
+    and team_mask in app.utils.py
+    """
+
+    index = utils.lottery_index(LOTTERY_INFO)
+
+    assert index == LOTTERY_INFO
+    assert utils.lottery_index(index) is index
+    assert index.by_name['Spurs'] == 11
+    assert index.by_id['1610612744'] == 1
+    # Ids repeated by mistake keep the first team
+    assert index.by_id['1610612766'] == 8
+    assert index.names[14] == 'Trailblazers'
+    assert index.all_teams == utils.team_mask(range(1, 15))
+    assert utils.team_mask([14, 1, -2]) == (1 << 14) | (1 << 1)
+
+    try:
+        index[15] = {'name': 'Nets', 'id': '1610612751'}
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('LotteryIndex changed')
+
+
+def test_encode_state():
+    """ This function tests encode_state
+    and decode_state in app.utils.py
+    """
+
+    for teams_selected in [[], [14], [14, 13, 11],
+                           list(range(14, 0, -1))]:
+        token = utils.encode_state(teams_selected)
+
+        assert len(token) <= 10
+        assert utils.decode_state(token, LOTTERY_INFO) == teams_selected
+
+    # Teams past 15 take a byte each
+    lottery_info = dict(LOTTERY_INFO)
+    lottery_info[15] = {'name': 'Jazz', 'id': '1610612762'}
+    lottery_info[16] = {'name': 'Thunder', 'id': '1610612760'}
+    for teams_selected in [[16], [15, 16, 14], list(range(16, 0, -1))]:
+        token = utils.encode_state(teams_selected)
+
+        assert utils.decode_state(token, lottery_info) == teams_selected
+        try:
+            utils.decode_state(token, LOTTERY_INFO)
+            raise AssertionError('Team 16 decoded')
+        except ValueError:
+            pass
+
 
 def test_get_top_picks():
     """ This function tests
@@ -0,0 +1,43 @@
+"""
+test_what_if.py
+
+This file contains the tests for
+functions in the what_if.py file
+"""
+
+import numpy as np
+
+from app import lottery_odds
+from app import utils
+from app import what_if
+from app.lottery_state import LotteryState
+from app.season import DEFAULT_SEASON
+
+# Reveal sequences, including a top pick skipped at pick 14
+# and a state where only the top picks are left
+REVEALS = [[], [11], [14, 13, 9], [14, 13, 12, 11, 10, 9, 8, 7, 6, 5]]
+
+
+def test_next_reveals():
+    """ This function tests next_reveals
+    in app.what_if.py
+    """
+
+    for reveals in REVEALS:
+        state, branches = what_if.next_reveals(reveals)
+        parent = LotteryState.replay(DEFAULT_SEASON.lottery_info, reveals)
+        assert state == parent.key
+        assert branches
+        assert abs(sum(branch.probability for branch in branches) - 1) < 1e-9
+
+        for branch in branches:
+            child = utils.replay_state(DEFAULT_SEASON.lottery_info,
+                                       list(state[0]) + [branch.team])[:3]
+            assert tuple(list(part) for part in branch.state.key) == child
+            expected = lottery_odds.pick_probability_matrix(
+                DEFAULT_SEASON.lotto_chances, DEFAULT_SEASON.top_picks,
+                *child)
+            assert np.allclose(np.asarray(branch.prob_matrix), expected)
+
+    _, branches = what_if.next_reveals(REVEALS[-1] + [4, 3, 2])
+    assert branches == []
@@ -6,7 +6,201 @@ that helps populate objects
 for display
 """
 
-import ast
+import base64
+import hmac
+import re
+import types
+
+
+TOKEN_PATTERN = re.compile(r'^[A-Za-z0-9_-]*$')
+
+
+def pack_teams(teams):
+    """ pack_teams packs a list of team lottery orders
+    into bytes, one 4-bit slot per team. Lists holding a
+    team past 15 take a byte per team after a zero byte,
+    which 4-bit packing never starts with
+
+    @param teams (list): List of key values for
+        lottery_info between 1 and 255
+
+    Returns:
+
+        - packed (bytes): Two teams per byte, with a
+        zero slot padding an odd number of teams
+    """
+
+    for slot in teams:
+        if not 0 <= slot <= 255:
+            raise ValueError('Team %r cannot be packed' % slot)
+    if any(slot > 15 for slot in teams):
+        return bytes([0]) + bytes(teams)
+
+    slots = list(teams) + [0] * (len(teams) % 2)
+    return bytes(slots[ind] << 4 | slots[ind + 1]
+                 for ind in range(0, len(slots), 2))
+
+
+def unpack_teams(packed):
+    """ unpack_teams reverses pack_teams
+
+    @param packed (bytes): Bytes built by pack_teams
+
+    Returns:
+
+        - teams (list): Team lottery orders
+    """
+
+    if packed[:1] == bytes([0]):
+        return list(packed[1:])
+
+    slots = []
+    for byte in packed:
+        slots.extend([byte >> 4, byte & 15])
+    if slots and slots[-1] == 0:
+        slots.pop()
+
+    return slots
+
+
+def team_mask(teams):
+    """ team_mask builds the bitmask of a set of teams,
+    with bit x set for team lottery order x
+
+    @param teams (list): List of key values for lottery_info
+
+    Returns:
+
+        - mask (int): Bitmask of the teams
+    """
+
+    mask = 0
+    for team in teams:
+        # get_top_picks can count past the last team, and those
+        # placeholders never match a team
+        if team > 0:
+            mask |= 1 << team
+    return mask
+
+
+class LotteryIndex(dict):
+    """ LotteryIndex is a read-only lottery_info dictionary
+    built once per season, with the lookups the reveal
+    rules need: team names and ids to lottery order, names
+    by lottery order and the bitmask of every team
+
+    @param lottery_info (dict): Dictionary keyed by
+        reverse standings order, with dictionary
+        values containing 'name' and 'id' keys
+        for the team
+    """
+
+    __slots__ = ('by_name', 'by_id', 'names', 'bits', 'reverse_order',
+                 'all_teams')
+
+    def __init__(self, lottery_info):
+        super().__init__((team, types.MappingProxyType(dict(info)))
+                         for team, info in lottery_info.items())
+        self.by_name = {}
+        self.by_id = {}
+        for team, info in self.items():
+            self.by_name.setdefault(info['name'], team)
+            self.by_id.setdefault(info['id'], team)
+        size = max(self, default=0) + 1
+        self.names = tuple(self[team]['name'] if team in self else None
+                           for team in range(size))
+        self.bits = tuple(1 << team for team in range(size))
+        self.reverse_order = tuple(range(len(self), 0, -1))
+        self.all_teams = team_mask(self)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('LotteryIndex is read-only')
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+def lottery_index(lottery_info):
+    """ lottery_index returns lottery_info as a LotteryIndex,
+    building one only when it is a plain dictionary
+
+    @param lottery_info (dict or LotteryIndex): Lottery info
+        of the season
+
+    Returns:
+
+        - index (LotteryIndex): Index of lottery_info
+    """
+
+    if isinstance(lottery_info, LotteryIndex):
+        return lottery_info
+    return LotteryIndex(lottery_info)
+
+
+def encode_state(teams_selected):
+    """ encode_state builds the compact URL-safe token
+    carrying the teams revealed so far
+
+    @param teams_selected (list): List of key values for
+        lottery_info that have been revealed, in order
+
+    Returns:
+
+        - token (str): Unpadded base64url encoding of
+        the packed teams
+    """
+
+    return base64.urlsafe_b64encode(pack_teams(teams_selected)) \
+        .rstrip(b'=').decode('ascii')
+
+
+def decode_state(token, lottery_info):
+    """ decode_state validates a state token and returns
+    the teams it carries. Tokens are bounded by the
+    number of teams, so the work done per token is too
+
+    @param token (str): Token built by encode_state
+    @param lottery_info (dict): Dictionary keyed by
+        reverse standings order, with dictionary
+        values containing 'name' and 'id' keys
+        for the team
+
+    Returns:
+
+        - teams_selected (list): Teams previously
+        revealed, in order
+
+    Raises:
+
+        - ValueError: If the token is malformed, names a
+        team outside lottery_info or repeats a team
+    """
+
+    max_length = len(encode_state(list(lottery_info)))
+    if len(token) > max_length or not TOKEN_PATTERN.match(token):
+        raise ValueError('Invalid state token')
+
+    try:
+        packed = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except (TypeError, ValueError):
+        raise ValueError('Invalid state token')
+
+    slots = unpack_teams(packed)
+
+    teams_selected = []
+    seen = 0
+    for team in slots:
+        if team not in lottery_info or seen & (1 << team):
+            raise ValueError('Invalid state token')
+        seen |= 1 << team
+        teams_selected.append(team)
+
+    # Only the canonical encoding of a state is accepted
+    if not hmac.compare_digest(encode_state(teams_selected), token):
+        raise ValueError('Invalid state token')
+
+    return teams_selected
+
 
 def get_teams_selected(request, lottery_info):
     """ get_teams_selected updates the teams
@@ -23,21 +217,16 @@ def get_teams_selected(request, lottery_info):
 
         - teams_selected (list): Teams previously
         selected by the user
-    """
 
-    teams_selected = []
-    selections = ast.literal_eval(request.args['teams_selected'])
-    for val in selections:
-        team_name = selections[val].split(' ')[-1]
-        if team_name != '':
-            for x in range(len(lottery_info), 0, -1):
-                if lottery_info[x]['name'] == team_name:
-                    teams_selected.append(x)
+    Raises:
 
-    return teams_selected
+        - ValueError: If the state token is invalid
+    """
+
+    return decode_state(request.args.get('state', ''), lottery_info)
 
 
-def get_top_picks(teams_selected, lottery_info):
+def get_top_picks(teams_selected, lottery_info, top_picks=4):
     """ This function fills in both teams known
     to be in the top 4 and their corresponding
     order
@@ -50,6 +239,8 @@ def get_top_picks(teams_selected, lottery_info):
         reverse standings order, with dictionary
         values containing 'name' and 'id' keys
         for the team
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
 
     Returns:
 
@@ -71,11 +262,11 @@ def get_top_picks(teams_selected, lottery_info):
     for team in teams_selected:
         if team != expected_team:
             orig_ex = expected_team
-            if len(top_pick_list) < 4 and team_count >= 5:
+            if len(top_pick_list) < top_picks and team_count > top_picks:
                 for ex_team in range(orig_ex, team):
                     top_pick_list.append(expected_team)
                     expected_team -= 1
-        if team_count < 5:
+        if team_count <= top_picks:
             top_pick_order.append(team)
         expected_team -= 1
         team_count -= 1
@@ -85,7 +276,7 @@ def get_top_picks(teams_selected, lottery_info):
 
 def update_teams(lottery_info, top_pick_list,
                  teams_selected, top_pick_order,
-                 request):
+                 request, top_picks=4):
     """ update_teams populates the proper list
     depending on the team selected
 
@@ -107,6 +298,8 @@ def update_teams(lottery_info, top_pick_list,
         that are revealed starting in the top 4
     @param request (flask.request object): Object containing
         method and form attributes
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
 
     Returns:
 
@@ -122,37 +315,38 @@ def update_teams(lottery_info, top_pick_list,
         the current lottery slot, starting at 14 and
         diminishing by 1 as each team is revealed
     """
-    current_slot = len(lottery_info) - len(teams_selected)
+    index = lottery_index(lottery_info)
+    current_slot = len(index) - len(teams_selected)
     if request.method == "POST" and request.form['teams'] is not None:
         expected_team = current_slot - len(top_pick_list)
-        for x in lottery_info:
-            if lottery_info[x]['name'] == request.form['teams']:
-                # Add selected team to teams_selected
-                teams_selected.append(x)
-                if current_slot < 5:
-                    # If the pick is within the top 4,
-                    # update the top pick order list
-                    top_pick_order.append(x)
-                if x != expected_team:
-                    # If the pick is "out of order",
-                    # add the team that was skipped
-                    # to the top 4 list
-                    if len(top_pick_list) < 4:
-                        for pos_team in range(len(lottery_info), x, -1):
-                            if pos_team not in teams_selected and pos_team not in top_pick_list:
-                                top_pick_list.append(pos_team)
-
-        if current_slot <= 5:
-            top_pick_list = []
-            for x in lottery_info:
-                if x not in teams_selected[0:10]:
-                    top_pick_list.append(x)
+        x = index.by_name.get(request.form['teams'])
+        if x is not None:
+            # Add selected team to teams_selected
+            teams_selected.append(x)
+            if current_slot <= top_picks:
+                # If the pick is within the top 4,
+                # update the top pick order list
+                top_pick_order.append(x)
+            if x != expected_team:
+                # If the pick is "out of order",
+                # add the team that was skipped
+                # to the top 4 list
+                if len(top_pick_list) < top_picks:
+                    known = team_mask(teams_selected) | team_mask(top_pick_list)
+                    for pos_team in range(len(index), x, -1):
+                        if not known & index.bits[pos_team]:
+                            top_pick_list.append(pos_team)
+
+        if current_slot <= top_picks + 1:
+            out_of_draw = team_mask(teams_selected[0:len(index) - top_picks])
+            top_pick_list = [x for x in index
+                             if not out_of_draw & index.bits[x]]
 
     return teams_selected, top_pick_list, top_pick_order, current_slot
 
 
 def fast_forward(lottery_info, top_pick_list,
-                 teams_selected, current_slot):
+                 teams_selected, current_slot, top_picks=4):
     """ fast_forward automatically advances the site
     to the top 4 if all 4 teams are known
 
@@ -172,6 +366,8 @@ def fast_forward(lottery_info, top_pick_list,
     @param current_slot (int): Integer corresponding to
         the current lottery slot, starting at 14 and
         diminishing by 1 as each team is revealed
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
 
     Returns:
 
@@ -180,9 +376,11 @@ def fast_forward(lottery_info, top_pick_list,
         - current_slot (int): Current slot is advanced to 5
     """
 
-    current_slot = 5
-    for x in range(len(lottery_info), 0, -1):
-        if x not in teams_selected and x not in top_pick_list:
+    index = lottery_index(lottery_info)
+    current_slot = top_picks + 1
+    known = team_mask(teams_selected) | team_mask(top_pick_list)
+    for x in index.reverse_order:
+        if not known & index.bits[x]:
             teams_selected.append(x)
 
     return teams_selected, current_slot
@@ -190,7 +388,8 @@ def fast_forward(lottery_info, top_pick_list,
 
 def populate_dropdown(lottery_info, top_pick_list,
                       teams_selected,
-                      top_pick_order, current_slot):
+                      top_pick_order, current_slot,
+                      top_picks=4):
     """ populate_dropdown returns a list of teams
     to be displayed in the site dropdown. Only teams
     that are eligible to be revealed can be selected
@@ -214,6 +413,8 @@ def populate_dropdown(lottery_info, top_pick_list,
     @param current_slot (int): Integer corresponding to
         the current lottery slot, starting at 14 and
         diminishing by 1 as each team is revealed
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
 
     Returns:
 
@@ -225,19 +426,22 @@ def populate_dropdown(lottery_info, top_pick_list,
         - top_pick_order (list): The same team is
             added to top_pick_order
     """
-    teams = []
-    for x in range(len(lottery_info), 0, -1):
-        if x not in teams_selected:
-            if x not in top_pick_list or current_slot <= 5:
-                if current_slot > 5:
-                    if len(teams) < 5 - len(top_pick_list):
-                        teams.append(lottery_info[x]['name'])
-                else:
-                    teams.append(lottery_info[x]['name'])
+    index = lottery_index(lottery_info)
+    names, bits = index.names, index.bits
+    selected = team_mask(teams_selected)
+    hidden = selected
+    limit = len(lottery_info)
+    if current_slot > top_picks + 1:
+        # Before the top picks, teams known to be in them cannot be
+        # revealed and only the teams that could hold the pick are shown
+        hidden |= team_mask(top_pick_list)
+        limit = max(top_picks + 1 - len(top_pick_list), 0)
+    teams = [names[x] for x in index.reverse_order
+             if not hidden & bits[x]][:limit]
 
     if len(teams) == 1:
         for x in lottery_info:
-            if x not in teams_selected:
+            if not selected & bits[x]:
                 teams_selected.append(x)
                 top_pick_order.append(x)
         teams = []
@@ -278,4 +482,44 @@ def draft_order(lottery_info, teams_selected):
         selections[init] = str(init) + '. '
         init -= 1
 
-    return selections
\ No newline at end of file
+    return selections
+
+
+def replay_state(lottery_info, reveals, top_picks=4):
+    """ replay_state submits teams one at a time, as a
+    viewer would, to find the state the site shows
+    after those reveals
+
+    @param lottery_info (dict): Dictionary keyed by
+        reverse standings order, with dictionary
+        values containing 'name' and 'id' keys
+        for the team
+    @param reveals (list): List of key values for
+        lottery_info in the order they were revealed.
+        Teams the site fills in on its own may be
+        left out
+    @param top_picks (int): Integer indicating the number of
+        picks that are selected via the lottery
+
+    Returns:
+
+        - teams_selected (list): Teams revealed so far
+        - top_pick_list (list): List of key values for
+        lottery_info known to be in the top 4
+        - top_pick_order (list): List of key values for
+        lottery_info revealed starting in the top 4
+        - teams (list): List of team names to be
+        displayed in the site dropdown
+
+    Raises:
+
+        - ValueError: If a team could not be revealed when
+        its turn came
+    """
+
+    from app.lottery_state import LotteryState
+
+    state = LotteryState.replay(lottery_info, reveals, top_picks)
+
+    return (list(state.teams_selected), list(state.top_pick_list),
+            list(state.top_pick_order), list(state.teams))
@@ -0,0 +1,84 @@
+"""
+what_if.py
+
+Odds for every possible next reveal of a lottery
+state. The candidates are the teams the site's
+dropdown offers, and the odds after each of them
+are looked up or calculated together in one batch.
+"""
+
+import collections
+
+from app import lottery_odds
+from app.lottery_state import LotteryState
+from app.season import DEFAULT_SEASON
+
+# One possible next reveal: the team revealed, the probability
+# that it is revealed next, the LotteryState it leads to and
+# that state's pick probability matrix
+Branch = collections.namedtuple('Branch', ['team', 'probability', 'state',
+                                           'prob_matrix'])
+
+
+def next_reveals(reveals, season=None):
+    """ next_reveals finds every team that can be revealed
+    next in a lottery state and the odds after each reveal
+
+    The chance of a team being revealed next is its chance
+    of holding the pick about to be revealed, read from the
+    odds of the current state
+
+    @param reveals (list): List of key values for
+        lottery_info in the order they were revealed,
+        as accepted by LotteryState.replay
+    @param season (Season): Season of the lottery,
+        the default season if None
+
+    Returns:
+
+        - state (tuple): The (teams_selected, top_pick_list,
+            top_pick_order) state the reveals start from
+        - branches (list): List of Branch tuples in dropdown
+            order
+    """
+
+    season = season or DEFAULT_SEASON
+    state = LotteryState.replay(season.lottery_info, reveals,
+                                season.top_picks)
+
+    return state.key, reveal_branches(state, season)
+
+
+def reveal_branches(state, season=None, prob_matrix=None):
+    """ reveal_branches lists the reveals that can follow
+    a lottery state
+
+    @param state (LotteryState): State the reveals follow
+    @param season (Season): Season of the lottery,
+        the default season if None
+    @param prob_matrix (list): Pick probability matrix of the
+        state, looked up with the branches if None
+
+    Returns:
+
+        - branches (list): List of Branch tuples in dropdown
+            order
+    """
+
+    season = season or DEFAULT_SEASON
+    by_name = state.lottery_info.by_name
+    candidates = [by_name[name] for name in state.teams if name is not None]
+    children = [state.reveal(team) for team in candidates]
+
+    states = [child.key for child in children]
+    if prob_matrix is None:
+        prob_matrix, *prob_matrices = \
+            lottery_odds.odds_matrices([state.key] + states, season)
+    else:
+        prob_matrices = lottery_odds.odds_matrices(states, season)
+    pick = state.current_slot
+
+    return [Branch(team, float(prob_matrix[team - 1][pick - 1]),
+                   child, child_matrix)
+            for team, child, child_matrix
+            in zip(candidates, children, prob_matrices)]
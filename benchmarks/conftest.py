@@ -0,0 +1,165 @@
+"""
+conftest.py
+
+Latency and allocation measurement for the
+benchmark suite, compared against the medians
+and peaks stored in baseline.json.
+
+    python -m pytest benchmarks
+    python -m pytest benchmarks --update-baseline
+
+A benchmark fails when its median latency or peak
+allocation grows by more than BENCHMARK_THRESHOLD
+(default 0.5, i.e. 50%) over its baseline, and by more
+than BENCHMARK_ABSOLUTE_MS milliseconds (default 0.1)
+or BENCHMARK_ABSOLUTE_KB KiB (default 16), so that
+timer noise on sub-millisecond medians is not a
+regression. Benchmarks that clear the caches before
+every call are timed cold and are noisier, so they
+are allowed BENCHMARK_ABSOLUTE_SETUP_MS (default 1.5).
+
+Every session also times a fixed reference workload,
+stored in the baseline as _reference. When this host
+is slower at it than the one that recorded the
+baseline, the time limits are scaled up to match.
+"""
+
+import json
+import os
+import random
+import time
+import tracemalloc
+
+import pytest
+
+BASELINE_PATH = os.environ.get('BENCHMARK_BASELINE',
+                               os.path.join(os.path.dirname(__file__),
+                                            'baseline.json'))
+THRESHOLD = float(os.environ.get('BENCHMARK_THRESHOLD', 0.5))
+
+# Growth below these is noise whatever the relative change
+TOLERANCE = {'median_ms': float(os.environ.get('BENCHMARK_ABSOLUTE_MS', 0.1)),
+             'peak_kb': float(os.environ.get('BENCHMARK_ABSOLUTE_KB', 16))}
+SETUP_TOLERANCE_MS = float(os.environ.get('BENCHMARK_ABSOLUTE_SETUP_MS', 1.5))
+
+# Key of the reference workload in baseline.json
+REFERENCE = '_reference'
+
+# Results of this session, written out with --update-baseline
+RESULTS = {}
+
+
+def pytest_addoption(parser):
+    parser.addoption('--update-baseline', action='store_true',
+                     help='Store this run as the benchmark baseline')
+
+
+def pytest_sessionfinish(session):
+    if session.config.getoption('--update-baseline') and RESULTS:
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump(RESULTS, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+
+
+def percentile(data, fraction):
+    """ percentile returns the nearest-rank percentile
+    of a list of timings
+    """
+
+    ordered = sorted(data)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def load_baseline():
+    """ load_baseline returns the stored baseline, or an
+    empty dict when none has been recorded
+    """
+
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as baseline_file:
+        return json.load(baseline_file)
+
+
+def reference_workload():
+    """ reference_workload sorts and sums a fixed list, a
+    stand-in for the speed of the host the benchmarks run on
+    """
+
+    data = list(range(20000))
+    random.Random(0).shuffle(data)
+    return sum(sorted(data)[::2])
+
+
+@pytest.fixture(scope='session')
+def slowdown():
+    """ slowdown times the reference workload and returns how
+    many times slower this host is at it than the host that
+    recorded the baseline, never less than 1
+    """
+
+    timings = []
+    for _ in range(51):
+        start = time.perf_counter()
+        reference_workload()
+        timings.append(time.perf_counter() - start)
+    RESULTS[REFERENCE] = {'median_ms': 1000 * percentile(timings, 0.5)}
+
+    baseline = load_baseline().get(REFERENCE)
+    if not baseline:
+        return 1.0
+    return max(RESULTS[REFERENCE]['median_ms'] / baseline['median_ms'], 1.0)
+
+
+@pytest.fixture
+def measure(benchmark, request, slowdown):
+    """ measure benchmarks a function, records its latency
+    percentiles and peak allocation, and fails the test on
+    a regression over the stored baseline
+    """
+
+    def run(func, *args, **kwargs):
+        setup = kwargs.pop('setup', None)
+
+        # The warm-up call loads modules and fills lazy caches, so
+        # the traced call only sees the allocations of func itself
+        for traced in (False, True):
+            if setup is not None:
+                setup()
+            if traced:
+                tracemalloc.start()
+            func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if setup is None:
+            result = benchmark(func, *args)
+        else:
+            result = benchmark.pedantic(func, args=args, setup=setup,
+                                        rounds=50)
+
+        data = benchmark.stats.stats.data
+        stats = {'median_ms': 1000 * percentile(data, 0.5),
+                 'p95_ms': 1000 * percentile(data, 0.95),
+                 'p99_ms': 1000 * percentile(data, 0.99),
+                 'peak_kb': peak / 1024.0}
+        benchmark.extra_info.update(stats)
+        RESULTS[request.node.name] = stats
+
+        tolerance = dict(TOLERANCE)
+        if setup is not None:
+            tolerance['median_ms'] = SETUP_TOLERANCE_MS
+        scale = {'median_ms': slowdown, 'peak_kb': 1.0}
+
+        baseline = load_baseline().get(request.node.name, {})
+        if baseline and not request.config.getoption('--update-baseline'):
+            for key in ('median_ms', 'peak_kb'):
+                limit = scale[key] * max(baseline[key] * (1 + THRESHOLD),
+                                         baseline[key] + tolerance[key])
+                if stats[key] > limit:
+                    pytest.fail('%s regressed: %.3f > %.3f (baseline %.3f)'
+                                % (key, stats[key], limit, baseline[key]))
+
+        return result
+
+    return run
@@ -0,0 +1,83 @@
+"""
+test_bench_odds.py
+
+Benchmarks of the odds engine and the full
+show_tables flow at each stage of the lottery
+"""
+
+import pytest
+
+from app import cache
+from app import lottery_odds
+from app import utils
+
+# Teams revealed to reach each stage, see utils.replay_state
+STAGES = {'empty': [],
+          'three_skips': [11],
+          'top_four_known': [11, 9],
+          'mid_top_four': [11, 9, 14]}
+
+
+def stage_state(stage):
+    """ Returns the (teams_selected, top_pick_list,
+    top_pick_order) state shown at a stage
+    """
+
+    return utils.replay_state(lottery_odds.LOTTERY_INFO,
+                              STAGES[stage])[:3]
+
+
+@pytest.mark.parametrize('stage', sorted(STAGES))
+def test_calculate_pick_probabilities(measure, stage):
+    measure(lottery_odds.calculate_pick_probabilities,
+            lottery_odds.LOTTO_CHANCES, lottery_odds.TOP_PICKS,
+            *stage_state(stage))
+
+
+@pytest.mark.parametrize('stage', sorted(STAGES))
+def test_update_odds(measure, stage):
+    pytest.importorskip('pandas')
+    measure(lottery_odds.update_odds, *stage_state(stage))
+
+
+@pytest.mark.parametrize('stage', sorted(STAGES))
+def test_odds_table_html(measure, stage):
+    measure(lottery_odds.odds_table_html, *stage_state(stage),
+            setup=cache.clear_caches)
+
+
+@pytest.fixture(scope='module')
+def client():
+    import main
+    return main.app.test_client()
+
+
+def show_tables(client, stage):
+    """ Submits the last team of a stage the way the
+    site's form does
+    """
+
+    reveals = STAGES[stage]
+    if not reveals:
+        return client.get('/')
+
+    previous = utils.replay_state(lottery_odds.LOTTERY_INFO, reveals[:-1])[0]
+    team = lottery_odds.LOTTERY_INFO[reveals[-1]]['name']
+    return client.get('/', query_string={'state': utils.encode_state(previous),
+                                         'teams': team},
+                      follow_redirects=True)
+
+
+@pytest.mark.parametrize('stage', sorted(STAGES))
+def test_show_tables(measure, client, stage):
+    response = measure(show_tables, client, stage,
+                       setup=cache.clear_caches)
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('stage', sorted(STAGES))
+def test_show_tables_cached(measure, client, stage):
+    response = measure(show_tables, client, stage)
+
+    assert response.status_code == 200
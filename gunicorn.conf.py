@@ -0,0 +1,45 @@
+"""
+gunicorn.conf.py
+
+Production server settings, read by
+
+    gunicorn -c gunicorn.conf.py main:app
+
+The app is imported once in the master before the
+workers are forked, so the odds table of every season
+is loaded, or built and saved, a single time. Tables
+are memory-mapped from disk, so every worker reads the
+same pages, and the rest of the startup state is shared
+copy-on-write.
+"""
+
+import gc
+import os
+
+bind = '0.0.0.0:%s' % os.environ.get('PORT', '8080')
+
+# Memory of the App Engine instance class, 256 MB on the default F1
+MEMORY_MB = int(os.environ.get('GAE_MEMORY_MB', 256))
+
+# Worker processes and threads per worker. Each worker imports numpy
+# and fills its own page and odds caches, so workers are sized by the
+# instance's memory rather than the host's CPUs: 2 on an F1, 4 on an
+# F2, 8 on an F4. Live mode streams are routed to the gevent workers
+# of gunicorn_live.conf.py instead
+workers = int(os.environ.get('WEB_CONCURRENCY', max(MEMORY_MB // 128, 1)))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+preload_app = True
+accesslog = '-'
+
+
+def when_ready(server):
+    """ Moves everything built at startup out of the garbage
+    collector's reach before the workers are forked, so
+    collections in the workers do not touch, and copy,
+    the pages shared with the master
+    """
+
+    gc.freeze()
@@ -0,0 +1,46 @@
+"""
+gunicorn_live.conf.py
+
+Server settings for live mode, read by the live
+service in live.yaml:
+
+    gunicorn -c gunicorn_live.conf.py main:app
+
+Server-Sent Event streams and long polls hold their
+connection while they wait for the next reveal, so live
+mode is served by gevent workers, each keeping thousands
+of waiting viewers on greenlets instead of one thread
+apiece. The live state is shared by every worker through
+the store configured in app.live.
+"""
+
+# The app is preloaded in the master, so patch the standard library
+# before it is imported, as the gevent workers would after the fork
+from gevent import monkey
+monkey.patch_all()
+
+import gc
+import os
+
+bind = '0.0.0.0:%s' % os.environ.get('PORT', '8080')
+
+# Worker processes, sized like gunicorn.conf.py, and open
+# connections per worker
+workers = int(os.environ.get('LIVE_WEB_CONCURRENCY',
+                             max(int(os.environ.get('GAE_MEMORY_MB', 256))
+                                 // 128, 1)))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('LIVE_WORKER_CONNECTIONS', 2000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+preload_app = True
+accesslog = '-'
+
+
+def when_ready(server):
+    """ Moves everything built at startup out of the garbage
+    collector's reach before the workers are forked, as in
+    gunicorn.conf.py
+    """
+
+    gc.freeze()
@@ -1,97 +1,473 @@
+import hashlib
 import logging
-from flask import render_template, request
-from app.lottery_odds import update_odds, LOTTERY_INFO
+import os
+import threading
+import time
+from flask import abort, g, jsonify, redirect, render_template, request, \
+    Response, url_for
+from app.cache import LRUCache
+from app.lottery_odds import odds_table_html, set_odds_table, \
+    LOTTERY_INFO, ODDS_CACHE, TOP_PICKS
+from app.precompute import load_or_build
+from app.season import DEFAULT_SEASON, SEASONS
+from app.live import is_admin, LiveBroadcast
+from app.lottery_state import LotteryState
+from app import api
+from app import reveal_tree
+from app import metrics
 import app.utils as utils
 from app import app
 
+# Load the precomputed odds table of every season once at startup
+for lottery_season in SEASONS.values():
+    set_odds_table(load_or_build(lottery_season), lottery_season)
+
+# Lottery state pushed to viewers in live mode, shared by every
+# worker through the store configured in app.live
+LIVE = LiveBroadcast(LOTTERY_INFO, TOP_PICKS)
+
+# Rendered pages and their ETags keyed by season, URL season and state token
+PAGE_CACHE = LRUCache(int(os.environ.get('PAGE_CACHE_SIZE', 4096)))
+
+# Most lotteries simulated by one /api/simulate request
+SIMULATION_MAX_LOTTERIES = int(os.environ.get('SIMULATION_MAX_LOTTERIES',
+                                              1000000))
+
+# Deepest reveal tree served to callers without the admin token
+TREE_MAX_DEPTH = int(os.environ.get('TREE_MAX_DEPTH', 4))
+
+# Pages and reveals of a state of a named season never change
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+logger = logging.getLogger(__name__)
+
+
+@app.before_request
+def start_timer():
+    """ This function starts timing each request, and
+    sampling its stack when PROFILE_SLOW_MS is set
+    """
+
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    if metrics.PROFILE_SLOW_MS:
+        g.profiler = metrics.SamplingProfiler(threading.get_ident()).start()
+
+
+@app.teardown_request
+def record_timer(error=None):
+    """ This function records the time spent on each
+    request and keeps the sampled stacks of slow ones
+    """
+
+    if 'request_start' not in g:
+        return
+    elapsed = time.perf_counter() - g.request_start
+    metrics.REQUEST_SECONDS.observe(elapsed, request.endpoint or 'none')
+
+    if g.profiler is not None:
+        stacks = g.profiler.stop()
+        if 1000 * elapsed > metrics.PROFILE_SLOW_MS:
+            metrics.SLOW_PROFILES.append({'path': request.full_path,
+                                          'ms': 1000 * elapsed,
+                                          'stacks': stacks})
+            metrics.log_event(logger, logging.INFO, 'slow_request',
+                              path=request.full_path,
+                              ms=round(1000 * elapsed, 1))
+
+
+def get_season(name):
+    """ This function returns the season named in
+    the URL, the default season if None, and responds
+    404 to unknown seasons
+    """
+
+    if name is None:
+        return DEFAULT_SEASON
+    if name not in SEASONS:
+        abort(404)
+    return SEASONS[name]
+
+
+def get_state(season, token):
+    """ This function returns the lottery state carried
+    by a state token, responding 400 to invalid tokens
+    """
+
+    try:
+        with metrics.stage('get_teams_selected'):
+            return LotteryState.from_token(token, season.lottery_info,
+                                           season.top_picks)
+    except ValueError:
+        metrics.log_event(logger, logging.INFO, 'invalid_state', state=token)
+        abort(400)
+
+
+def cache_control(url_season, token=''):
+    """ This function returns the Cache-Control header of
+    a response about a state. Only URLs naming both the
+    season and the state always describe the same odds;
+    the others follow the default season, which changes
+    between seasons, so they are revalidated
+    """
+
+    if url_season is None or token is None:
+        return 'no-cache'
+    return IMMUTABLE
+
+
 # TESTS
 @app.route('/',  methods=['POST', 'GET'])
-def show_tables(teams_selected=''):
-    """ This function creates the updated
-    lottery odds table as teams are revealed.
-    Although no variables are explicitly provided
-    to this main function, the following describes
-    global variables and form data used
-
-    teams_selected (list): List of key values for
-        LOTTERY_INFO that represent the reverse
-        standings order. This list is filled
-        in as teams are revealed. This gets
-        overwritten with the request arguments
-        of teams already selected
-    top_pick_list (list): List of key values for
-        LOTTERY_INFO that correspond to the teams
-        that are "skipped" as the back of the
-        lottery is revealed. This means that team
-        has a pick in the top 4
-    top_pick_order (list): List of key values for
-        LOTTERY_INFO that correspond to the teams
-        that are revealed starting in the top 4
-    LOTTERY_INFO (dict): Dictionary keyed by
-        reverse standings order, with dictionary
-        values containing 'name' and 'id' keys
-        for the team
-    """
-
-    if request.method == 'POST':
-        teams_selected = \
-            utils.get_teams_selected(request, LOTTERY_INFO)
-    else:
-        teams_selected = []
-
-    current_slot = len(LOTTERY_INFO) - len(teams_selected)
-
-    top_pick_list, top_pick_order = \
-        utils.get_top_picks(teams_selected, LOTTERY_INFO)
-
-    # Update the teams selected and those in the top 4
-    if request.method == "POST" and request.form['teams'] is not None:
-        teams_selected, top_pick_list, top_pick_order, current_slot = \
-            utils.update_teams(LOTTERY_INFO, top_pick_list,
-                               teams_selected, top_pick_order,
-                               request)
-
-    # If we know the top 4 teams already, we can fast forward
-    # the draft lottery
-    if current_slot < 14:
-        if len(top_pick_list) == 4 and current_slot >= 5:
-            teams_selected, current_slot = \
-                utils.fast_forward(LOTTERY_INFO, top_pick_list,
-                                   teams_selected, current_slot)
-
-
-    # Populate the dropdown list in teams with teams
-    # available to be selected
-    teams, teams_selected, top_pick_order = \
-        utils.populate_dropdown(LOTTERY_INFO,
-                                top_pick_list,
-                                teams_selected,
-                                top_pick_order,
-                                current_slot)
-
-    
+@app.route('/seasons/<season>/',  methods=['POST', 'GET'])
+def show_tables(season=None):
+    """ This function serves the lottery odds page of
+    the state token in the state argument. Submitting
+    the form reveals the team in the teams argument and
+    redirects to the page of the new state, so every
+    page is a GET of its state's URL.
+
+    Pages are rendered once per state and kept as bytes.
+    A page carries a strong ETag. A page of a season URL
+    with a state token never changes, so it may be cached
+    for a year; the pages at / follow the default season,
+    so they are revalidated
+    """
+
+    url_season = season
+    season = get_season(season)
+    token = request.args.get('state')
+
+    team = request.values.get('teams')
+    if request.method == 'POST' or team is not None:
+        state = get_state(season, token or '')
+        # The dropdown's empty choice submits no team
+        if team in season.lottery_info.by_name:
+            try:
+                with metrics.stage('reveal'):
+                    state = state.reveal(team)
+            except ValueError:
+                metrics.log_event(logger, logging.INFO, 'invalid_reveal',
+                                  state=state.token, team=team)
+                abort(400)
+
+        response = redirect(url_for('show_tables', season=url_season,
+                                    state=state.token), code=303)
+        if request.method == 'GET':
+            response.headers['Cache-Control'] = cache_control(url_season)
+        return response
+
+    key = (season.name, url_season, token or '')
+    cached = PAGE_CACHE.get(key)
+    if cached is None:
+        state = get_state(season, token or '')
+        body = render_page(season, url_season, state).encode('utf-8')
+        cached = (body, hashlib.sha1(body).hexdigest())
+        PAGE_CACHE.put(key, cached)
+
+    response = Response(cached[0], mimetype='text/html')
+    response.set_etag(cached[1])
+    response.headers['Cache-Control'] = cache_control(url_season, token)
+
+    return response.make_conditional(request)
+
+
+def render_page(season, url_season, state):
+    """ This function renders the lottery odds page
+    of a state
+
+    @param season (Season): Season of the lottery
+    @param url_season (str): Season named in the URL,
+        None at /
+    @param state (LotteryState): Lottery state to show.
+        It holds teams_selected, the teams revealed in
+        reverse standings order, top_pick_list, the teams
+        that are "skipped" as the back of the lottery is
+        revealed and so have a pick in the top 4, and
+        top_pick_order, the teams revealed starting in
+        the top 4
+
+    Returns:
+
+        - page (str): HTML page
+    """
+
     # Update the draft order display
-    selections = utils.draft_order(LOTTERY_INFO,
-                                   teams_selected)
+    with metrics.stage('draft_order'):
+        selections = utils.draft_order(season.lottery_info,
+                                       state.teams_selected)
 
-    logging.warning(str(teams_selected))
-    logging.warning(str(top_pick_list))
-    logging.warning(str(top_pick_order))
+    metrics.log_event(logger, logging.DEBUG, 'show_tables',
+                      season=season.name,
+                      teams_selected=state.teams_selected,
+                      top_pick_list=state.top_pick_list,
+                      top_pick_order=state.top_pick_order)
     # Calculate updated odds
-    lotto_df = update_odds(teams_selected,
-                           top_pick_list,
-                           top_pick_order)
+    table = odds_table_html(*state.key, season=season)
+
+    with metrics.stage('render_template'):
+        return render_template('tables.html',
+                               title=season.title,
+                               season=url_season,
+                               table=table,
+                               teams=state.teams,
+                               selections=selections,
+                               state=state.token)
+
+
+@app.route('/api/odds')
+@app.route('/api/seasons/<season>/odds')
+def api_odds(season=None):
+    """ This function serves the odds after the teams in
+    the state argument are revealed as JSON. The odds of
+    a state never change, so responses carry a strong
+    ETag, and those of a named season may be cached for
+    a year
+    """
+
+    url_season = season
+    season = get_season(season)
+    try:
+        body, etag = api.odds_json(request.args.get('state', ''), season)
+    except ValueError:
+        return jsonify(error='Invalid state token'), 400
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control(url_season)
+
+    return response.make_conditional(request)
+
+
+@app.route('/api/what-if')
+@app.route('/api/seasons/<season>/what-if')
+def api_what_if(season=None):
+    """ This function serves, as JSON, the chance of
+    each team being revealed next after the teams in the
+    state argument and the odds after each of those
+    reveals. Responses are cached like /api/odds
+    """
+
+    url_season = season
+    season = get_season(season)
+    try:
+        body, etag = api.what_if_json(request.args.get('state', ''), season)
+    except ValueError:
+        return jsonify(error='Invalid state token'), 400
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control(url_season)
+
+    return response.make_conditional(request)
+
+
+@app.route('/api/outcomes')
+@app.route('/api/seasons/<season>/outcomes')
+def api_outcomes(season=None):
+    """ This function serves, as JSON, the probability of
+    every order of the top picks still possible after the
+    teams in the state argument are revealed. Responses are
+    cached like /api/odds
+    """
+
+    url_season = season
+    season = get_season(season)
+    try:
+        body, etag = api.outcomes_json(request.args.get('state', ''), season)
+    except ValueError:
+        return jsonify(error='Invalid state token'), 400
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control(url_season)
+
+    return response.make_conditional(request)
+
+
+@app.route('/api/simulate')
+@app.route('/api/seasons/<season>/simulate')
+def api_simulate(season=None):
+    """ This function streams Monte Carlo estimates of the
+    odds after the teams in the state argument are revealed
+    as newline-delimited JSON, one line per chunk of
+    lotteries, so clients can show the odds converging.
+    The lotteries argument sets how many are simulated
+    (100,000 by default). Simulations are seeded, so a
+    state's estimates never change
+    """
+
+    url_season = season
+    season = get_season(season)
+    lotteries = request.args.get('lotteries', '100000')
+    if not lotteries.isdigit() or \
+            not 1 <= int(lotteries) <= SIMULATION_MAX_LOTTERIES:
+        return jsonify(error='lotteries must be between 1 and %d'
+                       % SIMULATION_MAX_LOTTERIES), 400
+    try:
+        lines = api.simulation_ndjson(request.args.get('state', ''), season,
+                                      int(lotteries))
+    except ValueError:
+        return jsonify(error='Invalid state token'), 400
+
+    return Response(lines, mimetype='application/x-ndjson',
+                    headers={'Cache-Control': cache_control(url_season),
+                             'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/tree')
+@app.route('/api/seasons/<season>/tree')
+def api_tree(season=None):
+    """ This function streams the reveal tree below the
+    state argument as newline-delimited JSON, one node per
+    line, expanding the number of reveals in the depth
+    argument (1 by default). Deep trees are costly, so
+    only callers with the LIVE_ADMIN_TOKEN bearer token
+    may expand past TREE_MAX_DEPTH reveals
+    """
+
+    url_season = season
+    season = get_season(season)
+    try:
+        reveals = utils.decode_state(request.args.get('state', ''),
+                                     season.lottery_info)
+    except ValueError:
+        return jsonify(error='Invalid state token'), 400
+
+    max_depth = len(season.lottery_info)
+    if not is_admin(request):
+        max_depth = min(max_depth, TREE_MAX_DEPTH)
+    depth = request.args.get('depth', '1')
+    if not depth.isdigit() or not 1 <= int(depth) <= max_depth:
+        return jsonify(error='depth must be between 1 and %d'
+                       % max_depth), 400
+
+    nodes = reveal_tree.expand_tree(reveals, int(depth), season)
+
+    return Response(reveal_tree.ndjson(nodes),
+                    mimetype='application/x-ndjson',
+                    headers={'Cache-Control': cache_control(url_season)})
+
+
+@app.route('/_ah/warmup')
+def warmup():
+    """ This function handles App Engine warmup
+    requests by rendering the start of the lottery
+    into the odds cache before traffic arrives
+    """
+
+    odds_table_html([], [], [])
+
+    # States outside the precomputed table fall back to
+    # the engine, which needs numpy
+    import numpy
+
+    return '', 200
+
+
+@app.route('/cache_stats')
+def cache_stats():
+    """ This function reports the hit, miss and
+    eviction counters of the odds table cache
+    """
+
+    return jsonify(ODDS_CACHE.stats())
+
+
+@app.route('/metrics')
+def metrics_page():
+    """ This function exposes the request and stage
+    timing histograms in the Prometheus text format
+    """
+
+    return Response(metrics.exposition(),
+                    mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/metrics/profiles')
+def slow_profiles():
+    """ This function serves the sampled stacks of recent
+    slow requests in the folded flame graph format. It is
+    only available when PROFILE_SLOW_MS is set
+    """
+
+    if not metrics.PROFILE_SLOW_MS:
+        abort(404)
+
+    body = ''.join('# %s %.1f ms\n%s' % (profile['path'], profile['ms'],
+                                         metrics.folded(profile['stacks']))
+                   for profile in list(metrics.SLOW_PROFILES))
+
+    return Response(body, mimetype='text/plain')
+
+
+@app.route('/live')
+def live():
+    """ This function serves the live viewer page,
+    which follows the odds pushed by /live/stream
+    """
+
+    return render_template('live.html', title=DEFAULT_SEASON.title,
+                           top_picks=DEFAULT_SEASON.top_picks)
+
+
+@app.route('/live/stream')
+def live_stream():
+    """ This function streams the live odds as
+    Server-Sent Events. Reconnecting clients send
+    Last-Event-ID and only receive newer odds
+    """
+
+    try:
+        version = int(request.headers.get('Last-Event-ID', 0))
+    except ValueError:
+        version = 0
+
+    return Response(LIVE.events(version),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no'})
+
+
+@app.route('/live/odds')
+def live_odds():
+    """ This function is the long-poll fallback for
+    /live/stream. It answers once the live state is
+    newer than the version argument, or after 25 seconds
+    """
+
+    _, payload = LIVE.wait(request.args.get('version', 0, type=int), 25)
+
+    return Response(payload, mimetype='application/json',
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@app.route('/live/reveal', methods=['POST'])
+def live_reveal():
+    """ This function lets the live admin submit the
+    next team revealed, or start over with reset=1.
+    Requests must carry the LIVE_ADMIN_TOKEN bearer token
+    """
+
+    if not is_admin(request):
+        abort(401)
+
+    if request.form.get('reset'):
+        LIVE.reset()
+    elif request.form.get('teams'):
+        try:
+            LIVE.reveal(request.form['teams'])
+        except ValueError:
+            abort(400)
+    else:
+        abort(400)
 
-    return render_template('tables.html',
-                            table=lotto_df.to_html(classes='data'),
-                            teams=teams,
-                            selections=selections)
+    return Response(LIVE.payload, mimetype='application/json')
 
 
 if __name__ == '__main__':
     # This is used when running locally only. When deploying to Google App
-    # Engine, a webserver process such as Gunicorn will serve the app. This
-    # can be configured by adding an `entrypoint` to app.yaml.
+    # Engine, Gunicorn serves the app with the settings in gunicorn.conf.py,
+    # as configured by the `entrypoint` in app.yaml.
     # Flask's development server will automatically serve static files in
     # the "static" directory. See:
     # http://flask.pocoo.org/docs/1.0/quickstart/#static-files. Once deployed,